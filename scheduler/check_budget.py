@@ -0,0 +1,56 @@
+"""
+Check: BrowserBudget charges each job the browsers its runner actually launches.
+
+Job files are written to a temporary pending/ directory and admitted with a fake
+run_job (nothing is launched); the browsers charged per job are compared with
+EXPECTED. Tab mode only applies to pooled, unsharded jobs, so a sharded or
+pool-less job with tabs_per_browser > 1 still holds one browser per worker.
+
+Usage:
+    python check_budget.py
+"""
+import json
+import os
+import sys
+import tempfile
+
+import service
+
+# job file -> (job fields, browsers charged)
+EXPECTED = {
+    "tabs.json": ({"max_workers": 8, "tabs_per_browser": 4}, 2),
+    "sharded_tabs.json": ({"max_workers": 4, "tabs_per_browser": 4, "shards": 2}, 4),
+    "no_pool_tabs.json": ({"max_workers": 3, "tabs_per_browser": 4, "use_pool": False}, 3),
+    "plain.json": ({"max_workers": 2}, 2),
+}
+
+
+class FakeRunner:
+    def poll(self):
+        return None  # still running
+
+
+def check():
+    """Admits every EXPECTED job; returns True when each is charged the expected browsers."""
+    with tempfile.TemporaryDirectory() as pending_dir:
+        service.PENDING_DIR = pending_dir
+        service.run_job = lambda job_path, max_workers=None: FakeRunner()
+        budget = service.BrowserBudget(budget=sum(b for _, b in EXPECTED.values()))
+        for filename, (job, _) in EXPECTED.items():
+            with open(os.path.join(pending_dir, filename), "w", encoding="utf-8") as f:
+                json.dump(dict(job, sites=[], visits_per_site=1), f)
+            budget.waiting.append((filename, None))
+        budget.admit()
+
+    ok = not budget.waiting
+    print(f"{'job':<20} {'expected':>8} {'charged':>8}  result")
+    for filename, (_, browsers) in EXPECTED.items():
+        charged = budget.running.get(filename, (None, None))[1]
+        passed = charged == browsers
+        ok = ok and passed
+        print(f"{filename:<20} {browsers:>8} {charged if charged is not None else '-':>8}  {'ok' if passed else 'FAIL'}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check() else 1)
@@ -1,8 +1,16 @@
 import os
+import sys
 import time
 import json
+import heapq
+import select
+import ctypes
+import ctypes.util
+import struct
 import subprocess
 import shutil
+from collections import deque
+from multiprocessing.connection import Client
 from datetime import datetime
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -14,27 +22,89 @@ PENDING_DIR = os.path.join(JOBS_BASE, "pending")
 RUNNING_DIR = os.path.join(JOBS_BASE, "running")
 DONE_DIR = os.path.join(JOBS_BASE, "done")
 
+sys.path.insert(0, os.path.join(BASE_DIR, "scraper"))
+from job_browsers import tabs_in_effect  # noqa: E402  (stdlib only, same tab-mode rule as the runner)
 
-CHECK_INTERVAL = 10  # seconds
+
+CHECK_INTERVAL = 10  # seconds, polling fallback when inotify is not available
+MAX_SLEEP = 60       # re-check the clock and rescan pending/ at least this often (clock changes / lost events)
+
+# host-wide browser budget shared by all running jobs (1 worker = 1 Chrome)
+HOST_BROWSER_BUDGET = 12
+MIN_JOB_WORKERS = 1   # a due job may start with fewer workers, but never fewer than this
+REAP_INTERVAL = 2     # seconds between checks for finished runners while jobs are running / waiting
+
+# "subprocess" = one runner.py process per job, "daemon" = hand jobs to scraper/runner_daemon.py
+RUNNER_MODE = os.environ.get("LIVESEEKER_RUNNER_MODE", "subprocess")
+DAEMON_ADDRESS = ("127.0.0.1", int(os.environ.get("LIVESEEKER_RUNNER_PORT", "6150")))
+DAEMON_AUTHKEY = os.environ.get("LIVESEEKER_RUNNER_KEY", "liveseeker-runner").encode()
 
 def load_job(path):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
-def run_job(job_path):
+class DaemonJob:
+    """Popen-like handle (poll / returncode) for a job running inside the runner daemon."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None:
+            try:
+                if self.conn.poll():
+                    msg = self.conn.recv()
+                    self.returncode = 0 if msg.get("status") == "done" else 1
+            except (EOFError, OSError):
+                self.returncode = 1  # daemon died: job file stays in running/ like a crashed runner
+            if self.returncode is not None:
+                self.conn.close()
+        return self.returncode
+
+
+def submit_to_daemon(running_path, max_workers, dispatched_at):
+    conn = Client(DAEMON_ADDRESS, authkey=DAEMON_AUTHKEY)
+    try:
+        conn.send({"job_path": running_path, "max_workers": max_workers, "dispatched_at": dispatched_at})
+        if not conn.recv().get("accepted"):
+            raise RuntimeError("job rejected by runner daemon")
+    except Exception:
+        conn.close()
+        raise
+    return DaemonJob(conn)
+
+
+def run_job(job_path, max_workers=None):
     filename = os.path.basename(job_path)
     running_path = os.path.join(RUNNING_DIR, filename)
 
     shutil.move(job_path, running_path)
 
     print(f"[SCHEDULER] Launching job: {filename}")
+    dispatched_at = time.time()
+
+    if RUNNER_MODE == "daemon":
+        try:
+            return submit_to_daemon(running_path, max_workers, dispatched_at)
+        except ConnectionRefusedError as e:
+            print(f"[SCHEDULER] runner daemon not running ({e}), starting a runner process")
+        except Exception as e:
+            # daemon is up: its warm browsers are not in the budget, a runner process next to them could exceed it
+            shutil.move(running_path, job_path)
+            print(f"[SCHEDULER] runner daemon did not take {filename} ({e}), job stays pending")
+            return None
 
-    subprocess.Popen([
+    args = [
         PYTHON_EXE,
         RUNNER_PATH,
         running_path
-    ])
+    ]
+    if max_workers is not None:
+        args.append(str(max_workers))  # override max_workers (admission control)
+    env = dict(os.environ, LIVESEEKER_DISPATCHED_AT=repr(dispatched_at))
+    return subprocess.Popen(args, env=env)
     
 
 def recover_running_jobs():
@@ -47,50 +117,316 @@ def recover_running_jobs():
 def parse_run_at(value):
     return datetime.strptime(value, "%Y-%m-%d %H:%M")
 
-def should_run(job):
-    if "run_at" not in job:
-        return True  # backward compatible
 
-    run_at = parse_run_at(job["run_at"])
-    now = datetime.now()
+# -----------------------------
+# pending jobs: min-heap keyed by run_at
+# -----------------------------
+class PendingJobs:
+    """
+    In-memory view of jobs/pending.
+    Each job file is parsed once per change; the heap holds (run_at, filename)
+    and stale entries (file changed / removed) are skipped lazily on pop.
+    load_all() lists the directory and parses only files whose mtime changed.
+    """
+
+    def __init__(self, pending_dir):
+        self.pending_dir = pending_dir
+        self.heap = []
+        self.jobs = {}    # filename -> run_at currently scheduled
+        self.mtimes = {}  # filename -> st_mtime_ns when last parsed
+
+    def update(self, filename, mtime=None):
+        if not filename.endswith(".json"):
+            return
+        path = os.path.join(self.pending_dir, filename)
+        try:
+            if mtime is None:
+                mtime = os.stat(path).st_mtime_ns
+            job = load_job(path)
+            # ไม่มี run_at = รันทันที (backward compatible)
+            run_at = parse_run_at(job["run_at"]) if "run_at" in job else datetime.min
+        except FileNotFoundError:
+            self.remove(filename)
+            return
+        except Exception as e:
+            print(f"[ERROR] Failed to load {filename}: {e}")
+            self.remove(filename)
+            self.mtimes[filename] = mtime  # not parsed again until it changes
+            return
+        self.mtimes[filename] = mtime
+        if self.jobs.get(filename) == run_at:
+            return  # already scheduled, its heap entry is live
+        self.jobs[filename] = run_at
+        heapq.heappush(self.heap, (run_at, filename))
+
+    def remove(self, filename):
+        self.jobs.pop(filename, None)
+        self.mtimes.pop(filename, None)
+
+    def load_all(self):
+        """Syncs with the directory: new / modified files are parsed, jobs whose file is gone are dropped."""
+        current = {}
+        with os.scandir(self.pending_dir) as it:
+            for entry in it:
+                try:
+                    current[entry.name] = entry.stat().st_mtime_ns
+                except FileNotFoundError:
+                    continue
+        for filename in set(self.mtimes) - set(current):
+            self.remove(filename)
+        for filename, mtime in current.items():
+            if self.mtimes.get(filename) != mtime:
+                self.update(filename, mtime)
+
+    def _drop_stale(self):
+        while self.heap and self.jobs.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+    def pop_due(self, now):
+        due = []
+        self._drop_stale()
+        while self.heap and self.heap[0][0] <= now:
+            run_at, filename = heapq.heappop(self.heap)
+            del self.jobs[filename]
+            due.append((filename, run_at))
+            self._drop_stale()
+        return due
+
+    def seconds_until_next(self, now):
+        self._drop_stale()
+        if not self.heap:
+            return None
+        return max((self.heap[0][0] - now).total_seconds(), 0)
+
+
+# -----------------------------
+# directory watchers
+# -----------------------------
+RESCAN = None  # watcher result: changes were lost, reload the whole directory
+
+class InotifyWatcher:
+    """Linux inotify via ctypes: wait() returns only the files that changed."""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_MOVED_FROM | self.IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self, timeout):
+        """
+        Returns [(filename, present)] changed since the last call (blocks up to timeout),
+        or RESCAN when the kernel queue overflowed and events were lost.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        changes = []
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            _, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", errors="replace")
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                return RESCAN
+            if name:
+                changes.append((name, bool(mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO))))
+        return changes
+
+
+class PollingWatcher:
+    """Fallback: compares (name -> mtime) snapshots every CHECK_INTERVAL; no JSON parsing."""
+
+    def __init__(self, path, interval=CHECK_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snap = {}
+        with os.scandir(self.path) as it:
+            for entry in it:
+                try:
+                    snap[entry.name] = entry.stat().st_mtime_ns
+                except FileNotFoundError:
+                    continue
+        return snap
+
+    def wait(self, timeout):
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        current = self._scan()
+        changes = [(n, True) for n, m in current.items() if self.snapshot.get(n) != m]
+        changes += [(n, False) for n in self.snapshot if n not in current]
+        self.snapshot = current
+        return changes
+
+
+def make_watcher(path):
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(path)
+        except Exception as e:
+            print(f"[SCHEDULER] inotify unavailable ({e}), polling every {CHECK_INTERVAL}s")
+    return PollingWatcher(path)
+
+
+# -----------------------------
+# admission control: host-wide browser budget
+# -----------------------------
+class BrowserBudget:
+    """
+    Tracks running runner processes and the browsers they hold.
+    Due jobs wait in FIFO order until enough budget is free; a job may start with
+    fewer workers (down to MIN_JOB_WORKERS) rather than wait for its full request.
+    A job that runs in tab mode holds one browser per tabs_per_browser workers
+    (job_browsers.tabs_in_effect: sharded / pool-less jobs hold one per worker).
+    A job the runner daemon did not take goes back to the head of the queue and
+    admission pauses for REAP_INTERVAL.
+    """
+
+    def __init__(self, budget=HOST_BROWSER_BUDGET, min_workers=MIN_JOB_WORKERS):
+        self.budget = budget
+        self.min_workers = min_workers
+        self.running = {}      # filename -> (Popen | DaemonJob, browsers)
+        self.waiting = deque() # (filename, run_at)
+        self.hold_until = 0.0  # monotonic; no admission before this (daemon did not take a job)
+
+    @property
+    def used(self):
+        return sum(w for _, w in self.running.values())
 
-    return now >= run_at
+    def reap(self):
+        for filename, (proc, browsers) in list(self.running.items()):
+            code = proc.poll()
+            if code is not None:
+                del self.running[filename]
+                print(f"[SCHEDULER] Runner for {filename} exited ({code}), released {browsers} browsers "
+                      f"[{self.used}/{self.budget} in use]")
+
+    def enqueue(self, due):
+        """Adds due jobs; a job handed back to pending/ is already waiting at the head."""
+        queued = {filename for filename, _ in self.waiting}
+        self.waiting.extend(job for job in due if job[0] not in queued)
+
+    def admit(self, on_launch=None):
+        """Start waiting jobs while budget allows; keeps FIFO order (no overtaking)."""
+        self.reap()
+        if time.monotonic() < self.hold_until:
+            return
+        while self.waiting:
+            filename, run_at = self.waiting[0]
+            job_path = os.path.join(PENDING_DIR, filename)
+            try:
+                job = load_job(job_path)
+                requested = max(int(job.get("max_workers", 1)), 1)
+                tabs = tabs_in_effect(job)
+            except FileNotFoundError:
+                self.waiting.popleft()
+                continue
+            except Exception as e:
+                print(f"[ERROR] Failed to load {filename}: {e}")
+                self.waiting.popleft()
+                continue
+
+            free = self.budget - self.used
+            workers = min(requested, free * tabs)
+            if workers < min(self.min_workers, requested):
+                return  # wait for a runner to exit
+
+            self.waiting.popleft()
+            if workers < requested:
+                print(f"[SCHEDULER] {filename}: budget allows {workers}/{requested} workers")
+            proc = run_job(job_path, workers if workers < requested else None)
+            if proc is None:
+                self.waiting.appendleft((filename, run_at))
+                self.hold_until = time.monotonic() + REAP_INTERVAL
+                return
+            self.running[filename] = (proc, -(-workers // tabs))
+            print(f"[SCHEDULER] {self.used}/{self.budget} browsers in use")
+            if on_launch:
+                on_launch(filename, run_at)
+
+    def busy(self):
+        return bool(self.running or self.waiting)
+
+
+def report_lateness(filename, run_at, launched_at, history):
+    if run_at == datetime.min:
+        return
+    late = (launched_at - run_at).total_seconds()
+    history.append(late)
+    ordered = sorted(history)
+    p50 = ordered[len(ordered) // 2]
+    print(f"[SCHEDULER] {filename} start lateness {late:.3f}s "
+          f"(n={len(ordered)}, p50={p50:.3f}s, max={ordered[-1]:.3f}s)")
 
 
 def main():
-    print("[SCHEDULER] Service started")
+    print(f"[SCHEDULER] Service started (runner mode: {RUNNER_MODE})")
 
     # print("[SCHEDULER] Recovering running jobs")
     # recover_running_jobs()
 
     print("[SCHEDULER] Watching:", JOBS_DIR)
 
-    while True:
-        try:
-            for filename in os.listdir(JOBS_DIR):
-                if not filename.endswith(".json"):
-                    continue
+    os.makedirs(PENDING_DIR, exist_ok=True)
+    os.makedirs(RUNNING_DIR, exist_ok=True)
+    watcher = make_watcher(PENDING_DIR)
+    pending = PendingJobs(PENDING_DIR)
+    pending.load_all()
+    next_rescan = time.monotonic() + MAX_SLEEP
+    budget = BrowserBudget()
+    lateness = []
 
-                job_path = os.path.join(PENDING_DIR, filename)
+    def on_launch(filename, run_at):
+        report_lateness(filename, run_at, datetime.now(), lateness)
 
-                try:
-                    job = load_job(job_path)
-                except Exception as e:
-                    print(f"[ERROR] Failed to load {filename}: {e}")
-                    continue
+    while True:
+        try:
+            now = datetime.now()
+            budget.enqueue(pending.pop_due(now))
+            budget.admit(on_launch)
 
-                if should_run(job):
-                    run_job(job_path)
-                    print("[bypass_parallel] finished")
-                    # 🚨 IMPORTANT: minimal mode → ลบ job ทิ้งก่อน
-                    # (ป้องกันรันซ้ำ)
-                    # os.remove(job_path)
-                    # print(f"[SCHEDULER] Job removed: {filename}")
+            # นอนจนถึง deadline ถัดไป หรือจนกว่าจะมีไฟล์ job เปลี่ยน
+            timeout = pending.seconds_until_next(datetime.now())
+            timeout = MAX_SLEEP if timeout is None else min(timeout, MAX_SLEEP)
+            if budget.busy():
+                timeout = min(timeout, REAP_INTERVAL)  # runners exiting free up budget
+            changes = watcher.wait(min(timeout, max(next_rescan - time.monotonic(), 0)))
+            if changes is RESCAN or time.monotonic() >= next_rescan:
+                # queue overflow, or the periodic safety net for events lost any other way
+                if changes is RESCAN:
+                    print("[SCHEDULER] watcher overflowed, rescanning pending jobs")
+                pending.load_all()  # listing + mtimes; only changed files are parsed
+                next_rescan = time.monotonic() + MAX_SLEEP
+                continue
+            for filename, present in changes:
+                if present:
+                    pending.update(filename)
+                else:
+                    pending.remove(filename)
 
         except Exception as e:
             print(f"[SCHEDULER] Loop error: {e}")
-
-        time.sleep(CHECK_INTERVAL)
+            time.sleep(1)
 
 if __name__ == "__main__":
     main()
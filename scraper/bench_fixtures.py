@@ -0,0 +1,322 @@
+"""
+Benchmark: the scan pipeline (scan_visit) against local fixture pages.
+
+A ThreadingHTTPServer serves fixtures/ plus fake live playlists (/live/<name>.m3u8),
+so runs do not depend on third-party sites and are comparable with each other:
+
+    click_play   playlist requested only after a play button click
+    iframes      player two iframes deep
+    shadow       play button inside a media-player shadow root
+    skip_ad      pre-roll with a skip countdown (stream starts on skip or when the ad ends)
+    skip_ad_pod  two ads, skip clickable at once but labelled "Skip Ad 1 of 2" (not a countdown)
+    dooball      icon_th-monomax0N channel buttons (refresh loop path)
+    heavy        click-to-play under ~3 MB of fonts / thumbnails / banners served slowly
+    fast_inline  playlist in an inline player config         (HTTP fast path, no browser)
+    fast_channel ?channel= page building the url in JS      (HTTP fast path)
+    fast_iframe  escaped JSON / template / atob() in an iframe (HTTP fast path)
+
+--blocking applies blocking.json to every visit, so a run with and without it
+shows the page-load time and bytes-per-visit difference.
+
+--no-pool launches a fresh browser per visit (the pre-pool behaviour), so a run
+with and without it gives the pool-on vs pool-off visits/min comparison.
+
+--tabs N runs the visits as tabs of shared Chromes (N per browser, cdp capture)
+instead of one browser per visit; peak browser memory and concurrent visits per
+GB are reported for both, so two runs give the visits-per-GB comparison.
+
+Per fixture it reports visits/sec, time to first m3u8 (visit start -> first URL
+seen by the scanner), links per visit, WebDriver commands per visit (pool
+reset commands excluded, not counted in tab mode), iframe switches per visit,
+page-load time, bytes transferred per visit, peak browser memory and concurrent
+visits per GB.
+Results are written as JSON; --compare prints the change between two result files.
+
+--fast-path checks only the browserless extraction against every fixture (no
+Chrome needed): the fast_* pages must yield their playlists, the others nothing.
+
+Usage:
+    python bench_fixtures.py [--blocking] [--no-pool] [--tabs N] [visits] [workers] [fixture ...]
+    python bench_fixtures.py --compare <old.json> <new.json>
+    python bench_fixtures.py --fast-path
+"""
+import contextvars
+import functools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import bypass_parallel as bp
+import fast_path
+import visit_metrics
+from bench_selectors import CommandCounter
+from block_profile import load_blocking
+from mem_sampler import MemorySampler, per_gb
+from selector_stats import SelectorStats
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURES = ["click_play", "iframes", "shadow", "skip_ad", "skip_ad_pod", "dooball", "heavy", "fast_inline",
+            "fast_channel", "fast_iframe"]
+# playlists the fast path must extract per fixture (rule names); fixtures not listed must yield none
+FAST_PATH_EXPECTED = {
+    "fast_inline": {"/live/fast_inline.m3u8": "quoted"},
+    "fast_channel": {"/live/ch1.m3u8": "concat"},
+    "fast_iframe": {"/live/fast_embed.m3u8": "quoted", "/live/sport1.m3u8": "template",
+                    "/live/fast_backup.m3u8": "base64"},
+}
+ASSET_DELAY = 0.15  # seconds per /assets/ response (slow third-party CDN)
+ASSET_TYPES = {"jpg": "image/jpeg", "gif": "image/gif", "png": "image/png", "woff2": "font/woff2"}
+BENCH_FOLDER = os.path.join(bp.RESULTS_FOLDER, "bench")
+SEED = 1234  # human_pause jitter is seeded so runs stay comparable
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=FIXTURES_DIR, **kwargs)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/live/") and path.endswith(".m3u8"):
+            seq = int(time.time() // 2)
+            body = "#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:2\n#EXT-X-MEDIA-SEQUENCE:%d\n" % seq
+            body += "".join("#EXTINF:2.0,\nseg%d.ts\n" % (seq + i) for i in range(3))
+            data = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/vnd.apple.mpegurl")
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if path.startswith("/assets/"):
+            # filler bytes of the requested size (?kb=N), served after a delay
+            query = dict(p.split("=", 1) for p in self.path.partition("?")[2].split("&") if "=" in p)
+            data = b"\0" * (int(query.get("kb", "20")) * 1024)
+            time.sleep(ASSET_DELAY)
+            self.send_response(200)
+            self.send_header("Content-Type", ASSET_TYPES.get(path.rsplit(".", 1)[-1], "application/octet-stream"))
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    return server
+
+
+class CountingPool(bp.BrowserPool):
+    """BrowserPool that counts WebDriver commands per lease (acquire -> release)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.leases = []
+        self._leases_lock = threading.Lock()
+
+    def acquire(self, block=True):
+        driver = super().acquire(block)
+        if driver is None:
+            return None
+        counter = getattr(driver, "_bench_counter", None)
+        if counter is None:
+            counter = driver._bench_counter = CommandCounter(driver)
+        counter.reset()
+        return driver
+
+    def release(self, driver):
+        counter = getattr(driver, "_bench_counter", None)
+        if counter is not None:
+            with self._leases_lock:
+                self.leases.append(counter.count)
+        super().release(driver)
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def bench_fixture(base_url, name, selectors, pool, visits, workers, backend, blocking=None):
+    url = f"{base_url}/{name}.html"
+    strategy = bp.site_strategy(url)
+    first = {}  # visit -> seconds to first m3u8
+    links = {}
+
+    def on_found(visit_id, started, _url, _path="browser"):
+        first.setdefault(visit_id, time.monotonic() - started)
+
+    def one(visit_id):
+        started = time.monotonic()
+        _, found = bp.scan_visit(url, selectors, strategy, pool, backend, functools.partial(on_found, visit_id, started),
+                                 blocking)
+        links[visit_id] = len(found)
+
+    leases = getattr(pool, "leases", [])
+    leases.clear()
+    metrics = visit_metrics.begin_job()
+    sampler = MemorySampler(interval=0.5).start()
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(lambda v: contextvars.copy_context().run(one, v), range(visits)))
+    wall = time.monotonic() - t0
+    memory = sampler.stop()
+    memory_per_gb = per_gb(memory, min(workers, visits), visits, wall) or {}
+    summary = metrics.summary()
+    load = summary["phases"].get("page_load", {})
+    transfer = summary["values"].get("transfer_bytes", {}).get("all", {})
+    switches = summary["values"].get("frame_switches", {}).get("all", {})
+
+    ttf = list(first.values())
+    return {
+        "url": url,
+        "visits": visits,
+        "wall_s": round(wall, 2),
+        "visits_per_sec": round(visits / wall, 4) if wall else None,
+        "visits_with_m3u8": len(ttf),
+        "ttf_m3u8_p50_s": round(_percentile(ttf, 0.5), 2) if ttf else None,
+        "ttf_m3u8_max_s": round(max(ttf), 2) if ttf else None,
+        "links_per_visit": round(sum(links.values()) / visits, 2),
+        "cmds_per_visit": round(sum(leases) / len(leases), 1) if leases else None,
+        "switches_per_visit": round(switches["sum"] / switches["count"], 1) if switches else None,
+        "page_load_p50_s": load.get("p50_s"),
+        "bytes_per_visit_p50": transfer.get("p50"),
+        "fast_path_hits": int(summary["values"].get("fast_path_hit", {}).get("all", {}).get("sum", 0)),
+        "peak_mb": memory["peak_mb"] if memory else None,
+        "concurrent_visits_per_gb": memory_per_gb.get("concurrent_visits_per_gb"),
+    }
+
+
+def bench(visits=3, workers=1, fixtures=None, backend=bp.CAPTURE_BACKEND, out=None, blocking=False, tabs=1,
+          use_pool=True):
+    fixtures = fixtures or FIXTURES
+    random.seed(SEED)
+    # fresh, throw-away selector stats: earlier runs must not reorder strategies
+    stats_dir = tempfile.mkdtemp(prefix="bench_stats_")
+    bp.selector_stats = SelectorStats(os.path.join(stats_dir, "selector_stats.json"))
+    selectors = bp.load_selectors()
+    blocking_cfg = load_blocking(bp.BLOCKING_FILE) if blocking else None
+
+    server = start_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    if tabs > 1:
+        backend = "cdp"
+        pool = bp.TabPool(size=workers, tabs_per_browser=tabs)
+    elif use_pool:
+        pool = CountingPool(size=workers, backend=backend)
+    else:
+        pool = None
+    report = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "backend": backend,
+        "workers": workers,
+        "visits_per_fixture": visits,
+        "headless": bp.HEADLESS,
+        "blocking": bool(blocking_cfg),
+        "tabs_per_browser": tabs,
+        "pool": use_pool,
+        "fixtures": {},
+    }
+    try:
+        print(f"{'fixture':<12} {'visits/s':>9} {'ttf p50':>8} {'links':>6} {'cmds':>7} {'sw':>5} {'load p50':>9} {'KB':>8} "
+              f"{'peak MB':>8} {'vis/GB':>7}")
+        for name in fixtures:
+            res = report["fixtures"][name] = bench_fixture(base_url, name, selectors, pool, visits, workers, backend,
+                                                           blocking_cfg)
+            print(f"{name:<12} {res['visits_per_sec'] or 0:>9.3f} {res['ttf_m3u8_p50_s'] or float('nan'):>8.2f} "
+                  f"{res['links_per_visit']:>6.2f} {res['cmds_per_visit'] or 0:>7.1f} {res['switches_per_visit'] or 0:>5.1f} "
+                  f"{res['page_load_p50_s'] or float('nan'):>9.2f} {(res['bytes_per_visit_p50'] or 0) / 1024:>8.0f} "
+                  f"{res['peak_mb'] or float('nan'):>8.0f} {res['concurrent_visits_per_gb'] or float('nan'):>7.2f}")
+    finally:
+        if pool is not None:
+            pool.close()
+        server.shutdown()
+
+    if out is None:
+        os.makedirs(BENCH_FOLDER, exist_ok=True)
+        out = os.path.join(BENCH_FOLDER, f"fixtures_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"results -> {out}")
+    return report
+
+
+def check_fast_path(fixtures=None):
+    """Runs fast_path.scan against the fixture pages; returns True when every fixture matches."""
+    server = start_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    ok = True
+    try:
+        print(f"{'fixture':<12} {'ms':>6} {'docs':>5} {'found':>6}  result")
+        for name in fixtures or FIXTURES:
+            t0 = time.monotonic()
+            res = fast_path.scan(f"{base_url}/{name}.html")
+            ms = (time.monotonic() - t0) * 1000
+            got = {url[len(base_url):]: rule for url, rule in res["links"].items()}
+            expected = FAST_PATH_EXPECTED.get(name, {})
+            passed = got == expected
+            ok = ok and passed
+            detail = ", ".join(f"{u} ({r})" for u, r in sorted(got.items())) or "-"
+            print(f"{name:<12} {ms:>6.0f} {res['documents']:>5} {len(got):>6}  {'ok' if passed else 'FAIL'} {detail}")
+            if not passed:
+                print(f"{'':<12} expected {expected}")
+    finally:
+        server.shutdown()
+        fast_path.client().close()
+    return ok
+
+
+def compare(old_path, new_path):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    keys = ["visits_per_sec", "ttf_m3u8_p50_s", "links_per_visit", "cmds_per_visit", "switches_per_visit",
+            "page_load_p50_s", "bytes_per_visit_p50", "peak_mb", "concurrent_visits_per_gb"]
+    print(f"{'fixture':<12} " + " ".join(f"{k:>22}" for k in keys))
+    for name, res in new["fixtures"].items():
+        before = old["fixtures"].get(name, {})
+        cells = []
+        for k in keys:
+            a, b = before.get(k), res.get(k)
+            cells.append(f"{a} -> {b}" if a is None or b is None else f"{a:.2f} -> {b:.2f}")
+        print(f"{name:<12} " + " ".join(f"{c:>22}" for c in cells))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--fast-path"]:
+        sys.exit(0 if check_fast_path(sys.argv[2:] or None) else 1)
+    elif sys.argv[1:2] == ["--compare"]:
+        if len(sys.argv) < 4:
+            print("Usage: python bench_fixtures.py --compare <old.json> <new.json>")
+            sys.exit(1)
+        compare(sys.argv[2], sys.argv[3])
+    else:
+        args = [a for a in sys.argv[1:] if a not in ("--blocking", "--no-pool")]
+        tabs = 1
+        if "--tabs" in args:
+            i = args.index("--tabs")
+            tabs = int(args[i + 1])
+            del args[i:i + 2]
+        bench(
+            visits=int(args[0]) if len(args) > 0 else 3,
+            workers=int(args[1]) if len(args) > 1 else 1,
+            fixtures=args[2:] or None,
+            blocking="--blocking" in sys.argv[1:],
+            tabs=tabs,
+            use_pool="--no-pool" not in sys.argv[1:]
+        )
@@ -0,0 +1,90 @@
+"""
+Benchmark: per-selector WebDriver path vs batched in-browser selector engine.
+
+Usage:
+    python bench_selectors.py <url> [repeat] [group ...]
+
+For every selectors.json group it reports WebDriver commands, wall time and
+matched element count for both paths on the same loaded page.
+"""
+import sys
+import time
+
+import bypass_parallel as bp
+
+
+class CommandCounter:
+    """Counts WebDriver commands sent by a driver (and by its WebElements)."""
+
+    def __init__(self, driver):
+        self.count = 0
+        self._driver = driver
+        self._orig = driver.execute
+
+        def counted(*args, **kwargs):
+            self.count += 1
+            return self._orig(*args, **kwargs)
+
+        driver.execute = counted
+
+    def reset(self):
+        self.count = 0
+
+    def detach(self):
+        self._driver.execute = self._orig
+
+
+def run_legacy(driver, selectors, group):
+    """Old path: one round trip per rule, plus .text per keyword candidate."""
+    found = []
+    for sel in selectors.get(group, []):
+        for el in bp.find_elements_by_selector(driver, sel):
+            # same per-element reads try_skip_in_current_context used to do
+            try:
+                el.text
+                el.get_attribute("disabled")
+            except Exception:
+                pass
+            found.append(el)
+    return found
+
+
+def run_batched(driver, selectors, group):
+    return [m["el"] for m in bp.find_elements_by_group(driver, selectors, group)]
+
+
+def bench(url, repeat=3, groups=None):
+    selectors = bp.load_selectors()
+    groups = groups or [g for g in selectors if g != "refresh_buttons"]
+
+    driver = bp.make_driver()
+    counter = CommandCounter(driver)
+    try:
+        driver.get(url)
+        time.sleep(5)
+
+        print(f"{'group':<18} {'path':<8} {'cmds':>7} {'ms':>9} {'found':>6}")
+        for group in groups:
+            for name, fn in (("legacy", run_legacy), ("batched", run_batched)):
+                cmds, elapsed, found = 0, 0.0, 0
+                for _ in range(repeat):
+                    counter.reset()
+                    t0 = time.perf_counter()
+                    found = len(fn(driver, selectors, group))
+                    elapsed += time.perf_counter() - t0
+                    cmds += counter.count
+                print(f"{group:<18} {name:<8} {cmds / repeat:>7.0f} {elapsed / repeat * 1000:>9.1f} {found:>6}")
+    finally:
+        counter.detach()
+        driver.quit()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python bench_selectors.py <url> [repeat] [group ...]")
+        sys.exit(1)
+    bench(
+        sys.argv[1],
+        repeat=int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+        groups=sys.argv[3:] or None
+    )
@@ -0,0 +1,102 @@
+"""
+Network blocking profile (blocking.json, next to selectors.json).
+
+Drops requests that never lead to an m3u8: images, fonts, media segments and
+known ad / analytics hosts. Allow patterns (regex, searched in the full URL)
+always win, so player scripts and playlists are never blocked.
+
+blocking.json:
+    {
+      "enabled": true,
+      "block_extensions": ["png", "woff2", "ts", ...],
+      "block_hosts": ["doubleclick.net", ...],          # host and its subdomains
+      "allow": ["\\.m3u8", "jwplayer", ...],
+      "sites": {                                         # substring of the site url
+        "dooball": {"allow": [...], "unblock_extensions": ["ts"], "enabled": false, ...}
+      }
+    }
+
+Site overrides: "enabled" replaces, "block_extensions" / "block_hosts" / "allow"
+extend, "unblock_extensions" / "unblock_hosts" remove.
+"""
+import json
+import re
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+LIST_KEYS = ("block_extensions", "block_hosts", "allow")
+
+
+def load_blocking(path: str) -> Dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+class BlockProfile:
+    def __init__(self, extensions: List[str], hosts: List[str], allow: List[str]):
+        self.extensions = sorted({e.lower().lstrip(".") for e in extensions})
+        self.hosts = sorted({h.lower().lstrip(".") for h in hosts})
+        self.allow = list(dict.fromkeys(allow))
+        self._ext_re = re.compile(r"\.(%s)$" % "|".join(map(re.escape, self.extensions)), re.IGNORECASE) \
+            if self.extensions else None
+        self._allow_re = re.compile("|".join(f"(?:{a})" for a in self.allow), re.IGNORECASE) if self.allow else None
+
+    @classmethod
+    def for_site(cls, config: Dict, site: str) -> Optional["BlockProfile"]:
+        """Profile for one site after applying its overrides; None if blocking is off for it."""
+        if not config:
+            return None
+        merged = {k: list(config.get(k, [])) for k in LIST_KEYS}
+        enabled = config.get("enabled", True)
+        for pattern, override in config.get("sites", {}).items():
+            if pattern.lower() not in site.lower():
+                continue
+            enabled = override.get("enabled", enabled)
+            for k in LIST_KEYS:
+                merged[k] += override.get(k, [])
+            for k in ("extensions", "hosts"):
+                drop = {v.lower() for v in override.get(f"unblock_{k}", [])}
+                merged[f"block_{k}"] = [v for v in merged[f"block_{k}"] if v.lower() not in drop]
+        if not enabled:
+            return None
+        return cls(merged["block_extensions"], merged["block_hosts"], merged["allow"])
+
+    def allowed(self, url: str) -> bool:
+        return bool(self._allow_re and self._allow_re.search(url))
+
+    def blocks(self, url: str) -> bool:
+        if self.allowed(url):
+            return False
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        if any(host == h or host.endswith("." + h) for h in self.hosts):
+            return True
+        return bool(self._ext_re and self._ext_re.search(parts.path))
+
+    # -- backend specific rules ---------------------------------------------
+    def wire_scopes(self) -> List[str]:
+        """selenium-wire scopes that route blockable requests through the interceptor."""
+        scopes = []
+        if self.extensions:
+            scopes.append(r".*\.(%s)([?#].*)?$" % "|".join(map(re.escape, self.extensions)))
+        if self.hosts:
+            scopes.append(r"^[a-z]+://([^/?#]*\.)?(%s)(:\d+)?([/?#].*)?$" % "|".join(map(re.escape, self.hosts)))
+        return scopes
+
+    def cdp_patterns(self) -> List[str]:
+        """
+        Network.setBlockedURLs wildcard patterns. CDP has no allow-list, so a host
+        that matches an allow pattern is not blocked at all, and extensions are
+        blocked everywhere (allow entries must not rely on those extensions).
+        """
+        patterns = []
+        for ext in self.extensions:
+            patterns += [f"*.{ext}", f"*.{ext}?*"]
+        for host in self.hosts:
+            if self.allowed(f"https://{host}/"):
+                continue
+            patterns += [f"*://{host}/*", f"*://*.{host}/*"]
+        return patterns
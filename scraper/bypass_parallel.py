@@ -1,9 +1,11 @@
 # bypass_parallel.py
 """
 Parallel m3u8 scanner (preserves play-click + iframe/shadow handling + refresh-for-dooball)
-- Each worker opens its own Chrome (selenium-wire) instance
-- Non-dooball: open/close per visit (fresh session) -> implemented as "batched rounds"
+- Workers lease Chrome (selenium-wire) instances from a warm BrowserPool
+- Non-dooball: fresh session per visit (pooled driver is reset between visits)
+- All (site, visit) tasks go through one long-lived executor (no per-round barrier)
 - dooball: open once (actual_visits = 1), run refresh-click loop to collect multiple m3u8
+- per-site phases / timeouts / visits / selectors come from site_strategies.json (SiteStrategy)
 - driver.scopes set to catch only .m3u8
 """
 import time
@@ -11,24 +13,48 @@ import random
 import json
 import re
 import os
+import threading
+import queue
+import functools
+import contextvars
+import contextlib
+import multiprocessing
+from collections import deque
 from datetime import datetime
 from urllib.parse import urlparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Set, Dict, Tuple, List
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Set, Dict, Tuple, List, Optional, Callable
 
 import chromedriver_autoinstaller
-from seleniumwire import webdriver  # pip install selenium-wire
+from selenium import webdriver as selenium_webdriver
+from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.common.exceptions import (
 	ElementClickInterceptedException,
 	ElementNotInteractableException,
 	StaleElementReferenceException,
-	JavascriptException
+	JavascriptException,
+	SessionNotCreatedException
 )
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
-from openpyxl.utils import get_column_letter
+from selenium.webdriver.remote.command import Command
+# seleniumwire (pip install selenium-wire) and openpyxl are imported where first used:
+# they dominate cold-start import time and are not needed before the first wire driver / the export
+
+import fast_path
+import job_browsers
+import startup_profile
+import visit_metrics
+from visit_metrics import span
+from block_profile import BlockProfile, load_blocking
+from mem_sampler import MemorySampler, per_gb
+from site_strategy import SiteStrategy, load_strategies
+
+from selector_stats import SelectorStats, rule_key
+from result_sink import ResultSink, load_requeued, load_stream
+from m3u8_validate import LIVE, VOD, validate_links
+from result_store import ResultStore
+from result_cache import ResultCache
 
 # -----------------------------
 # CONFIG
@@ -39,7 +65,15 @@ SITES = [
 VISITS_PER_SITE = 8
 SELECTORS_FILE = "./selectors.json"
 M3U8_ONLY_SCOPES = True
+M3U8_SCOPE = r".*\.m3u8(\?.*)?$"
+# network blocking profile (images / fonts / segments / ad hosts), per-site overrides inside
+BLOCKING_FILE = "./blocking.json"
+BLOCKING_ENABLED = True
+# network capture backend: "wire" = selenium-wire MITM proxy, "cdp" = DevTools Network events (no proxy)
+CAPTURE_BACKEND = "wire"
 RESULTS_FOLDER = "./results"  # folder สำหรับเก็บผลลัพธ์
+STREAMS_FOLDER = os.path.join(RESULTS_FOLDER, "streams")  # append-only jsonl per job (crash-safe, resumable)
+RESULTS_DB = os.path.join(RESULTS_FOLDER, "links.sqlite")  # indexed store across jobs (None = off)
 
 # Parallel config
 MAX_WORKERS = 5   #max browser
@@ -47,11 +81,79 @@ HEADLESS = False    # set False for debugging / visual
 # play-wait tuning (smaller for speed, increase if unreliable)
 PLAY_WAIT_MIN = 0.8
 PLAY_WAIT_MAX = 1.2
+# evaluate a whole selectors.json group in one execute_script (False = one round trip per rule)
+BATCHED_SELECTORS = True
+# per-site phases / timeouts / visits / selectors; the constants below are the defaults it overrides
+SITE_STRATEGIES_FILE = "./site_strategies.json"
+# fetch the page + iframes over HTTP first and launch Chrome only if no playlist is found there
+FAST_PATH_ENABLED = True
+FAST_PATH_WORKERS = 8   # sites fast-pathed concurrently (once per site, before any browser visit)
+# skip ads: "watcher" = in-page MutationObserver clicks skip buttons as soon as they are enabled,
+# "inline" = old path (parse the countdown, sleep, click) frame by frame
+SKIP_MODE = "watcher"
+AD_PHASE_TIMEOUT = 20   # max seconds the ad phase may hold up the m3u8 wait (it ends at the first m3u8)
+AD_PHASE_QUIET = 1.5    # no skip countdown visible / no click for this long -> ad phase over
+SKIP_POLL = 0.5         # seconds between watcher status reads
+
+# resolved chromedriver path, reused across processes (skips install()'s version probing)
+CHROMEDRIVER_CACHE = "./.chromedriver_path"
+
+# dooball channel loop: "fanout" = channels split over idle pooled browsers, stop after a round with
+# nothing new (dooball then gets refresh.visits = 1 visit per job); "sequential" = old loop in one
+# browser, with the old visits_per_site x max_workers visits
+REFRESH_MODE = "fanout"
+REFRESH_FANOUT = 0   # max browsers per dooball visit (0 = one per refresh button)
+
+# nested iframe depth mapped by the per-page frame-tree snapshot
+FRAME_TREE_DEPTH = 2
+
+# Per-host selector/strategy hit stats (winning rules tried first)
+SELECTOR_STATS_FILE = "./selector_stats.json"
+SELECTOR_SKIP_AFTER = 0   # skip rules that never matched on a host after N visits (0 = never skip)
+
+# Post-capture validation of found m3u8 (live / vod / dead / ad + variant expansion)
+VALIDATE_LINKS = True
+VALIDATE_WORKERS = 8      # concurrent playlist fetches
+VALIDATE_PER_HOST = 2     # concurrent fetches per host
+
+# TTL result cache: sites scanned within the TTL are answered from the cache instead of visited
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_DB = os.path.join(RESULTS_FOLDER, "cache.sqlite")
+RESULT_CACHE_TTL = 10 * 60          # seconds
+RESULT_CACHE_VALIDATE = True        # cached links must still answer as live / vod playlists
+RESULT_CACHE_MAX_SITES = 1000       # size bounds (expired, then least recently used, evicted first)
+RESULT_CACHE_MAX_LINKS = 50000
+
+# Multi-process mode: N shard processes, each with its own threads + browser pool (0 = threads only)
+SHARDS = 0
+MAX_SHARD_RESTARTS = 3    # per shard, crashed shards are restarted with their unfinished visits
+
+# Adaptive wait for m3u8 after play / skip-ads (seconds)
+WAIT_POLICY = {
+	"quiet_window": 3.0,    # stop once m3u8 seen and nothing new arrived for this long
+	"first_timeout": 12.0,  # stop if no m3u8 at all shows up within this long
+	"max_wait": 20.0,       # hard upper bound (new URLs keep extending the wait up to here)
+}
+
+# Browser pool (reuse Chrome + selenium-wire proxy across visits/rounds)
+USE_BROWSER_POOL = True
+POOL_MAX_USES = 20        # retire a driver after N visits
+POOL_MAX_AGE = 15 * 60    # retire a driver after N seconds
+POOL_MAX_ORIGINS = 300    # origins whose storage reset_driver clears; past this many the driver is retired instead
+# tab mode: visits share one Chrome, each in its own browser context (own cookies / cache / storage).
+# 1 = one browser per visit; >1 needs capture=cdp (visits are told apart by the performance log's webview)
+TABS_PER_BROWSER = 1
+TAB_PAGE_LOAD_TIMEOUT = 60  # driver.get in a tab returns at readyState complete or after this long
 
 # -----------------------------
 # Excel helpers
 # -----------------------------
-def export_xlsx(result_m3u8_map: Dict[str, Set[str]], filename=None):
+def export_xlsx(result_m3u8_map: Dict[str, Set[str]] = None, filename=None, validation: Dict[str, Dict] = None,
+				store: ResultStore = None, job_id: str = None):
+	# ถ้าส่ง store + job_id มา ให้ดึงผลของ job นั้นจาก sqlite แทน
+	if result_m3u8_map is None:
+		result_m3u8_map = store.job_results(job_id) if store and job_id else {}
+
 	# สร้าง folder results ถ้ายังไม่มี
 	os.makedirs(RESULTS_FOLDER, exist_ok=True)
 	
@@ -63,19 +165,34 @@ def export_xlsx(result_m3u8_map: Dict[str, Set[str]], filename=None):
 	# รวม path ของ folder กับ filename
 	filepath = os.path.join(RESULTS_FOLDER, filename)
 	
+	from openpyxl import Workbook
+	from openpyxl.styles import Font, Alignment
+	from openpyxl.utils import get_column_letter
+
 	wb = Workbook()
 	ws = wb.active
 	ws.title = "m3u8_links"
 	ws.append(["scanned_site", "m3u8_urls"])
 	for site, links in result_m3u8_map.items():
 		ws.append([site, "\n".join(sorted(links))])
-	for cell in ws[1]:
-		cell.font = Font(bold=True)
-		cell.alignment = Alignment(horizontal="center")
-	for col in range(1, ws.max_column + 1):
-		col_letter = get_column_letter(col)
-		max_len = max(len(str(ws.cell(row=r, column=col).value or "")) for r in range(1, ws.max_row + 1))
-		ws.column_dimensions[col_letter].width = min(max_len + 2, 64)
+
+	# sheet ผลตรวจ link (ถ้ามี validation)
+	if validation:
+		wv = wb.create_sheet("validation")
+		wv.append(["scanned_site", "m3u8_url", "label", "http_status", "latency_ms", "parent_playlist"])
+		url_site = {u: site for site, links in result_m3u8_map.items() for u in links}
+		for url, res in sorted(validation.items(), key=lambda kv: (url_site.get(kv[1].get("parent") or kv[0], ""), kv[0])):
+			site = url_site.get(url) or url_site.get(res.get("parent"), "")
+			wv.append([site, url, res["label"], res["status"], res["latency_ms"], res.get("parent", "")])
+
+	for sheet in wb.worksheets:
+		for cell in sheet[1]:
+			cell.font = Font(bold=True)
+			cell.alignment = Alignment(horizontal="center")
+		for col in range(1, sheet.max_column + 1):
+			col_letter = get_column_letter(col)
+			max_len = max(len(str(sheet.cell(row=r, column=col).value or "")) for r in range(1, sheet.max_row + 1))
+			sheet.column_dimensions[col_letter].width = min(max_len + 2, 64)
 	wb.save(filepath)
 	print(f"✅ Exported result to {filepath}")
 
@@ -130,6 +247,8 @@ def safe_click(driver, element, allow_js_fallback=True):
 				return False
 		return False
 
+selector_stats = SelectorStats(SELECTOR_STATS_FILE, skip_after=SELECTOR_SKIP_AFTER)
+
 def load_selectors(path=SELECTORS_FILE):
 	try:
 		with open(path, "r", encoding="utf-8") as f:
@@ -149,20 +268,279 @@ def normalize_url(url):
 	except Exception:
 		return url.lower().split("?")[0], ""
 
+def url_origin(url: str) -> Optional[str]:
+	"""scheme://host[:port] of an http(s) url, None otherwise."""
+	try:
+		p = urlparse(url or "")
+	except ValueError:
+		return None
+	if p.scheme not in ("http", "https") or not p.netloc:
+		return None
+	return f"{p.scheme}://{p.netloc.rsplit('@', 1)[-1]}".lower()
+
 def is_m3u8(url: str) -> bool:
 	u, _ = normalize_url(url)
 	return u.endswith(".m3u8")
 
-def capture_network(driver):
-	found = []
-	for request in getattr(driver, "requests", []):
+class M3u8Capture:
+	"""
+	Per-driver m3u8 queue fed by selenium-wire's request interceptor (proxy thread).
+	- new_urls(): URLs first seen since the previous call -> O(new), no rescan of driver.requests
+	- wait_next(timeout): block until the next new m3u8 arrives, None on timeout
+	"""
+	backend = "wire"
+
+	def __init__(self, driver=None):
+		self.driver = driver
+		self._queue: "queue.Queue[str]" = queue.Queue()
+		self._seen: Set[str] = set()
+		self._lock = threading.Lock()
+		self.first_at: Optional[float] = None  # monotonic time of first m3u8 since reset
+		self.on_new: Optional[Callable[[str], None]] = None  # per-visit listener (result stream)
+		self.blocker: Optional[BlockProfile] = None  # set per visit by apply_blocking()
+		self.blocked = 0
+		self.origins: Set[str] = set()  # origins of the documents the visit loaded (cdp only, see reset_driver)
+
+	def note_origin(self, url: str):
+		origin = url_origin(url)
+		if origin:
+			self.origins.add(origin)
+
+	def push(self, url: str):
+		if not url or not is_m3u8(url):
+			return
+		with self._lock:
+			if url in self._seen:
+				return
+			self._seen.add(url)
+			if self.first_at is None:
+				self.first_at = time.monotonic()
+		self._queue.put(url)
+		if self.on_new:
+			try:
+				self.on_new(url)
+			except Exception as e:
+				print(f"[WARN] result stream write failed: {e}")
+
+	def pump(self):
+		"""Pull pending events from the backend (push-based backends have nothing to do)."""
+		pass
+
+	def new_urls(self) -> List[str]:
+		self.pump()
+		found = []
+		while True:
+			try:
+				found.append(self._queue.get_nowait())
+			except queue.Empty:
+				return found
+
+	def wait_next(self, timeout: float) -> Optional[str]:
+		try:
+			return self._queue.get(timeout=max(timeout, 0))
+		except queue.Empty:
+			return None
+
+	def discard_storage(self):
+		"""Free what the backend buffered so far (selenium-wire request storage)."""
 		try:
-			u = request.url
-			if u and is_m3u8(u):
-				found.append(u)
+			del self.driver.requests
 		except Exception:
-			continue
-	return found
+			pass
+
+	def reset(self):
+		self.discard_storage()
+		with self._lock:
+			self._seen.clear()
+			self.first_at = None
+			self.on_new = None
+			self.blocked = 0
+		self.new_urls()
+		self.origins.clear()
+
+class CdpM3u8Capture(M3u8Capture):
+	"""
+	Proxy-less backend: reads Chrome DevTools Network events (requestWillBeSent /
+	responseReceived) from the chromedriver performance log. Only entries that
+	mention m3u8 are JSON-decoded, so each pump costs O(new log entries).
+	"""
+	backend = "cdp"
+	NETWORK_EVENTS = ("Network.requestWillBeSent", "Network.responseReceived")
+
+	def __init__(self, driver=None, poll_interval: float = 0.25):
+		super().__init__(driver)
+		self.poll_interval = poll_interval
+		self._pump_lock = threading.Lock()
+
+	def pump(self):
+		with self._pump_lock:
+			try:
+				entries = self.driver.get_log("performance")
+			except Exception:
+				return
+		for entry in entries:
+			self.handle_log_entry(entry)
+
+	def handle_log_entry(self, entry: dict):
+		raw = entry.get("message", "")
+		document = "Network.requestWillBeSent" in raw and '"Document"' in raw
+		if "m3u8" not in raw and not document:
+			return
+		try:
+			msg = json.loads(raw)["message"]
+		except Exception:
+			return
+		if document and msg.get("params", {}).get("type") == "Document":
+			# frame navigations: the origins that may have left storage behind
+			self.note_origin(msg["params"].get("request", {}).get("url", ""))
+		self.handle_message(msg)
+
+	def handle_message(self, msg: dict):
+		if msg.get("method") not in self.NETWORK_EVENTS:
+			return
+		params = msg.get("params", {})
+		self.push((params.get("request") or params.get("response") or {}).get("url", ""))
+
+	def wait_next(self, timeout: float) -> Optional[str]:
+		deadline = time.monotonic() + max(timeout, 0)
+		while True:
+			try:
+				return self._queue.get_nowait()
+			except queue.Empty:
+				pass
+			remaining = deadline - time.monotonic()
+			if remaining <= 0:
+				return None
+			time.sleep(min(self.poll_interval, remaining))
+			self.pump()
+
+	def discard_storage(self):
+		self.pump()
+
+def attach_capture(driver) -> M3u8Capture:
+	capture = getattr(driver, "m3u8_capture", None)
+	if capture is None:
+		capture = M3u8Capture(driver)
+		driver.m3u8_capture = capture
+
+		def interceptor(request):
+			blocker = capture.blocker
+			if blocker is not None and blocker.blocks(request.url):
+				capture.blocked += 1
+				request.abort()
+				return
+			capture.push(request.url)
+
+		driver.request_interceptor = interceptor
+	return capture
+
+def apply_blocking(driver, profile: Optional[BlockProfile]):
+	"""
+	Install the visit's blocking profile (None = block nothing).
+	wire: widen the scopes so blockable requests reach the interceptor, which aborts them.
+	cdp: Network.setBlockedURLs (wildcards, enforced inside Chrome).
+	"""
+	capture = attach_capture(driver)
+	capture.blocker = profile
+	if capture.backend == "cdp":
+		driver.execute_cdp_cmd("Network.enable", {})
+		driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": profile.cdp_patterns() if profile else []})
+	elif M3U8_ONLY_SCOPES:
+		driver.scopes = [M3U8_SCOPE] + (profile.wire_scopes() if profile else [])
+
+_PAGE_LOAD_JS = """
+const nav = performance.getEntriesByType('navigation')[0];
+const res = performance.getEntriesByType('resource');
+let bytes = nav ? nav.transferSize : 0;
+for (const r of res) bytes += r.transferSize || 0;
+return {
+	load_ms: nav && nav.loadEventEnd > 0 ? nav.loadEventEnd - nav.startTime : null,
+	dcl_ms: nav && nav.domContentLoadedEventEnd > 0 ? nav.domContentLoadedEventEnd - nav.startTime : null,
+	bytes: bytes,
+	requests: res.length
+};
+"""
+
+def page_load_stats(driver) -> Dict[str, float]:
+	"""
+	Top document's navigation + resource timing: load time and bytes transferred.
+	Cross-origin resources without Timing-Allow-Origin report 0 bytes, so this is a lower bound.
+	"""
+	driver.switch_to.default_content()
+	return driver.execute_script(_PAGE_LOAD_JS) or {}
+
+def capture_network(driver) -> List[str]:
+	"""m3u8 URLs seen by this driver since the previous call."""
+	return attach_capture(driver).new_urls()
+
+def wait_for_next_m3u8(driver, timeout: float) -> Optional[str]:
+	"""Block until a new m3u8 is captured (or timeout); returns the URL or None."""
+	return attach_capture(driver).wait_next(timeout)
+
+def strategy_defaults() -> Dict:
+	"""Code defaults every site strategy starts from (site_strategies.json overrides them)."""
+	return {
+		"phases": ["center_iframe", "activate_player", "play_click", "skip_ads", "wait_m3u8", "final_capture"],
+		"fast_path": FAST_PATH_ENABLED,
+		"skip_ads": SKIP_MODE,
+		"initial_pause": [1.0, 2.2],
+		"ad_phase_timeout": AD_PHASE_TIMEOUT,
+		"wait": dict(WAIT_POLICY),
+		"refresh": {"mode": REFRESH_MODE, "rounds": 6, "delay": 3, "lanes": REFRESH_FANOUT},
+	}
+
+def site_strategy(site: str, config: Optional[Dict] = None) -> SiteStrategy:
+	if config is None:
+		config = load_strategies(SITE_STRATEGIES_FILE)
+	return SiteStrategy.for_site(config, site, strategy_defaults())
+
+def wait_for_m3u8(driver, found_set: Set[str], policy: Dict[str, float], ad: Optional["AdPhase"] = None) -> Dict[str, float]:
+	"""
+	Condition-based wait instead of a fixed sleep schedule:
+	- exit early once m3u8 has appeared and nothing new arrived within quiet_window
+	- every new URL extends the wait (traffic still ramping up), bounded by max_wait
+	- give up after first_timeout if no m3u8 ever appears
+	- ad: the skip watchers' ad phase runs inside the wait (ticked between captures) and
+	  ends at the first m3u8; time spent in an actual ad does not count against
+	  first_timeout / max_wait, as it did when the ad phase ran before the wait
+	Returns {"waited": seconds, "new": count, "reason": ...} for tuning.
+	"""
+	start = time.monotonic()
+	last_new = start if found_set else None  # m3u8 already seen before the wait
+	new = 0
+	while True:
+		poll_in = ad.tick() if ad is not None else None
+		now = time.monotonic()
+		base = start + (ad.ad_seconds() if ad is not None else 0.0)
+		hard_stop = base + policy["max_wait"]
+		if now >= hard_stop:
+			reason = "max_wait"
+			break
+		if last_new is None:
+			if now - base >= policy["first_timeout"]:
+				reason = "no_traffic"
+				break
+			until = base + policy["first_timeout"]
+		else:
+			if now - last_new >= policy["quiet_window"]:
+				reason = "quiet"
+				break
+			until = last_new + policy["quiet_window"]
+		if poll_in is not None:
+			until = min(until, now + poll_in)
+
+		u = wait_for_next_m3u8(driver, min(until, hard_stop) - now)
+		if u and u not in found_set:
+			found_set.add(u)
+			new += 1
+			last_new = time.monotonic()
+			print(f"   [net] +1 new after {last_new - start:.1f}s")
+		elif u and last_new is None:
+			last_new = time.monotonic()
+
+	waited = time.monotonic() - start
+	print(f"   [wait] {waited:.1f}s, +{new} new ({reason})")
+	return {"waited": waited, "new": new, "reason": reason}
 
 # -----------------------------
 # dooball aggressive skip helper
@@ -192,27 +570,25 @@ def ensure_stream_start(driver):
 		return True
 
 	# 2) iframe
-	iframes = driver.find_elements(By.TAG_NAME, "iframe")
-	for f in iframes:
+	tree = frame_tree(driver)
+	for node in tree.frames(max_depth=1):
 		try:
-			driver.switch_to.frame(f)
-			if click_video():
-				driver.switch_to.default_content()
+			if tree.enter(node) and click_video():
+				tree.leave()
 				return True
-			driver.switch_to.default_content()
 		except Exception:
-			try:
-				driver.switch_to.default_content()
-			except Exception:
-				pass
+			pass
+		tree.leave()
 
 	return False
 
-def for_each_context(driver):
+def for_each_context(driver, max_depth=1):
+	"""Yields None for the main page, then enters each snapshot frame in turn (caller leaves)."""
 	yield None  # main page
-	iframes = driver.find_elements(By.TAG_NAME, "iframe")
-	for iframe in iframes:
-		yield iframe
+	tree = frame_tree(driver)
+	for node in tree.frames(max_depth=max_depth):
+		if tree.enter(node):
+			yield node
 
 def force_skip_via_js(driver):
 	try:
@@ -234,50 +610,173 @@ def handle_skip_ads_dooball(driver, selectors, rounds=2):
 	for _ in range(rounds):
 		for iframe in for_each_context(driver):
 			try:
-				if iframe:
-					driver.switch_to.frame(iframe)
-
 				force_skip_via_js(driver)
 
-				for sel in selectors.get("skip_ads_button", []):
-					elements = find_elements_by_selector(driver, sel)
-					for el in elements:
-						try:
-							enable_and_click(driver, el)
-						except Exception:
-							continue
-
-				if iframe:
-					driver.switch_to.default_content()
+				for m in find_elements_by_group(driver, selectors, "skip_ads_button"):
+					try:
+						if enable_and_click(driver, m["el"]):
+							selector_stats.hit("skip_ads_button", rule_key(m["rule"]))
+					except Exception:
+						continue
 			except Exception:
-				try:
-					driver.switch_to.default_content()
-				except Exception:
-					pass
+				pass
+		frame_tree(driver).leave()
 
 		time.sleep(0.6)
 
 # -----------------------------
 # iframe / shadow helpers
 # -----------------------------
+# Runs in every mapped context: reports [href, generation, [[iframe, src], ...]] and
+# installs a MutationObserver that bumps the generation when the iframe set changes
+# (same-origin child frames also bump the top window's generation).
+_FRAME_SCAN_JS = """
+if (!window.__lsFrameObs) {
+	window.__lsFrameGen = window.__lsFrameGen || 0;
+	const bump = () => {
+		window.__lsFrameGen++;
+		try { if (window.top !== window) window.top.__lsFrameGen = (window.top.__lsFrameGen || 0) + 1; } catch (e) {}
+	};
+	const touchesFrames = (n) => n.nodeType === 1 && (n.tagName === 'IFRAME' || (n.querySelector && n.querySelector('iframe')));
+	window.__lsFrameObs = new MutationObserver((muts) => {
+		for (const m of muts) {
+			if (m.type === 'attributes' ? m.target.tagName === 'IFRAME'
+				: Array.from(m.addedNodes).some(touchesFrames) || Array.from(m.removedNodes).some(touchesFrames)) {
+				bump();
+				return;
+			}
+		}
+	});
+	window.__lsFrameObs.observe(document.documentElement, {childList: true, subtree: true, attributes: true, attributeFilter: ['src']});
+}
+return [location.href, window.__lsFrameGen, Array.from(document.getElementsByTagName('iframe')).map(f => [f, f.src || ''])];
+"""
+# [href, generation] of the current context; generation is null once the frame navigated (observer gone)
+_FRAME_GEN_JS = "return [location.href, window.__lsFrameObs ? window.__lsFrameGen : null];"
+
+class FrameTree:
+	"""
+	Snapshot of the nested iframe tree of the current page, mapped once per page state.
+	- nodes: DFS order, {"path": [iframe WebElement per level], "depth": 1.., "src": str,
+	  "state": (href, gen) when the frame itself was scanned}
+	- stays valid until navigation (href change) or the MutationObserver reports a
+	  changed frame set; frames() only checks the top document, each scanned frame is
+	  checked by enter() once the caller is inside it anyway (a cross-origin player
+	  frame cannot bump the top generation), so the check adds no frame switches
+	- a frame whose state changed is still entered (its element is live), the tree is
+	  re-mapped on the next frames() call
+	- switches: number of frame switches done through this tree (per visit counter)
+	"""
+	def __init__(self, driver, max_depth: int = FRAME_TREE_DEPTH):
+		self.driver = driver
+		self.max_depth = max_depth
+		self.nodes: List[Dict] = []
+		self.switches = 0
+		self._top_state = None  # (href, gen) of the top document when mapped, None = map again
+		self._current: List = []  # path of the context we are in ([] = top)
+
+	def _switch(self, el):
+		self.switches += 1
+		self.driver.switch_to.frame(el)
+
+	def leave(self):
+		self._current = []
+		switch_back_to_default(self.driver)
+
+	def invalidate(self):
+		self._top_state = None
+
+	def _scan(self, path: List, depth: int, parent: Optional[Dict] = None):
+		href, gen, frames = self.driver.execute_script(_FRAME_SCAN_JS)
+		if parent is None:
+			self._top_state = (href, gen)
+		else:
+			parent["state"] = (href, gen)
+		for el, src in frames or []:
+			node = {"path": path + [el], "depth": depth, "src": src, "state": None}
+			self.nodes.append(node)
+			if depth < self.max_depth:
+				try:
+					self._switch(el)
+					self._current = node["path"]
+					self._scan(node["path"], depth + 1, node)
+				except Exception:
+					pass
+				self.leave()
+				for parent_el in path:
+					self._switch(parent_el)
+				self._current = list(path)
+
+	def _same_state(self, state) -> bool:
+		"""The current context still reports the href / generation it had when mapped."""
+		try:
+			return tuple(self.driver.execute_script(_FRAME_GEN_JS)) == state
+		except Exception:
+			return False
+
+	def refresh(self):
+		"""Re-map the tree if the top document changed (or a frame was seen changed) since the last snapshot."""
+		self.leave()
+		if self._top_state is not None and self._same_state(self._top_state):
+			return self
+		self.nodes = []
+		try:
+			self._scan([], 1)
+		except Exception:
+			self._top_state = None
+		self.leave()
+		return self
+
+	def frames(self, max_depth: Optional[int] = None) -> List[Dict]:
+		self.refresh()
+		limit = self.max_depth if max_depth is None else max_depth
+		return [n for n in self.nodes if n["depth"] <= limit]
+
+	def enter(self, node) -> bool:
+		"""Switch into node; reuses the current context when it is an ancestor."""
+		path = node["path"]
+		try:
+			if self._current and path[:len(self._current)] == self._current:
+				rest = path[len(self._current):]
+			else:
+				switch_back_to_default(self.driver)
+				rest = path
+			for el in rest:
+				self._switch(el)
+			self._current = list(path)
+		except Exception:
+			# stale frame element -> map again next time
+			self.invalidate()
+			self.leave()
+			return False
+		if node.get("state") is not None and not self._same_state(node["state"]):
+			self.invalidate()
+		return True
+
+def frame_tree(driver) -> FrameTree:
+	tree = getattr(driver, "frame_tree", None)
+	if tree is None:
+		tree = FrameTree(driver)
+		driver.frame_tree = tree
+	return tree
+
 def activate_player(driver):
-	iframes = []
+	tree = frame_tree(driver)
+	top_frames = tree.frames(max_depth=1)
 
-	try:
-		iframes = driver.find_elements(By.TAG_NAME, "iframe")
-		for f in iframes:
-			try:
-				scroll_into_view(driver, f)
-				driver.execute_script("arguments[0].click();", f)
-				human_pause(0.3, 0.6)
-			except Exception:
-				pass
-	except Exception:
-		pass
+	for node in top_frames:
+		try:
+			f = node["path"][0]
+			scroll_into_view(driver, f)
+			driver.execute_script("arguments[0].click();", f)
+			human_pause(0.3, 0.6)
+		except Exception:
+			pass
 
-	for f in iframes:
+	for node in top_frames:
 		try:
-			driver.switch_to.frame(f)
+			if not tree.enter(node):
+				continue
 
 			# click body
 			try:
@@ -294,13 +793,9 @@ def activate_player(driver):
 					safe_click(driver, v)
 			except Exception:
 				pass
-
-			driver.switch_to.default_content()
 		except Exception:
-			try:
-				driver.switch_to.default_content()
-			except Exception:
-				pass
+			pass
+	tree.leave()
 
 def find_elements_by_selector(driver, sel):
 	found = []
@@ -338,6 +833,96 @@ def find_elements_by_selector(driver, sel):
 
 	return found
 
+# -----------------------------
+# batched selector engine (one execute_script per selectors.json group)
+# -----------------------------
+_GROUP_JS_PRELUDE = """
+const out = [];
+const seen = new Set();
+const add = (i, el) => {
+	if (!el || el.nodeType !== 1 || seen.has(el)) return;
+	seen.add(el);
+	out.push([i, el, (el.innerText || el.textContent || '').trim().slice(0, 200), !!(el.disabled || el.hasAttribute('disabled'))]);
+};
+const asList = (v) => v == null ? [] : (v.length !== undefined && v.nodeType === undefined ? Array.from(v) : [v]);
+const xpath = (expr) => {
+	const r = document.evaluate(expr, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+	const l = [];
+	for (let k = 0; k < r.snapshotLength; k++) l.push(r.snapshotItem(k));
+	return l;
+};
+let kwCandidates = null;
+const keyword = (kw) => {
+	if (kwCandidates === null) {
+		kwCandidates = Array.from(document.querySelectorAll('button, div, span'))
+			.map(el => [el, (el.innerText || '').toLowerCase()]);
+	}
+	return kwCandidates.filter(c => c[1].includes(kw)).map(c => c[0]);
+};
+"""
+
+_group_js_cache: Dict[str, str] = {}
+
+def compile_selector_group(rules: List[dict]) -> str:
+	"""
+	Compile a list of selectors.json rules (css / xpath / id / js / keyword) into one
+	script; "js" rules are inlined as code so no eval is needed inside the page.
+	The script returns [[rule_index, element, text, disabled], ...] (elements deduplicated).
+	"""
+	key = json.dumps(rules, sort_keys=True, ensure_ascii=False)
+	script = _group_js_cache.get(key)
+	if script is not None:
+		return script
+
+	parts = [_GROUP_JS_PRELUDE]
+	for i, sel in enumerate(rules):
+		sel_type = sel.get("type")
+		value = sel.get("value") or ""
+		if sel_type == "css":
+			expr = f"document.querySelectorAll({json.dumps(value)})"
+		elif sel_type == "xpath":
+			expr = f"xpath({json.dumps(value)})"
+		elif sel_type == "id":
+			expr = f"document.getElementById({json.dumps(value)})"
+		elif sel_type == "js":
+			expr = f"({value})"
+		elif sel_type == "keyword":
+			expr = f"keyword({json.dumps(value.lower())})"
+		else:
+			continue
+		parts.append(f"try {{ asList({expr}).forEach(el => add({i}, el)); }} catch (e) {{}}")
+	parts.append("return out;")
+	script = "\n".join(parts)
+	_group_js_cache[key] = script
+	return script
+
+def find_elements_by_group(driver, selectors: dict, group: str) -> List[Dict]:
+	"""
+	Evaluate all rules of one group in the current browsing context.
+	Rules are ordered by per-host hit stats, so matches of winning rules come first.
+	Returns [{"rule": sel, "el": WebElement, "text": str, "disabled": bool}, ...].
+	"""
+	matches = []
+	rules = selector_stats.order(group, selectors.get(group, []), rule_key)
+	if not rules:
+		return matches
+	for sel in rules:
+		selector_stats.attempt(group, rule_key(sel))
+
+	if not BATCHED_SELECTORS:
+		for sel in rules:
+			for el in find_elements_by_selector(driver, sel):
+				matches.append({"rule": sel, "el": el, "text": None, "disabled": None})
+		return matches
+
+	try:
+		rows = driver.execute_script(compile_selector_group(rules)) or []
+	except Exception:
+		return matches
+	for i, el, text, disabled in rows:
+		matches.append({"rule": rules[i], "el": el, "text": text, "disabled": disabled})
+	return matches
+
 def enable_and_click(driver, el):
 	try:
 		driver.execute_script("""
@@ -352,37 +937,36 @@ def enable_and_click(driver, el):
 	return safe_click(driver, el)
 
 def try_skip_in_current_context(driver, selectors, max_wait=10):
-	skip_selectors = selectors.get("skip_ads_button", [])
 	clicked_any = False
 
-	for sel in skip_selectors:
-		elements = find_elements_by_selector(driver, sel)
-
-		for el in elements:
-			try:
-				text = el.text or ""
+	for match in find_elements_by_group(driver, selectors, "skip_ads_button"):
+		el = match["el"]
+		try:
+			text = match["text"] if match["text"] is not None else (el.text or "")
 
-				# ถ้ามี countdown ในข้อความ
-				m = re.search(r"(\d+)", text)
-				if m:
-					wait_time = min(int(m.group(1)), max_wait)
-					time.sleep(wait_time)
+			# ถ้ามี countdown ในข้อความ
+			m = re.search(r"(\d+)", text)
+			if m:
+				wait_time = min(int(m.group(1)), max_wait)
+				time.sleep(wait_time)
 
-				# ถ้า disabled → enable
-				try:
-					if el.get_attribute("disabled"):
-						enable_and_click(driver, el)
-					else:
-						safe_click(driver, el)
-				except Exception:
+			# ถ้า disabled → enable
+			try:
+				disabled = match["disabled"] if match["disabled"] is not None else el.get_attribute("disabled")
+				if disabled:
 					enable_and_click(driver, el)
+				else:
+					safe_click(driver, el)
+			except Exception:
+				enable_and_click(driver, el)
 
-				human_pause(0.4, 0.8)
-				safe_click(driver, el)  # click ซ้ำ กัน delay
+			human_pause(0.4, 0.8)
+			safe_click(driver, el)  # click ซ้ำ กัน delay
 
-				clicked_any = True
-			except Exception:
-				continue
+			selector_stats.hit("skip_ads_button", rule_key(match["rule"]))
+			clicked_any = True
+		except Exception:
+			continue
 
 	return clicked_any
 
@@ -397,34 +981,215 @@ def handle_skip_ads(driver, selectors, iframe_depth=2):
 	except Exception:
 		pass
 
-	# 2️⃣ iframe
-	def recurse_iframe(depth):
-		if depth <= 0:
-			return
-
-		iframes = driver.find_elements(By.TAG_NAME, "iframe")
-		for iframe in iframes:
-			try:
-				driver.switch_to.frame(iframe)
+	# 2️⃣ iframe (snapshot is DFS ordered -> same order as the old recursion)
+	tree = frame_tree(driver)
+	for node in tree.frames(max_depth=iframe_depth):
+		try:
+			if tree.enter(node):
 				try_skip_in_current_context(driver, selectors)
-				recurse_iframe(depth - 1)
-				driver.switch_to.parent_frame()
-			except Exception:
-				try:
-					driver.switch_to.parent_frame()
-				except Exception:
-					pass
+		except Exception:
+			pass
+	tree.leave()
 
-	recurse_iframe(iframe_depth)
+# -----------------------------
+# skip ads: in-page watcher (event driven)
+# -----------------------------
+_SKIP_WATCHER_JS = """
+(function () {
+	if (window.__lsSkip) return;
+	const find = function () { /*FIND*/ };
+	const st = window.__lsSkip = {clicked: 0, active: 0, ever: false, lastActivity: Date.now(), hits: {}};
+	const tries = new WeakMap();
+	const visible = (el) => {
+		const r = el.getBoundingClientRect();
+		const cs = getComputedStyle(el);
+		return r.width > 0 && r.height > 0 && cs.visibility !== 'hidden' && cs.display !== 'none';
+	};
+	// label still counting down: "Skip ad in 5", "Skip 5s", "ข้ามได้ใน 5 วินาที"; an ad pod
+	// position ("Skip Ad 1 of 2") is not a countdown
+	const countdown = (text) => {
+		const t = (text || '').replace(/\\d+\\s*(of|\\/|จาก)\\s*\\d+/gi, ' ');
+		return /(\\bin|ใน)\\s*\\d+/i.test(t) || /\\d+\\s*(s|secs?|seconds?|วินาที)?\\s*$/i.test(t);
+	};
+	const ready = (el, text) => !(el.disabled || el.hasAttribute('disabled') ||
+		el.getAttribute('aria-disabled') === 'true') && !countdown(text);
+	let scheduled = false;
+	const scan = () => {
+		scheduled = false;
+		let rows;
+		try { rows = find(); } catch (e) { return; }
+		rows = rows.filter(([i, el]) => el.isConnected && visible(el));
+		// innermost matches only: a wrapper around the skip button matches the keyword too
+		rows = rows.filter(([i, el]) => !rows.some(([j, other]) => other !== el && el.contains(other)));
+		let active = 0;  // skip buttons still counting down; ready ones are clicked, not waited for
+		for (const [i, el, text] of rows) {
+			if (!ready(el, text)) {
+				active++;
+				continue;
+			}
+			const t = tries.get(el) || {n: 0, at: 0};
+			if (t.n >= 3 || Date.now() - t.at < 500) continue;
+			tries.set(el, {n: t.n + 1, at: Date.now()});
+			try {
+				el.click();
+				st.clicked++;
+				st.hits[i] = (st.hits[i] || 0) + 1;
+				st.lastActivity = Date.now();
+			} catch (e) {}
+		}
+		if (active !== st.active) st.lastActivity = Date.now();
+		if (active) st.ever = true;
+		st.active = active;
+	};
+	const schedule = () => {
+		if (!scheduled) { scheduled = true; setTimeout(scan, 50); }
+	};
+	const start = () => {
+		new MutationObserver(schedule).observe(document.documentElement, {
+			subtree: true, childList: true, characterData: true, attributes: true,
+			attributeFilter: ['disabled', 'aria-disabled', 'class', 'style', 'hidden']
+		});
+		setInterval(schedule, 500);  // countdowns driven by timers / canvas without DOM mutations
+		schedule();
+	};
+	if (document.documentElement) start(); else document.addEventListener('DOMContentLoaded', start);
+})();
+"""
 
-def try_switch_to_any_iframe(driver):
-	iframes = driver.find_elements(By.TAG_NAME, "iframe")
-	for f in iframes:
+_SKIP_STATUS_JS = """
+const s = window.__lsSkip;
+if (!s) return null;
+const out = {clicked: s.clicked, active: s.active, ever: s.ever, since: Date.now() - s.lastActivity, hits: s.hits};
+s.hits = {};
+return out;
+"""
+
+def skip_watcher_script(rules: List[dict]) -> str:
+	"""Watcher source for one rule order; the group matcher is the batched selector engine's."""
+	return _SKIP_WATCHER_JS.replace("/*FIND*/", compile_selector_group(rules))
+
+def install_skip_watcher(driver, selectors) -> List[dict]:
+	"""
+	Register the watcher for every document the page (and its same-process frames)
+	loads from now on; cross-process frames get it from the first poll.
+	Returns the rule order the watcher was compiled with (maps hits back to rules).
+	"""
+	rules = selector_stats.order("skip_ads_button", selectors.get("skip_ads_button", []), rule_key)
+	remove_skip_watcher(driver)
+	driver.skip_watcher = {"rules": rules, "script": skip_watcher_script(rules), "id": None}
+	if rules:
+		res = driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": driver.skip_watcher["script"]})
+		driver.skip_watcher["id"] = (res or {}).get("identifier")
+	return rules
+
+def remove_skip_watcher(driver):
+	watcher = getattr(driver, "skip_watcher", None)
+	driver.skip_watcher = None
+	if watcher and watcher.get("id"):
 		try:
-			driver.switch_to.frame(f)
-			return f
+			driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": watcher["id"]})
 		except Exception:
+			pass
+
+def poll_skip_watchers(driver, iframe_depth=2) -> Dict[str, float]:
+	"""
+	One pass over the page and its frames: install the watcher where it is missing
+	and read its state. Returns {"clicked", "active", "since" (seconds), "ever"}.
+	"""
+	watcher = getattr(driver, "skip_watcher", None)
+	total = {"clicked": 0, "active": 0, "since": float("inf"), "ever": False}
+	if not watcher or not watcher["rules"]:
+		return total
+	script = watcher["script"] + "\n" + _SKIP_STATUS_JS
+	for _ in for_each_context(driver, max_depth=iframe_depth):
+		try:
+			st = driver.execute_script(script)
+		except Exception:
+			continue
+		if not st:
 			continue
+		total["clicked"] += st["clicked"]
+		total["active"] += st["active"]
+		total["ever"] = total["ever"] or st["ever"]
+		total["since"] = min(total["since"], st["since"] / 1000)
+		for i, n in (st.get("hits") or {}).items():
+			if n:
+				selector_stats.hit("skip_ads_button", rule_key(watcher["rules"][int(i)]))
+	frame_tree(driver).leave()
+	return total
+
+class AdPhase:
+	"""
+	Ad phase of one visit, advanced by tick() from whatever wait loop is running
+	(wait_for_m3u8, or wait_ad_phase on its own). The watchers click on their own;
+	the phase is over at the first captured m3u8, when no skip countdown is visible
+	and nothing was clicked for `quiet` seconds, or after `timeout`.
+	"""
+	def __init__(self, driver, timeout: float = AD_PHASE_TIMEOUT, quiet: float = AD_PHASE_QUIET):
+		self.driver = driver
+		self.timeout = timeout
+		self.quiet = quiet
+		self.start = time.monotonic()
+		self.ended: Optional[float] = None
+		self.reason: Optional[str] = None  # "stream" | "no_ads" | "skipped" | "timeout"
+		self.clicked = 0
+		self.ever = False
+		self._next_poll = self.start
+
+	def _end(self, reason: str) -> None:
+		self.reason = reason
+		self.ended = time.monotonic()
+		return None
+
+	def tick(self) -> Optional[float]:
+		"""Polls the watchers when due; returns seconds until the next poll, None once the phase is over."""
+		if self.reason is not None:
+			return None
+		capture = attach_capture(self.driver)
+		capture.pump()
+		if capture.first_at is not None:
+			return self._end("stream")
+		now = time.monotonic()
+		if now < self._next_poll:
+			return self._next_poll - now
+		st = poll_skip_watchers(self.driver)
+		self.clicked = st["clicked"]
+		self.ever = self.ever or st["ever"] or st["clicked"] > 0
+		elapsed = time.monotonic() - self.start
+		if st["active"] == 0 and min(st["since"], elapsed) >= self.quiet:
+			return self._end("skipped" if self.ever else "no_ads")
+		if elapsed >= self.timeout:
+			return self._end("timeout")
+		self._next_poll = time.monotonic() + SKIP_POLL
+		return SKIP_POLL
+
+	def ad_seconds(self) -> float:
+		"""Time spent in an actual ad (a skip button was seen), 0 when there was none."""
+		if not self.ever:
+			return 0.0
+		return (self.ended or time.monotonic()) - self.start
+
+	def result(self) -> Dict:
+		return {"waited": round((self.ended or time.monotonic()) - self.start, 2), "clicked": self.clicked,
+				"reason": self.reason or "cut"}
+
+def wait_ad_phase(driver, timeout: float = AD_PHASE_TIMEOUT, quiet: float = AD_PHASE_QUIET) -> Dict[str, float]:
+	"""
+	Ad phase on its own (strategies without the wait_m3u8 phase; otherwise it runs inside wait_for_m3u8).
+	Returns {"waited", "clicked", "reason": "stream" | "no_ads" | "skipped" | "timeout"}.
+	"""
+	ad = AdPhase(driver, timeout, quiet)
+	while True:
+		delay = ad.tick()
+		if delay is None:
+			return ad.result()
+		time.sleep(delay)
+
+def try_switch_to_any_iframe(driver):
+	tree = frame_tree(driver)
+	for node in tree.frames(max_depth=1):
+		if tree.enter(node):
+			return node["path"][0]
 	return None
 
 def switch_back_to_default(driver):
@@ -463,104 +1228,164 @@ def attempt_click_in_shadow(driver, host_selector, inner_selector):
 # -----------------------------
 # click_media_play_button (comprehensive)
 # -----------------------------
-def click_media_play_button(driver, selectors: dict, timeout=10) -> bool:
-	"""
-	Try multiple strategies to start the live player:
-	1) direct visible buttons containing 'play'
-	2) click <video> elements
-	3) try inside iframes (switch into each iframe and repeat)
-	4) shadow DOM media-player attempts
-	Returns True if any click succeeded.
-	"""
-	# 1) direct 'play' button (text/aria)
+PLAY_BUTTON_XPATH = (
+	"//button[contains(translate(@aria-label,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'play') or "
+	"contains(translate(text(),'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'play')]"
+)
+
+def _click_first(driver, elements, scroll=False) -> bool:
+	for el in elements:
+		try:
+			if scroll:
+				scroll_into_view(driver, el)
+			if safe_click(driver, el):
+				return True
+		except Exception:
+			continue
+	return False
+
+def play_via_button(driver) -> bool:
+	"""direct 'play' button (text/aria)"""
 	try:
-		btns = driver.find_elements(By.XPATH,
-			"//button[contains(translate(@aria-label,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'play') or "
-			"contains(translate(text(),'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'play')]")
-		for b in btns:
-			try:
-				if safe_click(driver, b):
-					human_pause_long(PLAY_WAIT_MIN, PLAY_WAIT_MAX)
-					return True
-			except Exception:
-				continue
+		return _click_first(driver, driver.find_elements(By.XPATH, PLAY_BUTTON_XPATH))
 	except Exception:
-		pass
+		return False
 
-	# 2) video elements on page
+def play_via_video(driver) -> bool:
+	"""video elements on page"""
 	try:
-		vids = driver.find_elements(By.TAG_NAME, "video")
-		for v in vids:
-			try:
-				scroll_into_view(driver, v)
-				if safe_click(driver, v):
-					human_pause_long(PLAY_WAIT_MIN, PLAY_WAIT_MAX)
-					return True
-			except Exception:
-				continue
+		return _click_first(driver, driver.find_elements(By.TAG_NAME, "video"), scroll=True)
 	except Exception:
-		pass
-
-	# 3) try inside each iframe (some players live in nested frames)
-	iframes = driver.find_elements(By.TAG_NAME, "iframe")
-	for f in iframes:
-		try:
-			driver.switch_to.frame(f)
-			# try video elements inside iframe
-			try:
-				vids = driver.find_elements(By.TAG_NAME, "video")
-				for v in vids:
-					try:
-						scroll_into_view(driver, v)
-						if safe_click(driver, v):
-							switch_back_to_default(driver)
-							human_pause_long(PLAY_WAIT_MIN, PLAY_WAIT_MAX)
-							return True
-					except Exception:
-						continue
-			except Exception:
-				pass
-
-			# try play buttons inside iframe text
-			try:
-				btns = driver.find_elements(By.XPATH,
-					"//button[contains(translate(@aria-label,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'play') or "
-					"contains(translate(text(),'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'play')]")
-				for b in btns:
-					try:
-						if safe_click(driver, b):
-							switch_back_to_default(driver)
-							human_pause_long(PLAY_WAIT_MIN, PLAY_WAIT_MAX)
-							return True
-					except Exception:
-						continue
-			except Exception:
-				pass
+		return False
 
-			switch_back_to_default(driver)
-		except Exception:
-			# couldn't switch to this frame -> continue
-			try:
-				switch_back_to_default(driver)
-			except Exception:
-				pass
+def play_in_iframes(driver) -> bool:
+	"""try inside each iframe (some players live in nested frames)"""
+	tree = frame_tree(driver)
+	for node in tree.frames(max_depth=1):
+		# video elements first, then play buttons inside iframe
+		if tree.enter(node) and (play_via_video(driver) or play_via_button(driver)):
+			tree.leave()
+			return True
+	tree.leave()
+	return False
 
-	# 4) shadow DOM custom elements (media-player)
+def play_via_shadow(driver) -> bool:
+	"""shadow DOM custom elements (media-player)"""
 	try:
 		hosts = driver.find_elements(By.CSS_SELECTOR, "media-player")
 		for host in hosts:
-			ok = attempt_click_in_shadow(driver, "media-player", "media-play-button[aria-label='Play']")
-			if ok:
-				human_pause_long(PLAY_WAIT_MIN, PLAY_WAIT_MAX)
+			if attempt_click_in_shadow(driver, "media-player", "media-play-button[aria-label='Play']"):
 				return True
 	except Exception:
 		pass
+	return False
 
+# default order; per-host hit stats may reorder / skip them
+PLAY_STRATEGIES = [
+	("button", play_via_button),
+	("video", play_via_video),
+	("iframe", play_in_iframes),
+	("shadow_media_player", play_via_shadow),
+]
+
+def click_media_play_button(driver, selectors: dict, timeout=10, only: Optional[List[str]] = None) -> bool:
+	"""
+	Try multiple strategies to start the live player:
+	1) direct visible buttons containing 'play'
+	2) click <video> elements
+	3) try inside iframes (switch into each iframe and repeat)
+	4) shadow DOM media-player attempts
+	Strategies that won before on this host are tried first (see selector_stats).
+	only: names to try, in this order (site strategy play_strategies); None = all.
+	Returns True if any click succeeded.
+	"""
+	strategies = PLAY_STRATEGIES
+	if only:
+		by_name = dict(PLAY_STRATEGIES)
+		strategies = [(n, by_name[n]) for n in only if n in by_name]
+	for name, strategy in selector_stats.order("play_strategy", strategies, lambda s: s[0]):
+		selector_stats.attempt("play_strategy", name)
+		if strategy(driver):
+			selector_stats.hit("play_strategy", name)
+			human_pause_long(PLAY_WAIT_MIN, PLAY_WAIT_MAX)
+			return True
 	return False
 
 # -----------------------------
 # refresh channels (Modified: Re-play + Re-skip ads after click)
 # -----------------------------
+def _find_refresh_button(driver, btn: dict):
+	btn_type = btn.get("type")
+	btn_value = btn.get("value")
+	try:
+		if btn_type == "css":
+			return driver.find_element(By.CSS_SELECTOR, btn_value)
+		elif btn_type == "xpath":
+			return driver.find_element(By.XPATH, btn_value)
+		elif btn_type == "id":
+			return driver.find_element(By.ID, btn_value)
+		elif btn_type == "js":
+			try:
+				return driver.execute_script(f"return {btn_value};")
+			except Exception:
+				return None
+	except Exception:
+		pass
+	return None
+
+def _refresh_channel(driver, selectors: dict, el, already_found_links: Set[str], lock: Optional[threading.Lock] = None, adaptive_wait: bool = False) -> int:
+	"""Click one channel button -> replay -> skip ads -> capture. Returns the number of new m3u8."""
+	# keep anything captured so far, free selenium-wire storage, then click
+	with lock or contextlib.nullcontext():
+		already_found_links.update(capture_network(driver))
+	attach_capture(driver).discard_storage()
+	
+	driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el)
+	
+	print(f"    -> Clicking refresh/channel button...")
+	safe_click(driver, el)
+	frame_tree(driver).invalidate()  # player (and its frames) is swapped
+	
+
+	# หลังเปลี่ยนช่อง
+	activate_player(driver)
+	ensure_stream_start(driver)
+
+	# --- ส่วนที่เพิ่มเข้ามา ---
+	# 1. รอให้ Player โหลดใหม่สักพัก (รอ DOM เปลี่ยน)
+	human_pause_long(1.5, 2.5) 
+
+	# 2. สั่งกด Play อีกรอบ (เผื่อ Player หยุดหลังจากเปลี่ยนช่อง)
+	print("    -> Re-clicking Play button...")
+	click_media_play_button(driver, selectors, timeout=5)
+
+	# 3. สั่ง Skip Ads ใหม่อีกรอบ (เพราะโฆษณาอาจจะมาใหม่หลังเปลี่ยน source)
+	print("    -> Re-skipping Ads...")
+	handle_skip_ads_dooball(driver, selectors, rounds=2)
+	# -----------------------
+
+	# 4. รอให้ Network วิ่ง (เพิ่มเวลาเล็กน้อยเพื่อให้ request m3u8 ออกไป)
+	if adaptive_wait:
+		# return as soon as the channel's playlist shows up (+ a short settle), 5 s at most
+		url = wait_for_next_m3u8(driver, 5.0)
+		current = ([url] if url else []) + capture_network(driver)
+		if url:
+			time.sleep(0.5)
+			current += capture_network(driver)
+	else:
+		human_pause_long(3.0, 5.0)
+		current = capture_network(driver)
+
+	# collect network
+	new = 0
+	with lock or contextlib.nullcontext():
+		for u in current:
+			if u not in already_found_links:
+				already_found_links.add(u)
+				new += 1
+	print(f"    -> found {new} new m3u8")
+	return new
+
 def click_refresh_channels(driver, selectors: dict, already_found_links: Set[str], rounds: int = 6, delay: int = 6):
 	"""
 	selectors expected to contain "refresh_buttons": list of {"type":"css"/"xpath"/"id"/"js","value":...}
@@ -576,73 +1401,14 @@ def click_refresh_channels(driver, selectors: dict, already_found_links: Set[str
 	for r in range(rounds):
 		print(f"[refresh] round {r+1}/{rounds}")
 		for btn in refresh_buttons:
-			btn_type = btn.get("type")
-			btn_value = btn.get("value")
-			el = None
-			try:
-				if btn_type == "css":
-					el = driver.find_element(By.CSS_SELECTOR, btn_value)
-				elif btn_type == "xpath":
-					el = driver.find_element(By.XPATH, btn_value)
-				elif btn_type == "id":
-					el = driver.find_element(By.ID, btn_value)
-				elif btn_type == "js":
-					try:
-						el = driver.execute_script(f"return {btn_value};")
-					except Exception:
-						el = None
-				else:
-					el = None
-			except Exception:
-				el = None
-
+			el = _find_refresh_button(driver, btn)
 			if not el:
-				print(f"[refresh] target not found: {btn_value}")
+				print(f"[refresh] target not found: {btn.get('value')}")
 				human_pause(0.2, 0.5)
 				continue
 
-			# clear requests buffer then click
 			try:
-				# best-effort clear requests list
-				try:
-					del driver.requests[:]
-				except Exception:
-					pass
-				
-				driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el)
-				
-				print(f"    -> Clicking refresh/channel button...")
-				safe_click(driver, el)
-				
-
-				# หลังเปลี่ยนช่อง
-				activate_player(driver)
-				ensure_stream_start(driver)
-
-				# --- ส่วนที่เพิ่มเข้ามา ---
-				# 1. รอให้ Player โหลดใหม่สักพัก (รอ DOM เปลี่ยน)
-				human_pause_long(1.5, 2.5) 
-
-				# 2. สั่งกด Play อีกรอบ (เผื่อ Player หยุดหลังจากเปลี่ยนช่อง)
-				print("    -> Re-clicking Play button...")
-				click_media_play_button(driver, selectors, timeout=5)
-
-				# 3. สั่ง Skip Ads ใหม่อีกรอบ (เพราะโฆษณาอาจจะมาใหม่หลังเปลี่ยน source)
-				print("    -> Re-skipping Ads...")
-				handle_skip_ads_dooball(driver, selectors, rounds=2)
-				# -----------------------
-
-				# 4. รอให้ Network วิ่ง (เพิ่มเวลาเล็กน้อยเพื่อให้ request m3u8 ออกไป)
-				human_pause_long(3.0, 5.0)
-
-				# collect network
-				current = capture_network(driver)
-				new = 0
-				for u in current:
-					if u not in already_found_links:
-						already_found_links.add(u)
-						new += 1
-				print(f"    -> found {new} new m3u8")
+				_refresh_channel(driver, selectors, el, already_found_links)
 			except Exception as ex:
 				print(f"    [warn] refresh click failed: {ex}")
 			human_pause(0.2, 0.6)
@@ -651,181 +1417,1369 @@ def click_refresh_channels(driver, selectors: dict, already_found_links: Set[str
 		time.sleep(delay)
 	print("[refresh] finished")
 
+def _open_lane(driver, site: str, selectors: dict, on_found, blocking: Optional[dict], strategy: Optional[SiteStrategy] = None):
+	"""Bring an extra browser to the same state the visit's driver is in (page loaded, playing)."""
+	strategy = strategy or site_strategy(site)
+	attach_capture(driver).on_new = on_found
+	apply_blocking(driver, BlockProfile.for_site(blocking, site) if blocking else None)
+	if strategy.skip_watcher:
+		install_skip_watcher(driver, selectors)
+	driver.get(site)
+	human_pause_long(*strategy.initial_pause)
+	if strategy.has("activate_player"):
+		activate_player(driver)
+	if strategy.has("play_click"):
+		click_media_play_button(driver, selectors, timeout=10, only=strategy.play_strategies)
+	if strategy.skip_ads == "dooball":
+		handle_skip_ads_dooball(driver, selectors, rounds=2)
+		ensure_stream_start(driver)
+
+def _lane_round(driver, selectors: dict, buttons: List[dict], found: Set[str], lock: threading.Lock) -> int:
+	new = 0
+	for btn in buttons:
+		el = _find_refresh_button(driver, btn)
+		if not el:
+			print(f"[refresh] target not found: {btn.get('value')}")
+			continue
+		try:
+			new += _refresh_channel(driver, selectors, el, found, lock, adaptive_wait=True)
+		except Exception as ex:
+			print(f"    [warn] refresh click failed: {ex}")
+	return new
+
+def fanout_refresh_channels(driver, site: str, selectors: dict, already_found_links: Set[str], pool: "BrowserPool" = None, on_found=None, blocking: Optional[dict] = None, rounds: int = 6, delay: int = 3, lanes: Optional[int] = None, strategy: Optional[SiteStrategy] = None) -> int:
+	"""
+	Same channel loop as click_refresh_channels, but the refresh_buttons are split
+	over several browsers ("lanes") that click / capture concurrently:
+	  - lane 0 is the visit's own driver; extra lanes are idle drivers taken from the
+	    pool without waiting (no pool / pool busy -> fewer lanes, never more browsers)
+	  - rounds are synchronous across lanes; a round with no new m3u8 ends the loop
+	  - without any extra lane the old sequential loop runs instead (all rounds)
+	Returns the number of browsers used (1 = no fan-out; scan_visit then queues the
+	visits the site would have had without fan-out).
+	"""
+	refresh_buttons = selectors.get("refresh_buttons", [])
+	if not refresh_buttons:
+		print("[WARN] no refresh_buttons in selectors.json")
+		return 1
+
+	want = min(lanes or REFRESH_FANOUT or len(refresh_buttons), len(refresh_buttons))
+	extra = []
+	while pool is not None and len(extra) < want - 1:
+		d = pool.acquire(block=False)
+		if d is None:
+			break
+		extra.append(d)
+
+	lock = threading.Lock()
+	try:
+		with ThreadPoolExecutor(max_workers=len(extra) + 1) as ex:
+			# contexts copied here, on the visit's thread: lanes record into the visit (selector stats, spans)
+			opened = list(ex.map(
+				lambda d, ctx: ctx.run(_try_open_lane, d, site, selectors, on_found, blocking, strategy),
+				extra, [contextvars.copy_context() for _ in extra]))
+			drivers = [driver] + [d for d, ok in zip(extra, opened) if ok]
+			groups = [refresh_buttons[i::len(drivers)] for i in range(len(drivers))]
+			if len(drivers) < 2:
+				print("[refresh] no idle browser to fan out to -> sequential loop")
+				click_refresh_channels(driver, selectors, already_found_links, rounds=rounds, delay=delay)
+				return 1
+			print(f"[refresh] fan-out over {len(drivers)} browsers ({len(refresh_buttons)} channels)")
+
+			for r in range(rounds):
+				t0 = time.monotonic()
+				futures = [ex.submit(contextvars.copy_context().run, _lane_round, d, selectors, g, already_found_links, lock)
+						   for d, g in zip(drivers, groups)]
+				new = 0
+				for fut in futures:
+					try:
+						new += fut.result()
+					except Exception as e:
+						print(f"    [warn] refresh lane failed: {e}")
+				print(f"[refresh] round {r+1}/{rounds}: +{new} m3u8 in {time.monotonic() - t0:.1f}s")
+				if new == 0:
+					print("[refresh] no new m3u8 in a full round -> stop")
+					break
+				if r + 1 < rounds:
+					time.sleep(delay)
+	finally:
+		for d in extra:
+			try:
+				with lock:
+					already_found_links.update(capture_network(d))  # late arrivals of the last round
+			except Exception:
+				pass
+			pool.release(d)
+	print("[refresh] finished")
+	return len(drivers)
+
+def _try_open_lane(driver, site, selectors, on_found, blocking, strategy=None) -> bool:
+	try:
+		_open_lane(driver, site, selectors, on_found, blocking, strategy)
+		return True
+	except Exception as e:
+		print(f"[refresh] extra lane failed to open: {e}")
+		return False
+
 # -----------------------------
 # webdriver factory
 # -----------------------------
-def make_driver(headless: bool = HEADLESS):
-	# install chromedriver binary once (safe to call every worker)
-	chromedriver_autoinstaller.install()
-	options = webdriver.ChromeOptions()
+_chromedriver_lock = threading.Lock()
+_chromedriver_path: Optional[str] = None
+
+def ensure_chromedriver(refresh: bool = False) -> Optional[str]:
+	"""
+	chromedriver path, resolved once per process.
+	The path from CHROMEDRIVER_CACHE is trusted while the file exists; refresh=True
+	(e.g. Chrome updated, session not created) runs install() again and rewrites it.
+	"""
+	global _chromedriver_path
+	with _chromedriver_lock:
+		if _chromedriver_path and not refresh:
+			return _chromedriver_path
+		if not refresh:
+			try:
+				with open(CHROMEDRIVER_CACHE, "r", encoding="utf-8") as f:
+					cached = f.read().strip()
+				if cached and os.path.isfile(cached):
+					_chromedriver_path = cached
+					return cached
+			except OSError:
+				pass
+		_chromedriver_path = chromedriver_autoinstaller.install()
+		if _chromedriver_path:
+			try:
+				with open(CHROMEDRIVER_CACHE, "w", encoding="utf-8") as f:
+					f.write(_chromedriver_path)
+			except OSError as e:
+				print(f"[WARN] could not cache chromedriver path: {e}")
+		return _chromedriver_path
+
+def make_driver(headless: bool = HEADLESS, backend: str = CAPTURE_BACKEND, page_load_strategy: Optional[str] = None, extra_args: Tuple[str, ...] = ()):
+	try:
+		driver = _launch_driver(ensure_chromedriver(), headless, backend, page_load_strategy, extra_args)
+	except SessionNotCreatedException as e:
+		# cached chromedriver no longer matches the installed Chrome
+		print(f"[driver] session not created ({str(e).splitlines()[0]}), re-resolving chromedriver")
+		driver = _launch_driver(ensure_chromedriver(refresh=True), headless, backend, page_load_strategy, extra_args)
+	startup_profile.mark("first browser ready", once=True)
+	return driver
+
+def _launch_driver(driver_path: Optional[str], headless: bool, backend: str, page_load_strategy: Optional[str] = None, extra_args: Tuple[str, ...] = ()):
+	service = Service(executable_path=driver_path) if driver_path else None
+	options = selenium_webdriver.ChromeOptions()
+	if page_load_strategy:
+		options.page_load_strategy = page_load_strategy
 	options.add_argument("--disable-blink-features=AutomationControlled")
 	options.add_argument("--no-sandbox")
 	options.add_argument("--disable-dev-shm-usage")
 	options.add_experimental_option("excludeSwitches", ["enable-logging"])
 	options.add_argument("--log-level=3")
+	for arg in extra_args:
+		options.add_argument(arg)
 	if headless:
 		options.add_argument("--headless=new")
 		options.add_argument("--window-size=1366,768")
-	driver = webdriver.Chrome(seleniumwire_options={}, options=options)
+
+	if backend == "cdp":
+		# no MITM proxy: m3u8 URLs come from DevTools Network events in the performance log
+		options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+		options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+		driver = selenium_webdriver.Chrome(service=service, options=options)
+		driver.m3u8_capture = CdpM3u8Capture(driver)
+		return driver
+
+	from seleniumwire import webdriver as wire_webdriver
+	driver = wire_webdriver.Chrome(service=service, seleniumwire_options={}, options=options)
 	# sniff only .m3u8 for speed (selenium-wire scopes)
 	if M3U8_ONLY_SCOPES:
-		driver.scopes = [r".*\.m3u8(\?.*)?$"]
+		driver.scopes = [M3U8_SCOPE]
 	else:
 		driver.scopes = [".*"]
+	attach_capture(driver)
 	return driver
 
+# origins of the top document, of every iframe it loaded (resource timing keeps removed ones) and of its current iframes
+_DOCUMENT_ORIGINS_JS = """
+const out = new Set([location.origin]);
+const add = (u) => { try { out.add(new URL(u, location.href).origin); } catch (e) {} };
+performance.getEntriesByType('resource').forEach(e => { if (e.initiatorType === 'iframe' || e.initiatorType === 'frame') add(e.name); });
+Array.from(document.getElementsByTagName('iframe')).forEach(f => add(f.src));
+return Array.from(out);
+"""
+
+def visited_origins(driver) -> Set[str]:
+	"""
+	Origins a visit may have left storage under: frame navigations seen by the cdp
+	capture, the top page's own iframe history and the mapped (nested) frame tree.
+	"""
+	capture = attach_capture(driver)
+	capture.pump()
+	urls = set(capture.origins)
+	urls.update(n["src"] for n in frame_tree(driver).nodes)
+	try:
+		urls.update(driver.execute_script(_DOCUMENT_ORIGINS_JS) or [])
+	except JavascriptException:
+		pass
+	return {o for o in map(url_origin, urls) if o}
+
+def reset_driver(driver):
+	"""
+	Bring a pooled driver back to a clean state between visits:
+	extra windows closed, cookies/storage/cache cleared, captured requests purged, blank page.
+	Storage (localStorage, IndexedDB, CacheStorage, service workers ...) is cleared for
+	every origin the visit touched - top page, iframes and third parties - as a fresh
+	profile would have none of it.
+	Raises if the driver is no longer usable (caller should retire it).
+	"""
+	capture = attach_capture(driver)
+	handles = driver.window_handles
+	for h in handles[1:]:
+		driver.switch_to.window(h)
+		driver.close()
+	driver.switch_to.window(handles[0])
+	driver.switch_to.default_content()
+
+	origins = visited_origins(driver)
+	try:
+		driver.execute_script("try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}")
+	except JavascriptException:
+		pass
+	if len(origins) > POOL_MAX_ORIGINS:
+		raise RuntimeError(f"visit touched {len(origins)} origins, retiring the driver instead of clearing them")
+	for origin in origins:
+		driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+
+	driver.delete_all_cookies()
+	driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+	driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+	remove_skip_watcher(driver)
+	driver.get("about:blank")
+	capture.reset()
+	tree = frame_tree(driver)
+	tree.nodes = []
+	tree.invalidate()
+
+class BrowserPool:
+	"""
+	Pool of long-lived drivers shared across visits and rounds.
+	- acquire() returns an idle driver or launches a new one (up to size);
+	  idle drivers past max_age are retired first (a warm pool may sit idle for hours)
+	- release() resets the driver, or quits it when max_uses / max_age is reached
+	  or the pool holds more drivers than size
+	- reserve(n) / unreserve(n): n slots are taken out of size while the caller runs
+	  its own browsers next to the pool, so both together stay within the original size
+	"""
+	def __init__(self, size: int = MAX_WORKERS, max_uses: int = POOL_MAX_USES, max_age: float = POOL_MAX_AGE, headless: bool = HEADLESS, backend: str = CAPTURE_BACKEND):
+		self.size = size
+		self.backend = backend
+		self.max_uses = max_uses
+		self.max_age = max_age
+		self.headless = headless
+		self._cond = threading.Condition()
+		self._idle: List = []
+		self._meta: Dict[int, Dict[str, float]] = {}  # id(driver) -> {"born", "uses"}
+		self._closed = False
+		self.launched = 0
+		self.retired = 0
+
+	def acquire(self, block: bool = True):
+		"""block=False returns None instead of waiting when every driver is leased."""
+		stale: List = []
+		try:
+			with self._cond:
+				while True:
+					if self._closed:
+						raise RuntimeError("browser pool is closed")
+					stale += self._drop_idle(lambda meta, now: now - meta["born"] >= self.max_age)
+					if self._idle:
+						return self._idle.pop()
+					if len(self._meta) < self.size:
+						# reserve the slot, launch outside the lock
+						placeholder = object()
+						self._meta[id(placeholder)] = {}
+						break
+					if not block:
+						return None
+					self._cond.wait()
+		finally:
+			for d in stale:
+				self._quit(d)
+		try:
+			driver = make_driver(self.headless, self.backend)
+		except Exception:
+			with self._cond:
+				del self._meta[id(placeholder)]
+				self._cond.notify()
+			raise
+		with self._cond:
+			del self._meta[id(placeholder)]
+			self._meta[id(driver)] = {"born": time.monotonic(), "uses": 0}
+			self.launched += 1
+		return driver
+
+	def release(self, driver):
+		if driver is None:
+			return
+		with self._cond:
+			meta = self._meta.get(id(driver))
+			if meta is not None:
+				meta["uses"] += 1
+				expired = self._closed or meta["uses"] >= self.max_uses or time.monotonic() - meta["born"] >= self.max_age \
+					or len(self._meta) > self.size
+				if expired:
+					self._retire(driver)
+		if meta is None or expired:
+			self._quit(driver)
+			return
+		try:
+			reset_driver(driver)  # outside the lock: many WebDriver round trips
+			reset_ok = True
+		except Exception as e:
+			print(f"[pool] reset failed, retiring driver: {e}")
+			reset_ok = False
+		with self._cond:
+			# the pool may have been closed or shrunk (reserve) during the reset
+			keep = reset_ok and not self._closed and len(self._meta) <= self.size
+			if keep:
+				self._idle.append(driver)
+				self._cond.notify()
+			else:
+				self._retire(driver)
+		if not keep:
+			self._quit(driver)
+
+	def _retire(self, driver):
+		"""Drops a leased driver from the books (caller holds the lock and quits it)."""
+		self._meta.pop(id(driver), None)
+		self.retired += 1
+		self._cond.notify()
+
+	def reserve(self, n: int) -> int:
+		"""
+		Takes up to n slots out of size and quits idle drivers over the new size.
+		Returns the slots taken (give them back with unreserve); leased drivers over
+		the new size are quit when released.
+		"""
+		with self._cond:
+			n = max(0, min(int(n), self.size))
+			self.size -= n
+			excess = self._drop_idle(lambda meta, now: len(self._meta) > self.size)
+		for d in excess:
+			self._quit(d)
+		return n
+
+	def unreserve(self, n: int):
+		with self._cond:
+			self.size += n
+			self._cond.notify_all()
+
+	def _drop_idle(self, retire) -> List:
+		"""Removes idle drivers (oldest first) for which retire(meta, now) holds; caller holds the lock and quits them."""
+		now = time.monotonic()
+		dropped = []
+		for d in list(self._idle):
+			if retire(self._meta[id(d)], now):
+				self._idle.remove(d)
+				self._meta.pop(id(d), None)
+				self.retired += 1
+				dropped.append(d)
+		return dropped
+
+	def close(self):
+		with self._cond:
+			self._closed = True
+			idle, self._idle = self._idle, []
+			for d in idle:
+				self._meta.pop(id(d), None)
+			self._cond.notify_all()
+		for d in idle:
+			self._quit(d)
+
+	@staticmethod
+	def _quit(driver):
+		try:
+			driver.quit()
+		except Exception:
+			pass
+
 # -----------------------------
-# worker: single visit (used by ThreadPoolExecutor)
+# tab mode: several visits in one Chrome
 # -----------------------------
-def scan_visit(site: str, selectors: dict, is_dooball: bool) -> Tuple[str, Set[str]]:
+class TabCapture(CdpM3u8Capture):
 	"""
-	Performs one visit for a site.
-	If is_dooball True, the visit will also run refresh loop (multiple rounds) to collect variations.
-	Returns (site, set_of_found_m3u8).
+	cdp capture of one tab. The performance log is per browser, so pump() goes
+	through the browser, which reads it once and hands every tab its own entries
+	(matched by the entry's "webview" = target id = window handle).
 	"""
-	found_set: Set[str] = set()
-	driver = None
-	try:
-		print(f"[visit start] {site}")
-		driver = make_driver()
-		print(f"[visit driver ready] {site}")
+	def pump(self):
+		self.driver.browser.pump()
+
+class TabDriver:
+	"""
+	One visit's view of a shared TabBrowser: behaves like a WebDriver, but every
+	command runs in this tab (and in the frame it last switched to). Any attribute
+	access binds the calling thread to this tab, so WebElements found through it
+	act in the right window too.
+	"""
+	def __init__(self, browser: "TabBrowser", handle: str, context_id: Optional[str]):
+		self.browser = browser
+		self.handle = handle
+		self.context_id = context_id
+		self.frames: List[dict] = []  # SWITCH_TO_FRAME params since the top document, replayed on window switch
+		self.m3u8_capture = TabCapture(self)
 
-		driver.get(site)
-		# initial small wait
-		human_pause_long(1.0, 2.2)
+	def __getattr__(self, name):
+		self.browser.bind(self)
+		return getattr(self.browser.driver, name)
 
-		# Try to center player (iframe/video) if exists (best-effort)
-		try:
-			# try safe center by switching to likely iframe then clicking body to activate player
-			f = try_switch_to_any_iframe(driver)
-			if f:
+TAB_BROWSER_ARGS = ("--disable-features=IsolateOrigins,site-per-process", "--disable-site-isolation-trials")
+
+class TabBrowser:
+	"""
+	One cdp Chrome running several TabDrivers. WebDriver has a single current
+	window, so commands are serialized under a lock and the browser switches to
+	the caller's tab (and back into its frame) first. Page loads use
+	pageLoadStrategy "none" and wait for readyState outside the lock, so a slow
+	page does not hold the other tabs.
+	Site isolation is off: cross-origin player iframes then stay in their tab's
+	renderer, so their network events carry the tab's webview id (and the
+	browser runs fewer processes).
+	Each tab is a Target.createBrowserContext context (like an incognito
+	profile: cookies / cache / storage die with it); if the context cannot be
+	created it falls back to a plain new tab in the default context.
+	"""
+	def __init__(self, headless: bool = HEADLESS):
+		self.driver = make_driver(headless, "cdp", page_load_strategy="none", extra_args=TAB_BROWSER_ARGS)
+		self.home = self.driver.current_window_handle  # kept open, tabs come and go
+		self.current = self.home
+		self.lock = threading.RLock()
+		self._local = threading.local()
+		self._log_lock = threading.Lock()
+		self._execute = self.driver.execute
+		self.driver.execute = self.execute
+		self.captures: Dict[str, TabCapture] = {}
+		self.tabs = 0          # open tabs (pool bookkeeping)
+		self.uses = 0
+		self.born = time.monotonic()
+		self.retiring = False
+		self.contexts = True   # False after Target.createBrowserContext failed once
+
+	def bind(self, tab: TabDriver):
+		self._local.tab = tab
+
+	def _cdp(self, cmd: str, params: dict) -> dict:
+		return self._execute("executeCdpCommand", {"cmd": cmd, "params": params})["value"]
+
+	def _enter(self, tab: TabDriver):
+		if self.current == tab.handle:
+			return
+		self._execute(Command.SWITCH_TO_WINDOW, {"handle": tab.handle})
+		self.current = tab.handle
+		replay, tab.frames = tab.frames, []
+		for params in replay:
+			try:
+				self._execute(Command.SWITCH_TO_FRAME, params)
+			except Exception:
+				break  # frame went away meanwhile: stay in its parent, like a fresh lookup would
+			tab.frames.append(params)
+
+	def execute(self, command, params=None):
+		tab = getattr(self._local, "tab", None)
+		if tab is None or tab.browser is not self or tab.handle not in self.captures:
+			with self.lock:
+				return self._execute(command, params)
+		if command == Command.GET:
+			with self.lock:
+				self._enter(tab)
+				response = self._execute(command, params)
+				tab.frames = []
+			self._wait_loaded(tab)
+			return response
+		with self.lock:
+			self._enter(tab)
+			response = self._execute(command, params)
+			if command == Command.SWITCH_TO_FRAME:
+				if (params or {}).get("id") is None:
+					tab.frames = []
+				else:
+					tab.frames.append(params)
+			elif command == Command.SWITCH_TO_PARENT_FRAME:
+				tab.frames = tab.frames[:-1]
+			return response
+
+	def _wait_loaded(self, tab: TabDriver):
+		deadline = time.monotonic() + TAB_PAGE_LOAD_TIMEOUT
+		while time.monotonic() < deadline:
+			with self.lock:
+				self._enter(tab)
+				state = self._execute(Command.W3C_EXECUTE_SCRIPT, {"script": "return document.readyState;", "args": []})["value"]
+			if state == "complete":
+				return
+			time.sleep(0.25)
+
+	def pump(self):
+		"""Read the shared performance log once and route m3u8 entries to their tab."""
+		with self._log_lock:
+			with self.lock:
 				try:
-					body = driver.find_element(By.TAG_NAME, "body")
-					ActionChains(driver).move_to_element(body).click().perform()
+					entries = self._execute(Command.GET_LOG, {"type": "performance"})["value"]
 				except Exception:
-					pass
-				switch_back_to_default(driver)
+					return
+			for entry in entries:
+				raw = entry.get("message", "")
+				if "m3u8" not in raw:
+					continue
+				try:
+					obj = json.loads(raw)
+				except Exception:
+					continue
+				capture = self.captures.get(obj.get("webview"))
+				if capture is not None:
+					capture.handle_message(obj.get("message", {}))
+
+	def open_tab(self) -> TabDriver:
+		with self.lock:
+			context_id = None
+			if self.contexts:
+				try:
+					context_id = self._cdp("Target.createBrowserContext", {"disposeOnDetach": True})["browserContextId"]
+					handle = self._cdp("Target.createTarget", {"url": "about:blank", "browserContextId": context_id})["targetId"]
+				except Exception as e:
+					print(f"[tabs] browser contexts unavailable ({str(e).splitlines()[0]}), using plain tabs")
+					self.contexts = False
+					if context_id:
+						self._dispose(context_id)
+					context_id = None
+			if context_id is None:
+				handle = self._execute(Command.NEW_WINDOW, {"type": "tab"})["value"]["handle"]
+			tab = TabDriver(self, handle, context_id)
+			self.captures[handle] = tab.m3u8_capture
+			# attach chromedriver to the new target before the first navigation (Network events, blocking)
+			self._enter(tab)
+			self._execute("executeCdpCommand", {"cmd": "Network.enable", "params": {}})
+		return tab
+
+	def close_tab(self, tab: TabDriver):
+		"""Close the tab and drop its browser context. Raises if the browser is no longer usable."""
+		with self.lock:
+			self.captures.pop(tab.handle, None)
+			tab.frames = []
+			if self.current != self.home:
+				self._execute(Command.SWITCH_TO_WINDOW, {"handle": self.home})
+				self.current = self.home
+			if tab.context_id:
+				self._cdp("Target.closeTarget", {"targetId": tab.handle})
+				self._dispose(tab.context_id)
+			else:
+				self._execute(Command.SWITCH_TO_WINDOW, {"handle": tab.handle})
+				self.current = tab.handle
+				self._execute(Command.CLOSE)
+				self._execute(Command.SWITCH_TO_WINDOW, {"handle": self.home})
+				self.current = self.home
+
+	def _dispose(self, context_id: str):
+		try:
+			self._cdp("Target.disposeBrowserContext", {"browserContextId": context_id})
 		except Exception:
 			pass
 
-		# -----------------------------
-		# 🔥 ACTIVATE PLAYER (IMPORTANT)
-		# -----------------------------
-		activate_player(driver)
-
-		# ▶️ try play
-		click_media_play_button(driver, selectors, timeout=10)
+	def quit(self):
+		try:
+			self.driver.quit()
+		except Exception:
+			pass
 
-		# ⏳ wait for ad DOM to appear
-		time.sleep(1.5)
+class TabPool:
+	"""
+	BrowserPool for tab mode: acquire() returns a TabDriver in a shared Chrome,
+	launching another Chrome only when every running one already has
+	tabs_per_browser tabs open. size still bounds concurrent visits.
+	A Chrome is retired (no new tabs, quit once its last tab closes) after
+	max_uses visits or max_age seconds, or when closing a tab fails.
+	"""
+	backend = "cdp"
+
+	def __init__(self, size: int = MAX_WORKERS, tabs_per_browser: int = TABS_PER_BROWSER, max_uses: Optional[int] = None, max_age: float = POOL_MAX_AGE, headless: bool = HEADLESS):
+		self.size = size
+		self.tabs_per_browser = max(tabs_per_browser, 1)
+		self.max_uses = max_uses or POOL_MAX_USES * self.tabs_per_browser
+		self.max_age = max_age
+		self.headless = headless
+		self._cond = threading.Condition()
+		self._browsers: List[TabBrowser] = []
+		self._launching = 0
+		self._leased = 0
+		self._closed = False
+		self.launched = 0
+		self.retired = 0
+
+	def _free_browser(self) -> Optional[TabBrowser]:
+		free = [b for b in self._browsers if not b.retiring and b.tabs < self.tabs_per_browser]
+		# fill the fullest browser first: fewer Chromes stay alive
+		return max(free, key=lambda b: b.tabs) if free else None
+
+	def acquire(self, block: bool = True):
+		"""block=False returns None instead of waiting when size tabs are leased."""
+		max_browsers = -(-self.size // self.tabs_per_browser)
+		with self._cond:
+			while True:
+				if self._closed:
+					raise RuntimeError("browser pool is closed")
+				if self._leased < self.size:
+					browser = self._free_browser()
+					if browser is not None:
+						browser.tabs += 1
+						self._leased += 1
+						break
+					if len([b for b in self._browsers if not b.retiring]) + self._launching < max_browsers:
+						self._launching += 1
+						self._leased += 1
+						break
+				if not block:
+					return None
+				self._cond.wait()
+		if browser is None:
+			try:
+				browser = TabBrowser(self.headless)
+			except Exception:
+				with self._cond:
+					self._launching -= 1
+					self._leased -= 1
+					self._cond.notify_all()
+				raise
+			with self._cond:
+				self._launching -= 1
+				browser.tabs = 1
+				self._browsers.append(browser)
+				self.launched += 1
+				self._cond.notify_all()
+		try:
+			return browser.open_tab()
+		except Exception:
+			self._done(browser, broken=True)
+			raise
 
-		# ⏭ skip ads (dooball only)
-		if is_dooball:
-			print("[dooball] aggressive skip ads")
-			handle_skip_ads_dooball(driver, selectors, rounds=3)
+	def release(self, tab):
+		if tab is None:
+			return
+		browser = tab.browser
+		try:
+			browser.close_tab(tab)
+			broken = False
+		except Exception as e:
+			print(f"[pool] closing tab failed, retiring browser: {e}")
+			broken = True
+		self._done(browser, broken)
+
+	def _done(self, browser: TabBrowser, broken: bool):
+		with self._cond:
+			browser.tabs -= 1
+			browser.uses += 1
+			self._leased -= 1
+			if broken or self._closed or browser.uses >= self.max_uses or time.monotonic() - browser.born >= self.max_age:
+				browser.retiring = True
+			quit_it = browser.retiring and browser.tabs == 0 and browser in self._browsers
+			if quit_it:
+				self._browsers.remove(browser)
+				self.retired += 1
+			self._cond.notify_all()
+		if quit_it:
+			browser.quit()
+
+	def close(self):
+		with self._cond:
+			self._closed = True
+			idle = [b for b in self._browsers if b.tabs == 0]
+			for b in self._browsers:
+				b.retiring = True  # busy ones quit when their last tab is released
+			self._browsers = [b for b in self._browsers if b.tabs > 0]
+			self._cond.notify_all()
+		for b in idle:
+			b.quit()
 
-			print("[dooball] ensure stream start (IMPORTANT)")
-			ensure_stream_start(driver)   # ⭐⭐⭐
-			human_pause_long(1.2, 2.0)
-		else:
-			handle_skip_ads(driver, selectors)
-
-		# short wait to allow network m3u8 to appear
-		print("[wait] waiting for player to load...")
-		for i in range(10):  # รอ 10 รอบ (รวมประมาณ 10–15 วินาที)
-			time.sleep(random.uniform(1.0, 1.6))  # รอรายวินาที
-			current = capture_network(driver)
-			new = 0
-			for u in current:
-				if u not in found_set:
+# -----------------------------
+# worker: single visit (used by ThreadPoolExecutor)
+# -----------------------------
+def scan_visit(site: str, selectors: dict, strategy: Optional[SiteStrategy] = None, pool: BrowserPool = None, backend: str = CAPTURE_BACKEND, on_found: Optional[Callable[[str], None]] = None, blocking: Optional[dict] = None, requeue: Optional[Callable[[int], None]] = None) -> Tuple[str, Set[str]]:
+	"""
+	Performs one visit for a site.
+	strategy (site_strategies.json, default: looked up for site) picks the phases that run,
+	their timeouts and selector overrides; dooball's also runs the refresh loop to collect variations.
+	If pool is given the driver is leased from it (and returned clean), otherwise a fresh one is launched.
+	on_found is called with every new m3u8 as soon as it is captured (result stream), with
+	path "http" when the browserless fast path found it (the browser is then not launched;
+	main() runs it once per site beforehand and turns it off for the visits).
+	blocking is the blocking.json config (None / {} = no blocking).
+	requeue(n) asks the executor for n more visits of the site: called when a fan-out
+	visit found no idle browser and the site would otherwise get fewer visits than before.
+	Returns (site, set_of_found_m3u8).
+	"""
+	found_set: Set[str] = set()
+	driver = None
+	strategy = strategy or site_strategy(site)
+	selectors = strategy.apply_selectors(selectors)
+	selector_stats.begin_visit(normalize_url(site)[1])
+	visit_t0 = time.perf_counter()
+	visit_ok = False
+	try:
+		print(f"[visit start] {site} (strategy {strategy.name})")
+		if strategy.fast_path:
+			links = try_fast_path(site)
+			if links:
+				for u in links:
 					found_set.add(u)
-					new += 1
-			print(f"   [net] +{new} new (round {i+1}/10)")
+					if on_found:
+						on_found(u, "http")
+				visit_ok = True
+				return site, found_set
+		with span("driver_acquire", site):
+			driver = pool.acquire() if pool else make_driver(backend=backend)
+		frames = frame_tree(driver)
+		frames.switches = 0
+		attach_capture(driver).on_new = on_found
+		apply_blocking(driver, BlockProfile.for_site(blocking, site) if blocking else None)
+		if strategy.skip_watcher:
+			install_skip_watcher(driver, selectors)
+		print(f"[visit driver ready] {site}")
 
-		# if dooball -> run refresh loop to get variations
-		if is_dooball:
-			print("[dooball] re-trigger skip before refresh")
-			activate_player(driver) # กระตุ้น iframe อีกรอบ
-			handle_skip_ads_dooball(driver, selectors, rounds=2) # skip ads อีกรอบ
+		startup_profile.report("first driver.get")
+		with span("driver_get", site):
+			driver.get(site)
+			# initial small wait
+			human_pause_long(*strategy.initial_pause)
+
+		if strategy.has("center_iframe") or strategy.has("activate_player"):
+			with span("activate_player", site):
+				# Try to center player (iframe/video) if exists (best-effort)
+				if strategy.has("center_iframe"):
+					try:
+						# try safe center by switching to likely iframe then clicking body to activate player
+						f = try_switch_to_any_iframe(driver)
+						if f:
+							try:
+								body = driver.find_element(By.TAG_NAME, "body")
+								ActionChains(driver).move_to_element(body).click().perform()
+							except Exception:
+								pass
+							frames.leave()
+					except Exception:
+						pass
 
-			# *** CALL THE MODIFIED REFRESH FUNCTION ***
-			click_refresh_channels(driver, selectors, found_set, rounds=6, delay=3)
+				# -----------------------------
+				# 🔥 ACTIVATE PLAYER (IMPORTANT)
+				# -----------------------------
+				if strategy.has("activate_player"):
+					activate_player(driver)
+
+		# ▶️ try play
+		if strategy.has("play_click"):
+			with span("play_click", site):
+				click_media_play_button(driver, selectors, timeout=10, only=strategy.play_strategies)
+
+		ad_phase = None
+		if strategy.has("skip_ads") and strategy.skip_ads != "none":
+			with span("skip_ads", site):
+				if strategy.skip_ads == "dooball":
+					# ⏳ wait for ad DOM to appear
+					time.sleep(1.5)
+					print("[dooball] aggressive skip ads")
+					handle_skip_ads_dooball(driver, selectors, rounds=3)
+
+					print("[dooball] ensure stream start (IMPORTANT)")
+					ensure_stream_start(driver)   # ⭐⭐⭐
+					human_pause_long(1.2, 2.0)
+				elif strategy.skip_ads == "watcher":
+					# watchers already click in every frame; the ad phase is waited out inside the m3u8 wait
+					if strategy.has("wait_m3u8"):
+						ad_phase = AdPhase(driver, timeout=strategy.ad_phase_timeout)
+					else:
+						ad = wait_ad_phase(driver, timeout=strategy.ad_phase_timeout)
+						print(f"[ads] {ad['reason']} after {ad['waited']}s ({ad['clicked']} skip clicks)")
+				else:
+					# ⏳ wait for ad DOM to appear
+					time.sleep(1.5)
+					handle_skip_ads(driver, selectors)
+
+		# wait until the m3u8 traffic settles (adaptive, see WAIT_POLICY)
+		if strategy.has("wait_m3u8"):
+			print("[wait] waiting for player to load...")
+			with span("wait_m3u8", site):
+				found_set.update(capture_network(driver))
+				wait_for_m3u8(driver, found_set, strategy.wait, ad=ad_phase)
+			if ad_phase is not None:
+				ad = ad_phase.result()
+				print(f"[ads] {ad['reason']} after {ad['waited']}s ({ad['clicked']} skip clicks)")
+
+		# refresh loop (dooball channel buttons) to get variations
+		if strategy.has("refresh_channels"):
+			with span("refresh_channels", site):
+				if strategy.skip_ads == "dooball":
+					print("[dooball] re-trigger skip before refresh")
+					activate_player(driver) # กระตุ้น iframe อีกรอบ
+					handle_skip_ads_dooball(driver, selectors, rounds=2) # skip ads อีกรอบ
+
+				# *** CALL THE MODIFIED REFRESH FUNCTION ***
+				refresh = strategy.refresh
+				if refresh.get("mode", REFRESH_MODE) == "fanout":
+					used = fanout_refresh_channels(driver, site, selectors, found_set, pool, on_found, blocking,
+												   rounds=refresh.get("rounds", 6), delay=refresh.get("delay", 3),
+												   lanes=refresh.get("lanes") or None, strategy=strategy)
+					if used < 2 and requeue is not None and strategy.fallback_visits:
+						print(f"[refresh] {site}: no fan-out, queueing {strategy.fallback_visits} more visits")
+						requeue(strategy.fallback_visits)
+				else:
+					click_refresh_channels(driver, selectors, found_set, rounds=refresh.get("rounds", 6), delay=refresh.get("delay", 3))
 
 		# final capture
-		human_pause(0.8, 1.6)
-		final = capture_network(driver)
-		for u in final:
-			found_set.add(u)
+		with span("final_capture", site):
+			human_pause(0.8, 1.6)
+			final = capture_network(driver)
+			for u in final:
+				found_set.add(u)
+		print(f"[frames] {frames.switches} frame switches this visit")
+		try:
+			metrics = visit_metrics.current()
+			metrics.observe("frame_switches", site, frames.switches)
+			load = page_load_stats(driver)
+			if load.get("load_ms") is not None:
+				metrics.record("page_load", site, load["load_ms"] / 1000)
+			metrics.observe("transfer_bytes", site, load.get("bytes") or 0)
+			metrics.observe("blocked_requests", site, attach_capture(driver).blocked)
+			print(f"[load] {site}: load={load.get('load_ms')}ms bytes={load.get('bytes')} "
+				  f"requests={load.get('requests')} blocked={attach_capture(driver).blocked}")
+		except Exception as e:
+			print(f"[warn] page load stats unavailable: {e}")
+		visit_ok = True
 
 	except Exception as e:
 		print(f"[error][visit] {site}: {e}")
 	finally:
-		try:
-			if driver:
-				driver.quit()
-		except Exception:
-			pass
+		selector_stats.end_visit()
+		with span("driver_release", site):
+			if pool:
+				pool.release(driver)
+			else:
+				try:
+					if driver:
+						driver.quit()
+				except Exception:
+					pass
+		visit_metrics.current().record("visit", site, time.perf_counter() - visit_t0, visit_ok)
 
 	return site, found_set
 
 # -----------------------------
-# helper: chunk tasks
+# helper: browserless HTTP fast path
 # -----------------------------
-def chunked(lst: List[Tuple[str, bool]], n: int) -> List[List[Tuple[str, bool]]]:
-	"""Split list into chunks of size n (last chunk may be smaller)."""
-	return [lst[i:i+n] for i in range(0, len(lst), n)]
+def try_fast_path(site: str) -> List[str]:
+	"""Playlists fast_path.scan finds for site (empty = the browser is needed)."""
+	with span("fast_path", site):
+		fast = fast_path.scan(site)
+	visit_metrics.current().observe("fast_path_hit", site, 1 if fast["links"] else 0)
+	if fast["links"]:
+		rules = sorted(set(fast["links"].values()))
+		print(f"[fast path] {site}: {len(fast['links'])} playlists from {fast['documents']} documents "
+			  f"({', '.join(rules)}), browser not needed")
+	else:
+		print(f"[fast path] {site}: nothing ({fast['candidates']} candidates in {fast['documents']} documents"
+			  f"{', ' + fast['error'] if fast['error'] else ''}) -> browser")
+	return list(fast["links"])
+
+def fast_path_results(sites: List[str], workers: int = FAST_PATH_WORKERS) -> Dict[str, List[str]]:
+	"""Fast path once per site (not once per visit): {site: links} for the sites it answered."""
+	sites = list(dict.fromkeys(sites))
+	if not sites:
+		return {}
+	with ThreadPoolExecutor(max_workers=min(workers, len(sites))) as ex:
+		# each scan runs in a copy of this context (job metrics / job log routing)
+		found = ex.map(lambda site, ctx: ctx.run(try_fast_path, site), sites, [contextvars.copy_context() for _ in sites])
+		return {site: links for site, links in zip(sites, found) if links}
+
+# -----------------------------
+# helper: TTL result cache
+# -----------------------------
+def cached_results(cache: ResultCache, sites: List[str], validate: bool = RESULT_CACHE_VALIDATE) -> Dict[str, Dict]:
+	"""
+	Sites the cache can answer: {site: {"links", "age", "job_id", "validation"}}.
+	validate: cached links are fetched once more and only live / vod playlists are kept;
+	an entry with none left is dropped and the site is visited again. "validation" holds
+	those results (variants included) so the job's final validation does not fetch them again.
+	"""
+	hits = {}
+	for site in dict.fromkeys(sites):
+		entry = cache.get(site)
+		if entry is not None:
+			hits[site] = entry
+	if validate and hits:
+		referers = {u: site for site, entry in hits.items() for u in entry["links"]}
+		checked = validate_links(referers, max_workers=VALIDATE_WORKERS, per_host=VALIDATE_PER_HOST, referers=referers)
+		for site, entry in list(hits.items()):
+			alive = [u for u in entry["links"] if checked.get(u, {}).get("label") in (LIVE, VOD)]
+			if alive:
+				entry["links"] = alive
+				entry["validation"] = {u: res for u, res in checked.items() if u in alive or res.get("parent") in alive}
+			else:
+				print(f"[CACHE] {site}: cached links no longer play, visiting again")
+				cache.invalidate(site)
+				del hits[site]
+	return hits
+
+# -----------------------------
+# helper: build task queue
+# -----------------------------
+def build_tasks(sites: List[str], visits_per_site: int, max_workers: int, strategies: Optional[Dict] = None) -> List[Tuple[str, SiteStrategy, int]]:
+	"""
+	Flatten all sites into one queue of (site, strategy, visit_id).
+	Each site gets the same number of visits as the old lockstep rounds
+	(visits_per_site x max_workers) unless its strategy sets visits / rounds
+	or fans its channel loop out (dooball in "fanout" mode: 1 visit, see SiteStrategy.visit_count;
+	if that visit finds no idle browser to fan out to, the executor queues the remaining
+	strategy.fallback_visits visits, ids strategy.fallback_ids, so the site still gets the old visit count).
+	Sites are interleaved so a slow site never starves the others.
+	strategies: site_strategies.json config (None = read SITE_STRATEGIES_FILE).
+	"""
+	if strategies is None:
+		strategies = load_strategies(SITE_STRATEGIES_FILE)
+	per_site: List[List[Tuple[str, SiteStrategy, int]]] = []
+	for site in sites:
+		strategy = site_strategy(site, strategies)
+		count = strategy.visit_count(visits_per_site, max_workers)
+		if strategy.fans_out():
+			strategy.fallback_visits = max(strategy.sequential_visits(visits_per_site, max_workers) - count, 0)
+			strategy.fallback_ids = list(range(count + 1, count + strategy.fallback_visits + 1))
+		if strategy.name != "default":
+			print(f"[STRATEGY] {site} -> {strategy.name}: {count} visits, phases {', '.join(strategy.phases)}")
+		per_site.append([(site, strategy, v) for v in range(1, count + 1)])
+
+	tasks = []
+	for i in range(max((len(t) for t in per_site), default=0)):
+		for t in per_site:
+			if i < len(t):
+				tasks.append(t[i])
+	return tasks
+
+# -----------------------------
+# execution: threads in this process
+# -----------------------------
+def run_threaded(tasks, selectors, results_map, max_workers, pool, backend, sink: ResultSink, blocking: Optional[dict] = None, requeued_sites: Optional[Set[str]] = None) -> int:
+	"""requeued_sites: sites whose fallback visits are already queued (resumed job); grows as visits requeue."""
+	visits_done = 0
+	total = len(tasks)
+	requeued_sites = set() if requeued_sites is None else requeued_sites
+	requeued: "queue.Queue" = queue.Queue()  # (site, strategy) from fan-out visits without lanes
+	# worker ว่างเมื่อไหร่ก็หยิบ task ถัดไปทันที (ไม่มี barrier ต่อรอบ)
+	# each visit runs in a copy of the caller's context (runner daemon routes job logs by contextvar)
+	with ThreadPoolExecutor(max_workers=max_workers) as ex:
+		def submit(s, strategy, v, requeue=None):
+			return ex.submit(contextvars.copy_context().run, scan_visit, s, selectors, strategy, pool, backend,
+							 functools.partial(sink.url, s, v), blocking, requeue)
+
+		futures = {
+			submit(s, strategy, v, None if v in strategy.fallback_ids else  # queued visits do not re-queue
+				   lambda n, s=s, strategy=strategy: requeued.put((s, strategy))): (s, v)
+			for s, strategy, v in tasks
+		}
+		while futures:
+			done, _ = wait(futures, return_when=FIRST_COMPLETED)
+			for fut in done:
+				site_key, visit_id = futures.pop(fut)
+				visits_done += 1
+				try:
+					_, found = fut.result()
+					results_map[site_key].update(found)
+					sink.visit_done(site_key, visit_id, len(found))
+					print(f"[OK] {site_key} #{visit_id} → +{len(found)} items ({visits_done}/{total})")
+				except Exception as e:
+					print(f"[ERROR] Worker failed: {e}")
+			while not requeued.empty():
+				s, strategy = requeued.get()
+				if s in requeued_sites:
+					continue  # another visit of the site (or an earlier run of the job) queued them already
+				requeued_sites.add(s)
+				sink.requeue(s, strategy.fallback_ids)
+				for v in strategy.fallback_ids:
+					futures[submit(s, strategy, v)] = (s, v)
+				total += len(strategy.fallback_ids)
+	return visits_done
+
+# -----------------------------
+# execution: process shards (each shard = own threads + own browser pool)
+# -----------------------------
+def _shard_main(shard_id, inbox, outbox, selectors, workers, use_pool, backend, blocking=None):
+	"""Shard process entry point: runs visits from inbox until a None sentinel per thread."""
+	selector_stats.start_delta()  # a forked shard inherits the parent's stats; only its own visits go back
+	pool = BrowserPool(size=workers, backend=backend) if use_pool else None
+
+	def worker():
+		while True:
+			task = inbox.get()
+			if task is None:
+				return
+			task_id, site, strategy, can_requeue = task
+			try:
+				on_found = lambda u, path="browser", tid=task_id: outbox.put(("url", shard_id, tid, u, path))
+				requeue = (lambda n, tid=task_id: outbox.put(("requeue", shard_id, tid, n))) if can_requeue else None
+				_, found = scan_visit(site, selectors, strategy, pool, backend, on_found, blocking, requeue)
+				outbox.put(("done", shard_id, task_id, sorted(found)))
+			except Exception as e:
+				outbox.put(("failed", shard_id, task_id, str(e)))
+			outbox.put(("spans", shard_id, visit_metrics.current().take()))
+
+	try:
+		with ThreadPoolExecutor(max_workers=workers) as ex:
+			for _ in range(workers):
+				ex.submit(worker)
+	finally:
+		if pool:
+			pool.close()
+		outbox.put(("stats", shard_id, selector_stats.take_delta()))
+
+def run_sharded(tasks, selectors, results_map, max_workers, shards, use_pool, backend, sink: ResultSink, blocking: Optional[dict] = None, requeued_sites: Optional[Set[str]] = None) -> int:
+	"""
+	Spread the visit queue over `shards` worker processes (max_workers split between them
+	exactly, the first shards take the remainder; never more shards than workers).
+	The parent hands each shard at most its workers' worth of tasks at a time, merges results
+	as they stream back, and restarts a crashed shard after putting its unfinished tasks back.
+	"""
+	ctx = multiprocessing.get_context()
+	max_workers = max(1, max_workers)
+	if shards > max_workers:
+		print(f"[SHARD] {shards} shards for {max_workers} workers -> {max_workers} shards")
+		shards = max_workers
+	workers = {i: max_workers // shards + (1 if i < max_workers % shards else 0) for i in range(shards)}
+	tasks = list(tasks)  # grows by the visits fan-out visits re-queue
+	requeued_sites = set() if requeued_sites is None else requeued_sites
+	pending = deque((i, s, strategy) for i, (s, strategy, _) in enumerate(tasks))
+	outbox = ctx.Queue()
+	procs: Dict[int, multiprocessing.Process] = {}
+	inboxes: Dict[int, "multiprocessing.Queue"] = {}
+	assigned: Dict[int, Dict[int, Tuple[str, SiteStrategy]]] = {}
+	restarts: Dict[int, int] = {}
+	visits_done = 0
+	completed: Set[int] = set()
+	stopped: Set[int] = set()
+
+	def start(shard_id):
+		inboxes[shard_id] = ctx.Queue()
+		assigned[shard_id] = {}
+		procs[shard_id] = ctx.Process(
+			target=_shard_main,
+			args=(shard_id, inboxes[shard_id], outbox, selectors, workers[shard_id], use_pool, backend, blocking),
+			daemon=True
+		)
+		procs[shard_id].start()
+		print(f"[SHARD {shard_id}] started pid={procs[shard_id].pid} ({workers[shard_id]} workers)")
+
+	for shard_id in range(shards):
+		restarts[shard_id] = 0
+		start(shard_id)
+
+	try:
+		while visits_done < len(tasks):
+			# top up every live shard
+			for shard_id, proc in procs.items():
+				while pending and shard_id not in stopped and len(assigned[shard_id]) < workers[shard_id]:
+					task = pending.popleft()
+					if task[0] in completed:
+						continue
+					assigned[shard_id][task[0]] = (task[1], task[2])
+					inboxes[shard_id].put(task + (tasks[task[0]][2] not in task[2].fallback_ids,))  # queued visits do not re-queue
+
+			try:
+				msg = outbox.get(timeout=1.0)
+			except queue.Empty:
+				msg = None
+
+			if msg and msg[0] in ("done", "failed"):
+				_, shard_id, task_id = msg[:3]
+				assigned.get(shard_id, {}).pop(task_id, None)
+				site_key = tasks[task_id][0]
+				if msg[0] == "done":
+					results_map[site_key].update(msg[3])
+				if task_id in completed:
+					continue  # late report of a visit that was re-queued after a crash
+				completed.add(task_id)
+				visits_done += 1
+				sink.visit_done(site_key, tasks[task_id][2], len(msg[3]) if msg[0] == "done" else 0)
+				if msg[0] == "done":
+					print(f"[OK][shard {shard_id}] {site_key} → +{len(msg[3])} items ({visits_done}/{len(tasks)})")
+				else:
+					print(f"[ERROR][shard {shard_id}] Worker failed: {msg[3]}")
+			elif msg and msg[0] == "url":
+				_, shard_id, task_id, url, path = msg
+				site_key, _, visit_id = tasks[task_id]
+				results_map[site_key].add(url)
+				sink.url(site_key, visit_id, url, path)
+			elif msg and msg[0] == "requeue" and tasks[msg[2]][0] not in requeued_sites:
+				# once per site: a visit re-run after a shard crash (or a resumed job) asks again
+				site_key, strategy, _ = tasks[msg[2]]
+				requeued_sites.add(site_key)
+				sink.requeue(site_key, strategy.fallback_ids)
+				for visit_id in strategy.fallback_ids:
+					pending.append((len(tasks), site_key, strategy))
+					tasks.append((site_key, strategy, visit_id))
+			elif msg and msg[0] == "stats":
+				selector_stats.merge(msg[2])
+			elif msg and msg[0] == "spans":
+				visit_metrics.current().extend(msg[2])
+
+			# crashed shard -> put its tasks back and restart it
+			for shard_id, proc in list(procs.items()):
+				if shard_id in stopped or proc.is_alive():
+					continue
+				lost = assigned[shard_id]
+				print(f"[SHARD {shard_id}] died (exit={proc.exitcode}), re-queueing {len(lost)} tasks")
+				for task_id, (site, strategy) in lost.items():
+					pending.appendleft((task_id, site, strategy))
+				assigned[shard_id] = {}
+				if restarts[shard_id] < MAX_SHARD_RESTARTS:
+					restarts[shard_id] += 1
+					start(shard_id)
+				else:
+					print(f"[SHARD {shard_id}] restart limit reached, not restarting")
+					stopped.add(shard_id)
+
+			if len(stopped) == shards:
+				print(f"[ERROR] all shards stopped, {len(tasks) - visits_done} visits not run")
+				break
+	finally:
+		for shard_id, proc in procs.items():
+			if proc.is_alive():
+				for _ in range(workers[shard_id]):
+					inboxes[shard_id].put(None)
+		for shard_id, proc in procs.items():
+			proc.join(timeout=60)
+			if proc.is_alive():
+				proc.terminate()
+		# collect late stats messages
+		while True:
+			try:
+				msg = outbox.get(timeout=0.5)
+			except queue.Empty:
+				break
+			if msg[0] == "stats":
+				selector_stats.merge(msg[2])
+			elif msg[0] == "spans":
+				visit_metrics.current().extend(msg[2])
+
+	return visits_done
 
 # -----------------------------
-# main: build tasks & run in batched parallel rounds
+# main: one long-lived executor fed by a (site, visit) queue
 # -----------------------------
 def main(
 	sites=SITES,
 	visits_per_site=VISITS_PER_SITE,
 	selectors_path=SELECTORS_FILE,
-	max_workers=MAX_WORKERS
+	max_workers=MAX_WORKERS,
+	use_pool=USE_BROWSER_POOL,
+	capture_backend=CAPTURE_BACKEND,
+	shards=SHARDS,
+	job_id=None,
+	stream_path=None,
+	validate=VALIDATE_LINKS,
+	db_path=RESULTS_DB,
+	pool=None,
+	blocking=BLOCKING_ENABLED,
+	tabs_per_browser=TABS_PER_BROWSER,
+	strategies_path=SITE_STRATEGIES_FILE,
+	http_fast_path=True,
+	cache=RESULT_CACHE_ENABLED,
+	cache_ttl=None,
+	force_refresh=False
 ):
-	chromedriver_autoinstaller.install()
+	"""
+	pool: optional warm BrowserPool owned by the caller (runner daemon); it is
+	used when it matches capture_backend and is left open at the end. A job that
+	launches its own browsers instead (shards, tab mode, no pool, other backend)
+	reserves as many of its slots meanwhile (BrowserPool.reserve).
+	blocking: apply BLOCKING_FILE (images / fonts / segments / ad hosts) to every visit.
+	tabs_per_browser: >1 runs that many visits as tabs of one Chrome (TabPool, cdp only).
+	strategies_path: per-site strategies (phases, timeouts, visits, selectors).
+	http_fast_path: False never tries the browserless HTTP fast path in this job (strategies decide
+	otherwise); it runs once per site before the browser visits, sites it answers are not visited.
+	cache: answer sites scanned within cache_ttl seconds (default RESULT_CACHE_TTL) from the result
+	cache instead of visiting them; force_refresh visits every site and refreshes its cache entry.
+	"""
+	ensure_chromedriver()
+	startup_profile.mark("chromedriver resolved", once=True)
 	selectors = load_selectors(selectors_path)
+	blocking_cfg = load_blocking(BLOCKING_FILE) if blocking else None
 	results_map: Dict[str, Set[str]] = {s: set() for s in sites}
-
-	for site in sites:
-		is_db = "dooball" in site.lower()
-		
-		# --- LOGIC CHANGE HERE ---
-		# ถ้าเจอคำว่า dooball ให้ปรับจำนวนรอบเหลือ 1 ทันที
-		# ถ้าไม่ใช่ ให้ใช้ค่าตาม config (visits_per_site)
-		if is_db:
-			current_site_visits = 1
-			print(f"[Config] 'dooball' detected for {site} -> Limiting to 1 round.")
+	own_pool = False
+	metrics = visit_metrics.begin_job()
+	started = time.monotonic()
+	visits_done = 0
+
+	tasks = build_tasks(sites, visits_per_site, max_workers, load_strategies(strategies_path))
+	if not http_fast_path:
+		for _, strategy, _ in tasks:
+			strategy.fast_path = False
+	tab_mode = job_browsers.tab_mode(tabs_per_browser, use_pool, shards)
+	if tab_mode and capture_backend != "cdp":
+		print(f"[TABS] tab mode attributes m3u8 per tab from the DevTools performance log, capture {capture_backend} -> cdp")
+		capture_backend = "cdp"
+
+	# result stream: same job -> same file, so a re-run resumes from what is already there
+	job_id = job_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+	if stream_path is None:
+		stream_path = os.path.join(STREAMS_FOLDER, f"{job_id}_m3u8.jsonl")
+	streamed, finished = load_stream(stream_path)
+	# fan-out fallback visits an earlier run queued: queued again unless finished, never queued twice
+	requeued_sites = load_requeued(stream_path)
+	strategies = {site: strategy for site, strategy, _ in tasks}
+	tasks += [(site, strategies[site], v) for site in requeued_sites if site in strategies for v in strategies[site].fallback_ids]
+	if finished:
+		tasks = [t for t in tasks if (t[0], t[2]) not in finished]
+		print(f"[RESUME] {len(finished)} visits already in {stream_path}, {len(tasks)} left")
+	store = ResultStore(db_path) if db_path else None
+	sink = ResultSink(stream_path, job_id, store=store)
+	print(f"[STREAM] {stream_path}")
+
+	cache_ttl = RESULT_CACHE_TTL if cache_ttl is None else float(cache_ttl)
+	result_cache = ResultCache(RESULT_CACHE_DB, cache_ttl, RESULT_CACHE_MAX_SITES, RESULT_CACHE_MAX_LINKS) \
+		if cache and cache_ttl > 0 else None
+	cached: Dict[str, Dict] = {}
+	if result_cache and not force_refresh:
+		cached = cached_results(result_cache, sites, validate=validate and RESULT_CACHE_VALIDATE)
+		for site, entry in cached.items():
+			results_map.setdefault(site, set()).update(entry["links"])
+			for u in entry["links"]:
+				if u not in streamed.get(site, ()):  # a resumed job already has it in its stream
+					sink.url(site, 0, u, "cache")
+			print(f"[CACHE] {site}: {len(entry['links'])} links from job {entry['job_id']} "
+				  f"({entry['age'] / 60:.1f} min old), not visited")
+		tasks = [t for t in tasks if t[0] not in cached]
+		print(f"[CACHE] {len(cached)}/{len(set(sites))} sites answered from cache (ttl {cache_ttl:.0f}s)")
+	elif result_cache:
+		print("[CACHE] force refresh: every site is visited, cache entries are replaced")
+
+	fast_hits = fast_path_results([site for site, strategy, _ in tasks if strategy.fast_path])
+	for site, links in fast_hits.items():
+		results_map.setdefault(site, set()).update(links)
+		for u in links:
+			if u not in streamed.get(site, ()):  # a resumed job already has it in its stream
+				sink.url(site, 0, u, "http")
+	tasks = [t for t in tasks if t[0] not in fast_hits]
+	for _, strategy, _ in tasks:
+		strategy.fast_path = False  # already tried for these sites, visits go straight to the browser
+	if fast_hits:
+		print(f"[FAST PATH] {len(fast_hits)} sites answered over HTTP, not visited")
+
+	print(f"[QUEUE] {len(tasks)} visits across {len(sites)} sites, {max_workers} workers, capture={capture_backend}, "
+		  f"blocking={'on' if blocking_cfg else 'off'}" + (f", {tabs_per_browser} tabs per browser" if tab_mode else ""))
+
+	warm_pool, reserved = None, 0
+	if pool is not None and (shards > 0 or not use_pool or tab_mode or pool.backend != capture_backend):
+		# shared pool does not fit this job: it gives up as many slots as the job launches
+		# browsers of its own, so the warm browsers and the job's stay within the host budget
+		warm_pool, pool = pool, None
+		reserved = warm_pool.reserve(-(-max_workers // tabs_per_browser) if tab_mode else max_workers)
+		print(f"[POOL] warm pool does not fit this job, {reserved} warm slots handed over")
+
+	sampler = MemorySampler().start()
+	try:
+		if shards > 0:
+			visits_done = run_sharded(tasks, selectors, results_map, max_workers, shards, use_pool, capture_backend, sink, blocking_cfg, requeued_sites)
+			mode = f"{min(shards, max(1, max_workers))} shards, pool {'on' if use_pool else 'off'}"
 		else:
-			current_site_visits = visits_per_site
-		# -------------------------
-
-		print(f"\n==============================")
-		print(f"  SCANNING SITE: {site}")
-		print(f"==============================")
-
-		# ใช้ current_site_visits แทน visits_per_site ใน loop นี้
-		for round_index in range(1, current_site_visits + 1):
-			print(f"[ROUND {round_index}/{current_site_visits}] Launching {max_workers} browsers...")
-			tasks = [(site, is_db) for _ in range(max_workers)]
-
-			with ThreadPoolExecutor(max_workers=max_workers) as ex:
-				futures = {ex.submit(scan_visit, s, selectors, db): s for s, db in tasks}
-				for fut in as_completed(futures):
-					site_key = futures[fut]
-					try:
-						_, found = fut.result()
-						results_map[site_key].update(found)
-						print(f"[OK] {site_key} → +{len(found)} items")
-					except Exception as e:
-						print(f"[ERROR] Worker failed: {e}")
-
-			print(f"[ROUND {round_index}] finished for {site}")
-			human_pause_long(1.0, 2.0)
+			if tab_mode:
+				pool = TabPool(size=max_workers, tabs_per_browser=tabs_per_browser)
+				own_pool = True
+			elif pool is None and use_pool:
+				pool = BrowserPool(size=max_workers, backend=capture_backend)
+				own_pool = True
+			visits_done = run_threaded(tasks, selectors, results_map, max_workers, pool, capture_backend, sink, blocking_cfg, requeued_sites)
+			mode = f"pool {'on' if own_pool else 'warm'} (launched={pool.launched}, retired={pool.retired})" if pool else "pool off"
+			if tab_mode:
+				mode = f"{tabs_per_browser} tabs per browser, {mode}"
+	finally:
+		sink.close()
+		if pool and own_pool:
+			pool.close()
+		if warm_pool:
+			warm_pool.unreserve(reserved)
+		memory = sampler.stop()
+		try:
+			selector_stats.save()
+		except Exception as e:
+			print(f"[WARN] could not save selector stats: {e}")
+
+	elapsed = time.monotonic() - started
+	print(f"[SUMMARY] {visits_done} visits in {elapsed:.1f}s -> {visits_done / max(elapsed / 60, 1e-9):.2f} visits/min [{mode}]")
+	print(f"[PATHS] links by path: {', '.join(f'{k}={v}' for k, v in sorted(sink.paths.items())) or 'none'}")
+	# browser memory of this process tree (a runner daemon also counts other jobs' browsers)
+	memory_per_gb = per_gb(memory, max_workers, visits_done, elapsed)
+	if memory_per_gb:
+		print(f"[MEMORY] peak {memory['peak_mb']:.0f} MB ({memory['metric']}), {memory_per_gb['mb_per_concurrent_visit']:.0f} MB per "
+			  f"concurrent visit -> {memory_per_gb['concurrent_visits_per_gb']:.2f} concurrent visits/GB, "
+			  f"{memory_per_gb['visits_per_min_per_gb']:.2f} visits/min/GB [{'tabs ' + str(tabs_per_browser) + '/browser' if tab_mode else 'browser per visit'}]")
+	else:
+		print("[MEMORY] not measurable here (install psutil)")
 
-	# export excel หลังจบรอบทั้งหมด
-	export_xlsx(results_map)
+	# per-phase timing (hot phases first)
+	try:
+		phases_path = os.path.join(RESULTS_FOLDER, f"{job_id}_phases.json")
+		phase_summary = metrics.write_json(phases_path, job_id, {
+			"blocking": bool(blocking_cfg), "capture": capture_backend,
+			"tabs_per_browser": tabs_per_browser if tab_mode else 1, "workers": max_workers,
+			"memory": memory, "memory_per_gb": memory_per_gb, "links_by_path": dict(sink.paths),
+			"cache": dict(result_cache.stats) if result_cache else None,
+		})
+		metrics.write_prometheus(os.path.join(RESULTS_FOLDER, f"{job_id}_phases.prom"), job_id)
+		for phase, st in phase_summary["phases"].items():
+			print(f"[PHASE] {phase:<16} n={st['count']:<4} p50={st['p50_s']:.2f}s p90={st['p90_s']:.2f}s "
+				  f"p99={st['p99_s']:.2f}s total={st['sum_s']:.1f}s errors={st['errors']}")
+		for name, per in phase_summary["values"].items():
+			st = per["all"]
+			print(f"[VALUE] {name:<16} n={st['count']:<4} p50={st['p50']:.0f} p90={st['p90']:.0f} total={st['sum']:.0f}")
+		print(f"[PHASE] summary -> {phases_path}")
+	except Exception as e:
+		print(f"[WARN] could not export phase metrics: {e}")
+
+	# export excel จาก stream (รวมผลจากรอบก่อนหน้าถ้า resume)
+	streamed, _ = load_stream(stream_path)
+	for site, links in streamed.items():
+		results_map.setdefault(site, set()).update(links)
+
+	validation_map: Dict[str, Dict] = {}
+	if validate:
+		# cached links were validated by the cache check already
+		validation_map = {u: res for entry in cached.values() for u, res in entry.get("validation", {}).items()}
+		reused = len(validation_map)
+		referers = {u: site for site, links in results_map.items() for u in links if u not in validation_map}
+		t0 = time.monotonic()
+		if referers:
+			validation_map.update(validate_links(referers, max_workers=VALIDATE_WORKERS, per_host=VALIDATE_PER_HOST, referers=referers))
+		counts: Dict[str, int] = {}
+		for res in validation_map.values():
+			counts[res["label"]] = counts.get(res["label"], 0) + 1
+		print(f"[VALIDATE] {len(validation_map)} playlists in {time.monotonic() - t0:.1f}s -> {counts} "
+			  f"({reused} from the cache check)")
+
+	if result_cache:
+		# visited sites refresh their entry; with validation only playing links are cached
+		for site in dict.fromkeys(sites):
+			if site in cached:
+				continue
+			links = [u for u in results_map.get(site, ()) if not validation_map or validation_map.get(u, {}).get("label") in (LIVE, VOD)]
+			try:
+				result_cache.put(site, links, job_id)
+			except Exception as e:
+				print(f"[WARN] could not cache {site}: {e}")
+		st = result_cache.summary()
+		rate = f"{st['hit_rate']:.0%}" if st["hit_rate"] is not None else "n/a"
+		print(f"[CACHE] hit rate {rate} ({st['hits']} hits, {st['misses']} misses: {st['stale']} stale, "
+			  f"{st['invalid']} invalid), {st['stored']} stored, {st['evicted']} evicted, {st['entries']} entries")
+
+	if store:
+		for site, links in results_map.items():
+			store.set_labels(site, {u: validation_map[u]["label"] for u in links if u in validation_map})
+		store.close()
+		print(f"[STORE] {len(store.new_in_job(job_id))} links never seen by earlier jobs ({db_path})")
+
+	export_xlsx(results_map, validation=validation_map)
 
 if __name__ == "__main__":
 	main()
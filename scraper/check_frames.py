@@ -0,0 +1,134 @@
+"""
+Check: frame switches done by the iframe helpers through the FrameTree snapshot.
+
+A fake driver models a page with 3 top-level iframes, the first one holding a
+nested iframe, and counts switch_to.frame calls. Each helper must switch no more
+than the old find_elements("iframe") loops did (BASELINE), once the page is mapped:
+
+    activate_player       3   (each top frame once)
+    ensure_stream_start   3
+    play_in_iframes       3
+    handle_skip_ads       4   (top frames + the nested one, depth 2)
+    poll_skip_watchers    4
+
+then checks that a changed frame set (top document or inside a frame) is
+re-mapped on the next pass. No browser involved.
+
+Usage:
+    python check_frames.py
+"""
+import sys
+
+import bypass_parallel as bp
+
+BASELINE = {
+    "activate_player": 3,
+    "ensure_stream_start": 3,
+    "play_in_iframes": 3,
+    "handle_skip_ads": 4,
+    "poll_skip_watchers": 4,
+}
+
+
+class FakeDoc:
+    def __init__(self, href, children=()):
+        self.href = href
+        self.gen = 0
+        self.observed = False
+        self.frames = [FakeFrame(c) for c in children]
+
+
+class FakeFrame:
+    def __init__(self, doc):
+        self.doc = doc
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def frame(self, el):
+        if el not in self.driver.doc.frames:
+            raise Exception("no such frame")
+        self.driver.switches += 1
+        self.driver.doc = el.doc
+
+    def default_content(self):
+        self.driver.doc = self.driver.top
+
+
+class FakeDriver:
+    def __init__(self, top):
+        self.top = self.doc = top
+        self.switches = 0
+        self.switch_to = FakeSwitchTo(self)
+        self.skip_watcher = {"rules": [{"css": "button.skip"}], "script": "", "id": None}
+
+    def execute_script(self, script, *args):
+        doc = self.doc
+        if script == bp._FRAME_SCAN_JS:
+            doc.observed = True
+            return [doc.href, doc.gen, [[f, f.doc.href] for f in doc.frames]]
+        if script == bp._FRAME_GEN_JS:
+            return [doc.href, doc.gen if doc.observed else None]
+        return None
+
+    def find_element(self, by, value):
+        raise Exception("no such element")
+
+    def find_elements(self, by, value):
+        return []
+
+
+def make_page():
+    return FakeDoc("https://site/", [
+        FakeDoc("https://player/a", [FakeDoc("https://player/a/inner")]),
+        FakeDoc("https://player/b"),
+        FakeDoc("https://ads/c"),
+    ])
+
+
+HELPERS = {
+    "activate_player": lambda d: bp.activate_player(d),
+    "ensure_stream_start": lambda d: bp.ensure_stream_start(d),
+    "play_in_iframes": lambda d: bp.play_in_iframes(d),
+    "handle_skip_ads": lambda d: bp.handle_skip_ads(d, {}),
+    "poll_skip_watchers": lambda d: bp.poll_skip_watchers(d),
+}
+
+
+def check():
+    """Runs every helper on a mapped page; returns True when switch counts and re-mapping match."""
+    bp.human_pause = lambda *a, **k: None
+    ok = True
+    driver = FakeDriver(make_page())
+    bp.frame_tree(driver).frames()
+    print(f"{'helper':<20} {'baseline':>8} {'now':>5}  result")
+    for name, run in HELPERS.items():
+        driver.switches = 0
+        run(driver)
+        passed = driver.switches <= BASELINE[name]
+        ok = ok and passed
+        print(f"{name:<20} {BASELINE[name]:>8} {driver.switches:>5}  {'ok' if passed else 'FAIL'}")
+
+    tree = bp.frame_tree(driver)
+    # new iframe inside a (cross-origin) player frame: seen when a helper enters it
+    page = driver.top.frames[1].doc
+    page.frames.append(FakeFrame(FakeDoc("https://player/b/inner")))
+    page.gen += 1
+    bp.handle_skip_ads(driver, {})
+    passed = len(tree.frames()) == 5
+    ok = ok and passed
+    print(f"{'frame changed':<20} {'':>8} {len(tree.nodes):>5}  {'ok' if passed else 'FAIL'} (5 frames mapped)")
+
+    # new top-level iframe: seen by the top generation check
+    driver.top.frames.append(FakeFrame(FakeDoc("https://player/d")))
+    driver.top.gen += 1
+    passed = len(tree.frames(max_depth=1)) == 4
+    ok = ok and passed
+    print(f"{'top changed':<20} {'':>8} {len(tree.nodes):>5}  {'ok' if passed else 'FAIL'} (4 top frames)")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check() else 1)
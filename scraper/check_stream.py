@@ -0,0 +1,52 @@
+"""
+Check: resuming a result stream whose last line was torn by a crash.
+
+A first run writes site a's visit, then dies mid-way through a record (no trailing
+newline). A resumed run appends site b's url + visit; load_stream must return both
+links and both finished visits, and a third open must not lose anything either.
+
+No browser involved (stdlib only).
+
+Usage:
+    python check_stream.py
+"""
+import os
+import sys
+import tempfile
+
+from result_sink import ResultSink, load_stream
+
+EXPECTED_RESULTS = {"a": {"https://a/1.m3u8"}, "b": {"https://b/1.m3u8"}}
+EXPECTED_FINISHED = {("a", 1), ("b", 1)}
+
+
+def check():
+    """Returns True when the resumed stream keeps every record written after the torn line."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "job_m3u8.jsonl")
+        sink = ResultSink(path, "job")
+        sink.url("a", 1, "https://a/1.m3u8")
+        sink.visit_done("a", 1, 1)
+        sink.close()
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"event": "url", "site": "a", "visit": 2, "url": "https://a/2.m3')  # crash mid-write
+
+        sink = ResultSink(path, "job")  # resume
+        sink.url("b", 1, "https://b/1.m3u8")
+        sink.visit_done("b", 1, 1)
+        sink.close()
+        ResultSink(path, "job").close()  # clean tail: nothing is cut
+
+        results, finished = load_stream(path)
+        with open(path, "rb") as f:
+            lines = f.read().split(b"\n")
+
+    ok = results == EXPECTED_RESULTS and finished == EXPECTED_FINISHED and lines[-1] == b""
+    print(f"results  {sorted((s, sorted(u)) for s, u in results.items())}")
+    print(f"finished {sorted(finished)}")
+    print("ok" if ok else f"FAIL expected {sorted(EXPECTED_FINISHED)} with links of a and b")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check() else 1)
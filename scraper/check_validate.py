@@ -0,0 +1,83 @@
+"""
+Check: m3u8_validate.validate_links against fixture playlists on a local server.
+
+A ThreadingHTTPServer serves fixtures/playlists/, each playlist is validated
+through the same pooled client the jobs use and its label is compared with
+EXPECTED:
+
+    master.m3u8        master playlist; labelled after its best variant
+    master_720.m3u8    live variant of master        (expanded, parent = master)
+    master_360.m3u8    missing variant of master     (404, expanded, parent = master)
+    live.m3u8          sliding window, no ENDLIST
+    vod.m3u8           PLAYLIST-TYPE:VOD + ENDLIST
+    break.m3u8         ad break: neutral url, segments on /ads/
+    missing.m3u8       404
+
+No browser and no third-party site involved (stdlib only).
+
+Usage:
+    python check_validate.py
+"""
+import os
+import sys
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from m3u8_validate import AD, DEAD, LIVE, VOD, validate_links
+
+PLAYLISTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "playlists")
+# path -> (label, parent path or None)
+EXPECTED = {
+    "/master.m3u8": (LIVE, None),
+    "/master_720.m3u8": (LIVE, "/master.m3u8"),
+    "/master_360.m3u8": (DEAD, "/master.m3u8"),
+    "/live.m3u8": (LIVE, None),
+    "/vod.m3u8": (VOD, None),
+    "/break.m3u8": (AD, None),
+    "/missing.m3u8": (DEAD, None),
+}
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), partial(QuietHandler, directory=PLAYLISTS_DIR))
+    threading.Thread(target=server.serve_forever, name="playlist-server", daemon=True).start()
+    return server
+
+
+def check():
+    """Validates every top-level fixture playlist; returns True when all labels (and parents) match."""
+    server = start_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        urls = [base_url + p for p, (_, parent) in EXPECTED.items() if parent is None]
+        t0 = time.monotonic()
+        results = validate_links(urls, max_workers=4, per_host=2, timeout=5.0)
+        print(f"{len(results)} playlists validated in {(time.monotonic() - t0) * 1000:.0f} ms")
+    finally:
+        server.shutdown()
+
+    ok = len(results) == len(EXPECTED)
+    print(f"{'playlist':<18} {'label':<6} {'status':>6} {'ms':>6}  result")
+    for path, (label, parent) in EXPECTED.items():
+        res = results.get(base_url + path)
+        if res is None:
+            ok = False
+            print(f"{path:<18} {'-':<6} {'-':>6} {'-':>6}  FAIL not validated")
+            continue
+        got_parent = res.get("parent", "")[len(base_url):] or None
+        passed = res["label"] == label and got_parent == parent
+        ok = ok and passed
+        print(f"{path:<18} {res['label']:<6} {res['status'] or '-':>6} {res['latency_ms'] or 0:>6.1f}  "
+              f"{'ok' if passed else 'FAIL'}" + ("" if passed else f" expected {label} (parent {parent})"))
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check() else 1)
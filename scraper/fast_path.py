@@ -0,0 +1,173 @@
+"""
+Browserless fast path: fetch a page (and its iframes / same-host scripts) over
+the pooled HTTP client and pull playlist URLs straight out of the HTML and JS.
+
+Pages that embed the m3u8 in the source or an inline player config (e.g. the
+?channel= player pages) are answered in well under a second instead of a full
+Chrome visit; scan_visit launches the browser only when this finds nothing.
+
+Extraction rules (EXTRACT_RULES, applied to every fetched document after
+un-escaping \\/ and \\u002F):
+    absolute   https://host/path/x.m3u8?query anywhere in the text
+    quoted     "…x.m3u8…" string literal, resolved against the document url
+    concat     "/live/" + ch + ".m3u8"      ch resolved from the page query
+    template   `/live/${ch}.m3u8`           (?ch= / .get('ch') / "ch = '…'")
+    base64     atob("…")                    decoded and scanned again
+
+Candidates are fetched once (Referer = the document) and kept only if the body
+is an HLS playlist, so template fragments and dead links never reach results.
+"""
+import base64
+import binascii
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+from http_pool import HttpPool
+from m3u8_validate import parse_playlist
+
+IFRAME_DEPTH = 2       # nested iframes followed
+MAX_FETCHES = 12       # documents (page + iframes + scripts) per scan
+MAX_SCRIPTS = 4        # same-host <script src> fetched per document
+VERIFY = True          # keep only candidates that answer with an HLS playlist
+TIMEOUT = 6.0
+
+M3U8 = r"\.m3u8(?:\?[^\s\"'<>()\\`]*)?"
+_IDENT = r"[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*"
+
+EXTRACT_RULES: List[Tuple[str, "re.Pattern"]] = [
+    ("absolute", re.compile(r"https?://[^\s\"'<>()\\`]+?" + M3U8)),
+    ("quoted", re.compile(r"[\"']([^\"'\s<>]+?" + M3U8 + r")[\"']")),
+    ("concat", re.compile(r"[\"']([^\"'\s]*)[\"']\s*\+\s*(" + _IDENT + r")\s*\+\s*[\"']([^\"'\s]*?" + M3U8 + r")[\"']")),
+    ("template", re.compile(r"`([^`]*?)\$\{\s*(" + _IDENT + r")\s*\}([^`]*?" + M3U8 + r")`")),
+    ("base64", re.compile(r"atob\(\s*[\"']([A-Za-z0-9+/=]{16,})[\"']\s*\)")),
+]
+
+_IFRAME_RE = re.compile(r"<iframe\b[^>]*?\bsrc\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+_SCRIPT_RE = re.compile(r"<script\b[^>]*?\bsrc\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+
+_client_lock = threading.Lock()
+_client: Optional[HttpPool] = None
+
+
+def client() -> HttpPool:
+    """Process-wide pool, so visits of the same site reuse keep-alive connections."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpPool(per_host=2, timeout=TIMEOUT)
+        return _client
+
+
+def _unescape(text: str) -> str:
+    return text.replace("\\/", "/").replace("\\u002F", "/").replace("\\u002f", "/")
+
+
+def _resolve_name(name: str, text: str, query: Dict[str, str]) -> Optional[str]:
+    """Value of a JS identifier used to build the url: page query, .get('param') or a string literal."""
+    short = name.rsplit(".", 1)[-1]
+    if short in query:
+        return query[short]
+    name_re = re.escape(short) + r"\s*=(?!=)\s*([^;\n]+)"
+    assign = re.search(r"\b(?:var|let|const)\s+" + name_re, text) or re.search(r"(?<![\w$.?&])" + name_re, text)
+    if assign:
+        rhs = assign.group(1)
+        param = re.search(r"\.get\(\s*[\"'](\w+)[\"']\s*\)", rhs)
+        if param and param.group(1) in query:
+            return query[param.group(1)]
+        literal = re.match(r"\s*[\"']([^\"']+)[\"']", rhs) or re.search(r"\|\|\s*[\"']([^\"']+)[\"']", rhs)
+        if literal:
+            return literal.group(1)
+    return None
+
+
+def extract(text: str, doc_url: str, query: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Candidate playlist urls in one document -> name of the rule that found them."""
+    text = _unescape(text)
+    query = query or {}
+    found: Dict[str, str] = {}
+
+    def add(candidate: str, rule: str):
+        url = urljoin(doc_url, candidate.strip())
+        if urlsplit(url).scheme in ("http", "https"):
+            found.setdefault(url, rule)
+
+    for rule, pattern in EXTRACT_RULES:
+        for m in pattern.finditer(text):
+            if rule == "absolute":
+                add(m.group(0), rule)
+            elif rule == "quoted":
+                add(m.group(1), rule)
+            elif rule in ("concat", "template"):
+                value = _resolve_name(m.group(2), text, query)
+                if value is not None:
+                    add(m.group(1) + value + m.group(3), rule)
+            elif rule == "base64":
+                try:
+                    decoded = base64.b64decode(m.group(1)).decode("utf-8")
+                except (binascii.Error, UnicodeDecodeError, ValueError):
+                    continue
+                if re.fullmatch(r"[^\s\"'<>]+" + M3U8, decoded.strip()):
+                    add(decoded, rule)  # atob("<the url itself>")
+                for url in extract(decoded, doc_url, query):
+                    found.setdefault(url, rule)
+    # a concatenation also leaves its ".m3u8" tail as a quoted literal: keep only complete urls
+    return {u: r for u, r in found.items() if not urlsplit(u).path.endswith("/.m3u8")}
+
+
+def _query(url: str) -> Dict[str, str]:
+    return {k: v[0] for k, v in parse_qs(urlsplit(url).query).items() if v}
+
+
+def _verify(http: HttpPool, url: str, referer: str) -> bool:
+    try:
+        resp = http.get(url, headers={"Referer": referer})
+    except Exception:
+        return False
+    return resp.status < 400 and parse_playlist(resp.text(), resp.url) is not None
+
+
+def scan(site: str, http: Optional[HttpPool] = None, depth: int = IFRAME_DEPTH, verify: bool = VERIFY) -> Dict:
+    """
+    Returns {"links": {url: rule}, "candidates": n, "documents": n, "error": str | None}.
+    links is empty when nothing verifiable was found (caller falls back to the browser).
+    """
+    http = http or client()
+    result = {"links": {}, "candidates": 0, "documents": 0, "error": None}
+    candidates: Dict[str, Tuple[str, str]] = {}  # url -> (rule, referer)
+    queue: List[Tuple[str, int, Optional[str]]] = [(site, 0, None)]
+    seen = set()
+    top_query = _query(site)
+    while queue and result["documents"] < MAX_FETCHES:
+        url, level, referer = queue.pop(0)
+        if url in seen:
+            continue
+        seen.add(url)
+        try:
+            resp = http.get(url, headers={"Referer": referer} if referer else None)
+        except Exception as e:
+            if level == 0:
+                result["error"] = f"{type(e).__name__}: {e}"
+            continue
+        result["documents"] += 1
+        if resp.status >= 400:
+            if level == 0:
+                result["error"] = f"HTTP {resp.status}"
+            continue
+        text = resp.text()
+        query = dict(top_query, **_query(resp.url))
+        for cand, rule in extract(text, resp.url, query).items():
+            candidates.setdefault(cand, (rule, resp.url))
+        if level >= 0:  # scripts (level -1) are scanned, not crawled
+            host = urlsplit(resp.url).hostname
+            scripts = [urljoin(resp.url, s) for s in _SCRIPT_RE.findall(text)]
+            queue += [(s, -1, resp.url) for s in scripts if urlsplit(s).hostname == host][:MAX_SCRIPTS]
+            if level < depth:
+                queue += [(urljoin(resp.url, f), level + 1, resp.url) for f in _IFRAME_RE.findall(text)
+                          if not f.startswith(("about:", "javascript:", "data:"))]
+    result["candidates"] = len(candidates)
+    for url, (rule, referer) in candidates.items():
+        if not verify or _verify(http, url, referer):
+            result["links"][url] = rule
+    return result
@@ -0,0 +1,12 @@
+// Fake HLS player: requests a live playlist and keeps polling it like hls.js would.
+var streamTimer = null;
+
+function loadStream(name) {
+	var url = "/live/" + name + ".m3u8?token=" + Math.random().toString(36).slice(2);
+	function poll() { fetch(url).catch(function () {}); }
+	if (streamTimer) clearInterval(streamTimer);
+	poll();
+	streamTimer = setInterval(poll, 2000);
+	var status = document.getElementById("status");
+	if (status) status.textContent = "playing " + name;
+}
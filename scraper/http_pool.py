@@ -0,0 +1,125 @@
+"""
+Small pooled HTTP client (stdlib only).
+
+- keep-alive connections reused per (scheme, host, port)
+- per-host concurrency limit (threads block until a slot frees up)
+- follows redirects, caps response size, returns latency
+"""
+import http.client
+import ssl
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "*/*",
+    "Accept-Encoding": "identity",
+    "Connection": "keep-alive",
+}
+
+
+class HttpResponse:
+    def __init__(self, url: str, status: int, headers: Dict[str, str], body: bytes, latency: float):
+        self.url = url          # final url (after redirects)
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.latency = latency  # seconds, first request -> full body
+
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+
+class HttpPool:
+    def __init__(self, per_host: int = 2, timeout: float = 8.0, max_idle_per_host: int = 4,
+                 max_bytes: int = 2 * 1024 * 1024, verify_tls: bool = True):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.max_bytes = max_bytes
+        self._ssl = ssl.create_default_context() if verify_tls else ssl._create_unverified_context()
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._slots.get(host)
+            if sem is None:
+                sem = self._slots[host] = threading.BoundedSemaphore(self.per_host)
+            return sem
+
+    def _checkout(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self._ssl)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _request_once(self, url: str, headers: Dict[str, str]):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise ValueError(f"unsupported scheme: {url}")
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        # a pooled connection may have been closed by the server -> retry once on a fresh one
+        for attempt in range(2):
+            conn = self._checkout(key)
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read(self.max_bytes)
+                # fully read -> response closes itself; truncated at max_bytes -> not reusable
+                reusable = not resp.will_close and resp.isclosed()
+                status, resp_headers = resp.status, {k.lower(): v for k, v in resp.getheaders()}
+                if reusable:
+                    self._checkin(key, conn)
+                else:
+                    conn.close()
+                return status, resp_headers, body
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if attempt:
+                    raise
+            except Exception:
+                conn.close()
+                raise
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, max_redirects: int = 5) -> HttpResponse:
+        hdrs = dict(DEFAULT_HEADERS)
+        hdrs.update(headers or {})
+        started = time.monotonic()
+        for _ in range(max_redirects + 1):
+            with self._slot(urlsplit(url).hostname or ""):
+                status, resp_headers, body = self._request_once(url, hdrs)
+            if status in (301, 302, 303, 307, 308) and resp_headers.get("location"):
+                url = urljoin(url, resp_headers["location"])
+                continue
+            return HttpResponse(url, status, resp_headers, body, time.monotonic() - started)
+        raise RuntimeError(f"too many redirects: {url}")
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for c in conns:
+                c.close()
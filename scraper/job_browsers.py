@@ -0,0 +1,20 @@
+"""
+How many Chromes a job runs for its workers (stdlib only: the scheduler imports it
+for admission control, bypass_parallel.main for the run itself, so both agree).
+
+Tab mode (several visits as tabs of one Chrome) only applies to the threaded,
+pooled path; sharded jobs and jobs without a pool run one browser per worker
+whatever tabs_per_browser says.
+"""
+
+
+def tab_mode(tabs_per_browser: int, use_pool: bool, shards: int) -> bool:
+    return tabs_per_browser > 1 and use_pool and shards == 0
+
+
+def tabs_in_effect(job: dict) -> int:
+    """Workers per browser for a job file (same keys and defaults as runner.run_job_file)."""
+    tabs = max(int(job.get("tabs_per_browser", 1)), 1)
+    if tab_mode(tabs, bool(job.get("use_pool", True)), int(job.get("shards", 0))):
+        return tabs
+    return 1
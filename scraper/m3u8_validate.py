@@ -0,0 +1,138 @@
+"""
+Post-capture validation of sniffed m3u8 URLs.
+
+- fetches playlists concurrently over a pooled HTTP client (bounded overall
+  concurrency + per-host limit)
+- master playlists are expanded into their variant streams (validated too)
+- each URL is labelled live / vod / dead / ad, with status and fetch latency
+
+validate_links() works on any http(s) URL, including a local test server
+serving fixture playlists.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urljoin
+
+from http_pool import HttpPool
+
+LIVE = "live"
+VOD = "vod"
+DEAD = "dead"
+AD = "ad"
+
+# hosts / path fragments of ad playlists and ad segments
+AD_PATTERN = re.compile(
+    r"(doubleclick|googlesyndication|imasdk|adserver|adservice|preroll|midroll|/vast|"
+    r"[/._-]ads?[/._-]|[?&]ad(id|unit)=)",
+    re.IGNORECASE,
+)
+
+
+def parse_playlist(text: str, base_url: str) -> Optional[Dict]:
+    """Minimal HLS parser; returns None if the body is not an m3u8 playlist."""
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    if not lines or not lines[0].startswith("#EXTM3U"):
+        return None
+
+    info = {"is_master": False, "variants": [], "segments": [], "endlist": False,
+            "playlist_type": None, "ad_markers": 0}
+    pending_variant = None
+    for line in lines[1:]:
+        if line.startswith("#EXT-X-STREAM-INF"):
+            attrs = dict(re.findall(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)', line.split(":", 1)[1]))
+            pending_variant = {
+                "bandwidth": int(attrs.get("BANDWIDTH", "0") or 0),
+                "resolution": attrs.get("RESOLUTION", "").strip('"') or None,
+            }
+            info["is_master"] = True
+        elif line.startswith("#EXT-X-ENDLIST"):
+            info["endlist"] = True
+        elif line.startswith("#EXT-X-PLAYLIST-TYPE"):
+            info["playlist_type"] = line.split(":", 1)[1].strip().upper()
+        elif line.startswith(("#EXT-X-CUE-OUT", "#EXT-OATCLS-SCTE35", "#EXT-X-SCTE35")) or \
+                (line.startswith("#EXT-X-DATERANGE") and re.search(r'CLASS="[^"]*ad', line, re.IGNORECASE)):
+            info["ad_markers"] += 1
+        elif line.startswith("#"):
+            continue
+        elif pending_variant is not None:
+            pending_variant["url"] = urljoin(base_url, line)
+            info["variants"].append(pending_variant)
+            pending_variant = None
+        else:
+            info["segments"].append(urljoin(base_url, line))
+    return info
+
+
+def classify(url: str, status: Optional[int], parsed: Optional[Dict]) -> str:
+    if AD_PATTERN.search(url):
+        return AD
+    if status is None or status >= 400 or parsed is None:
+        return DEAD
+    if parsed["is_master"]:
+        return LIVE if parsed["variants"] else DEAD  # refined from variants by the caller
+    segments = parsed["segments"]
+    if not segments:
+        return DEAD
+    if sum(1 for s in segments if AD_PATTERN.search(s)) * 2 > len(segments):
+        return AD
+    if parsed["endlist"] or parsed["playlist_type"] == "VOD":
+        return VOD
+    return LIVE
+
+
+def _fetch(client: HttpPool, url: str, referer: Optional[str]) -> Dict:
+    result = {"url": url, "label": DEAD, "status": None, "latency_ms": None, "variants": [], "error": None}
+    try:
+        resp = client.get(url, headers={"Referer": referer} if referer else None)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["label"] = classify(url, None, None)
+        return result
+    parsed = parse_playlist(resp.text(), resp.url) if resp.status < 400 else None
+    result.update(
+        status=resp.status,
+        latency_ms=round(resp.latency * 1000, 1),
+        label=classify(url, resp.status, parsed),
+    )
+    if parsed and parsed["is_master"]:
+        result["variants"] = [v["url"] for v in parsed["variants"]]
+        result["master"] = True
+    return result
+
+
+def validate_links(urls: Iterable[str], max_workers: int = 8, per_host: int = 2, timeout: float = 8.0,
+                   referers: Optional[Dict[str, str]] = None) -> Dict[str, Dict]:
+    """
+    Validate captured URLs (+ variants of master playlists).
+    Returns {url: {"label", "status", "latency_ms", "variants", "parent"?, "error"}}.
+    A master playlist is labelled after its best variant (live > vod > ad > dead).
+    """
+    referers = referers or {}
+    client = HttpPool(per_host=per_host, timeout=timeout)
+    results: Dict[str, Dict] = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            todo: List[str] = list(dict.fromkeys(urls))
+            parents: Dict[str, str] = {}
+            while todo:
+                batch = [u for u in todo if u not in results]
+                todo = []
+                for res in ex.map(lambda u: _fetch(client, u, referers.get(u) or referers.get(parents.get(u))), batch):
+                    if res["url"] in parents:
+                        res["parent"] = parents[res["url"]]
+                    results[res["url"]] = res
+                    for v in res["variants"]:
+                        if v not in results and v not in parents:
+                            parents[v] = res["url"]
+                            todo.append(v)
+    finally:
+        client.close()
+
+    rank = {LIVE: 0, VOD: 1, AD: 2, DEAD: 3}
+    for res in results.values():
+        if res.get("master") and res["label"] != AD:
+            labels = [results[v]["label"] for v in res["variants"] if v in results]
+            if labels:
+                res["label"] = min(labels, key=rank.get)
+    return results
@@ -0,0 +1,157 @@
+"""
+Memory of the browsers a job runs: this process plus every descendant
+(chromedriver, Chrome browser / GPU / renderer processes), sampled in a
+background thread while the job runs.
+
+Chrome shares a lot of memory between its processes, so summing RSS
+over-counts; PSS (proportional set size) is used where the OS reports it
+(Linux /proc/<pid>/smaps_rollup, or psutil's memory_full_info), USS where only
+that is available (psutil on Windows), RSS otherwise.
+psutil is optional (pip install psutil); without it only Linux /proc works.
+
+    sampler = MemorySampler().start()
+    ...
+    mem = sampler.stop()   # {"metric": "pss", "peak_mb": ..., "avg_mb": ..., "samples": n} or None
+"""
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SAMPLE_INTERVAL = 2.0  # seconds
+
+
+def _proc_children() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "r") as f:
+                # "pid (comm) state ppid ...", comm may contain spaces / parens
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(name))
+    return children
+
+
+def _proc_tree(root: int) -> Iterable[int]:
+    children = _proc_children()
+    stack = [root]
+    while stack:
+        pid = stack.pop()
+        yield pid
+        stack.extend(children.get(pid, []))
+
+
+def _proc_kb(pid: int, key: str) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/smaps_rollup" if key == "Pss:" else f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith(key):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def tree_memory(root: Optional[int] = None) -> Optional[Dict[str, float]]:
+    """{"metric": "pss" | "uss" | "rss" | "mixed", "mb": ...} for root (default: this process) and its descendants."""
+    root = root or os.getpid()
+    if psutil is not None:
+        try:
+            parent = psutil.Process(root)
+            procs = [parent] + parent.children(recursive=True)
+        except psutil.Error:
+            return None
+        total, metrics = 0, set()
+        for p in procs:
+            try:
+                info = p.memory_full_info()
+            except psutil.AccessDenied:
+                info = None
+            except psutil.Error:
+                continue  # exited between listing and reading
+            try:
+                info = info or p.memory_info()
+            except psutil.Error:
+                continue
+            # pss on Linux, uss (private bytes) on Windows / macOS, rss as the last resort
+            for key in ("pss", "uss", "rss"):
+                if getattr(info, key, None) is not None:
+                    total += getattr(info, key)
+                    metrics.add(key)
+                    break
+        metric = metrics.pop() if len(metrics) == 1 else "mixed"
+        return {"metric": metric, "mb": total / 2 ** 20}
+    if not os.path.isdir("/proc"):
+        return None
+    total_kb, metric = 0, "pss"
+    for pid in _proc_tree(root):
+        kb = _proc_kb(pid, "Pss:") if metric == "pss" else None
+        if kb is None:
+            metric = "rss"
+            kb = _proc_kb(pid, "VmRSS:") or 0
+        total_kb += kb
+    return {"metric": metric, "mb": total_kb / 1024}
+
+
+class MemorySampler:
+    def __init__(self, interval: float = SAMPLE_INTERVAL, root: Optional[int] = None):
+        self.interval = interval
+        self.root = root
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._samples: List[float] = []
+        self._metric: Optional[str] = None
+
+    def start(self) -> "MemorySampler":
+        self._thread = threading.Thread(target=self._run, name="mem-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                mem = tree_memory(self.root)
+            except Exception:
+                mem = None
+            if mem is None:
+                return  # not measurable on this host
+            self._samples.append(mem["mb"])
+            self._metric = mem["metric"] if self._metric in (None, mem["metric"]) else "mixed"
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self) -> Optional[Dict]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+        if not self._samples:
+            return None
+        return {
+            "metric": self._metric,
+            "peak_mb": round(max(self._samples), 1),
+            "avg_mb": round(sum(self._samples) / len(self._samples), 1),
+            "samples": len(self._samples),
+        }
+
+
+def per_gb(mem: Optional[Dict], concurrent: int, visits: int, elapsed: float) -> Optional[Dict]:
+    """
+    visits-per-GB figures for a job: how many concurrent visits one GB of peak
+    browser memory holds, and completed visits per minute per GB.
+    """
+    if not mem or not mem.get("peak_mb"):
+        return None
+    gb = mem["peak_mb"] / 1024
+    return {
+        "concurrent_visits_per_gb": round(concurrent / gb, 2),
+        "visits_per_min_per_gb": round(visits / max(elapsed / 60, 1e-9) / gb, 2),
+        "mb_per_concurrent_visit": round(mem["peak_mb"] / max(concurrent, 1), 1),
+    }
@@ -0,0 +1,160 @@
+"""
+TTL result cache: the playlists a site yielded recently, so a job can skip
+visiting it again (SQLite next to links.sqlite, shared by every job / process).
+
+- get(site) returns the cached links while the entry is younger than ttl
+- put(site, links) replaces the entry (empty results are never cached)
+- size-bounded: past max_sites entries or max_links links in total, entries are
+  evicted expired first, then least recently used
+- hits / misses / stale / invalid are counted per instance (= per job) for the summary
+
+Validity of cached links (live playlists expire quickly) is checked by the
+caller, see bypass_parallel.cached_results().
+
+    python result_cache.py <db> stats | clear | drop <site>
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    site       TEXT PRIMARY KEY,
+    links      TEXT NOT NULL,        -- json list
+    n_links    INTEGER NOT NULL,
+    stored_at  REAL NOT NULL,        -- epoch seconds
+    last_used  REAL NOT NULL,
+    hits       INTEGER NOT NULL DEFAULT 0,
+    job_id     TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_cache_last_used ON cache(last_used);
+"""
+
+
+class ResultCache:
+    def __init__(self, path: str, ttl: float, max_sites: int = 1000, max_links: int = 50000):
+        self.path = path
+        self.ttl = ttl
+        self.max_sites = max_sites
+        self.max_links = max_links
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "invalid": 0, "stored": 0, "evicted": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def get(self, site: str) -> Optional[Dict]:
+        """{"links": [...], "age": seconds, "job_id": ...} or None (missing / expired)."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT links, stored_at, job_id FROM cache WHERE site = ?", (site,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            age = time.time() - row[1]
+            if age >= self.ttl:
+                self._count("misses")
+                self._count("stale")
+                return None
+            with conn:
+                conn.execute("UPDATE cache SET last_used = ?, hits = hits + 1 WHERE site = ?", (time.time(), site))
+        finally:
+            conn.close()
+        self._count("hits")
+        return {"links": json.loads(row[0]), "age": age, "job_id": row[2]}
+
+    def invalidate(self, site: str):
+        """Cached links failed the validity check: drop the entry, count the lookup as a miss."""
+        self.drop(site)
+        with self._lock:
+            self.stats["hits"] -= 1
+            self.stats["misses"] += 1
+            self.stats["invalid"] += 1
+
+    def put(self, site: str, links: List[str], job_id: Optional[str] = None):
+        links = sorted(set(links))
+        if not links:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (site, links, n_links, stored_at, last_used, hits, job_id) "
+                    "VALUES (?, ?, ?, ?, ?, 0, ?)", (site, json.dumps(links), len(links), now, now, job_id))
+                evicted = self._evict(conn, now)
+        finally:
+            conn.close()
+        self._count("stored")
+        self._count("evicted", evicted)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> int:
+        # jobs may use different TTLs, so expired entries are only dropped first, not eagerly
+        sites, links = conn.execute("SELECT COUNT(*), COALESCE(SUM(n_links), 0) FROM cache").fetchone()
+        if sites <= self.max_sites and links <= self.max_links:
+            return 0
+        drop = []
+        for site, n in conn.execute("SELECT site, n_links FROM cache ORDER BY stored_at > ?, last_used",
+                                    (now - self.ttl,)).fetchall():
+            if sites <= self.max_sites and links <= self.max_links:
+                break
+            drop.append((site,))
+            sites -= 1
+            links -= n
+        conn.executemany("DELETE FROM cache WHERE site = ?", drop)
+        return len(drop)
+
+    def drop(self, site: str):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM cache WHERE site = ?", (site,))
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM cache")
+        finally:
+            conn.close()
+
+    def hit_rate(self) -> Optional[float]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else None
+
+    def summary(self) -> Dict:
+        conn = self._connect()
+        try:
+            sites, links = conn.execute("SELECT COUNT(*), COALESCE(SUM(n_links), 0) FROM cache").fetchone()
+        finally:
+            conn.close()
+        rate = self.hit_rate()
+        return dict(self.stats, hit_rate=round(rate, 3) if rate is not None else None, ttl_s=self.ttl,
+                    entries=sites, links=links)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[2] not in ("stats", "clear", "drop"):
+        print("Usage: python result_cache.py <db> stats | clear | drop <site>")
+        sys.exit(1)
+    cache = ResultCache(sys.argv[1], ttl=float("inf"))
+    if sys.argv[2] == "clear":
+        cache.clear()
+    elif sys.argv[2] == "drop":
+        cache.drop(sys.argv[3])
+    print(json.dumps(cache.summary(), indent=2))
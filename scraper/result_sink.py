@@ -0,0 +1,129 @@
+"""
+Append-only, crash-safe result stream (JSONL).
+
+Every m3u8 URL is written (and fsynced) the moment a visit sees it, together with
+site, visit id, the path that produced it (browser capture / http fast path /
+result cache) and timestamp, so a crashed / killed job keeps what it found and
+downstream consumers can tail the file while the job runs.
+
+Line format:
+    {"event": "url",   "site": ..., "visit": 3, "url": ..., "path": "browser" | "http" | "cache", "ts": "2025-01-01T12:00:00"}
+    {"event": "visit", "site": ..., "visit": 3, "found": 2, "ts": ...}   <- visit finished
+    {"event": "requeue", "site": ..., "visits": [2, 3], "ts": ...}     <- fan-out fallback visits queued
+
+load_stream() rebuilds results_map and the set of finished visits, which is what
+main() uses to export the xlsx and to resume a re-run job; load_requeued() the
+sites whose fallback visits were queued (a resumed job queues the unfinished ones).
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+def trim_torn_tail(path: str, chunk: int = 64 * 1024) -> int:
+    """
+    Cuts a half-written last line (crash mid-write) back to the last newline, so the
+    next appended record starts on a line of its own. Returns the bytes removed.
+    """
+    try:
+        f = open(path, "rb+")
+    except FileNotFoundError:
+        return 0
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(end - chunk, 0)
+            f.seek(start)
+            data = f.read(end - start)
+            nl = data.rfind(b"\n")
+            if nl >= 0:
+                end = start + nl + 1
+                break
+            end = start
+        if end == size:
+            return 0
+        f.truncate(end)
+        f.flush()
+        os.fsync(f.fileno())
+        return size - end
+
+
+class ResultSink:
+    def __init__(self, path: str, job_id: Optional[str] = None, store=None):
+        self.path = path
+        self.job_id = job_id
+        self.store = store  # optional ResultStore, gets every url too (cache-path urls as sightings only)
+        self._lock = threading.Lock()
+        self.paths: Dict[str, int] = {}  # links written per path ("browser" / "http" / "cache")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        trim_torn_tail(path)
+        self._f = open(path, "a", encoding="utf-8")
+
+    def _write(self, record: dict):
+        record["ts"] = datetime.now().isoformat(timespec="seconds")
+        if self.job_id:
+            record["job_id"] = self.job_id
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._f.closed:
+                return
+            self._f.write(line)
+            self._f.flush()
+            os.fsync(self._f.fileno())
+
+    def url(self, site: str, visit_id, url: str, path: str = "browser"):
+        with self._lock:
+            self.paths[path] = self.paths.get(path, 0) + 1
+        self._write({"event": "url", "site": site, "visit": visit_id, "url": url, "path": path})
+        if self.store is None:
+            return
+        if path == "cache":
+            self.store.add_cached(site, url, self.job_id)  # not observed again, must not count as a sighting
+        else:
+            self.store.add(site, url, self.job_id)
+
+    def requeue(self, site: str, visit_ids: List[int]):
+        self._write({"event": "requeue", "site": site, "visits": list(visit_ids)})
+
+    def visit_done(self, site: str, visit_id, found: int):
+        self._write({"event": "visit", "site": site, "visit": visit_id, "found": found})
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.close()
+
+
+def _records(path: str) -> Iterator[dict]:
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def load_stream(path: str) -> Tuple[Dict[str, Set[str]], Set[Tuple[str, int]]]:
+    """
+    Returns (results_map, finished_visits) from a (possibly partial) stream.
+    A torn last line from a crash is ignored (ResultSink cuts it off before appending).
+    """
+    results: Dict[str, Set[str]] = {}
+    finished: Set[Tuple[str, int]] = set()
+    for rec in _records(path):
+        site = rec.get("site")
+        if rec.get("event") == "url":
+            results.setdefault(site, set()).add(rec["url"])
+        elif rec.get("event") == "visit":
+            finished.add((site, rec.get("visit")))
+    return results, finished
+
+
+def load_requeued(path: str) -> Set[str]:
+    """Sites whose fan-out fallback visits were queued by an earlier run of the job."""
+    return {rec.get("site") for rec in _records(path) if rec.get("event") == "requeue"}
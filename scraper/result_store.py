@@ -0,0 +1,212 @@
+"""
+Indexed SQLite store for discovered m3u8 links (cross-job dedup + query API).
+
+Tables
+- links:     one row per (canonical_url, site), first/last seen + job ids, hit count
+- sightings: one row per (canonical_url, site, job_id) -> "what did job X find"
+
+canonical_url = scheme://host/path lowercased (tokens in the query string vary per
+visit, the stream does not). Inserts go through a background writer thread that
+commits in batches, so the scan threads never wait on disk.
+"""
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS links (
+    canonical_url TEXT NOT NULL,
+    site          TEXT NOT NULL,
+    url           TEXT NOT NULL,      -- latest full url (with query)
+    first_seen    TEXT NOT NULL,
+    last_seen     TEXT NOT NULL,
+    first_job     TEXT,
+    last_job      TEXT,
+    hits          INTEGER NOT NULL DEFAULT 1,
+    label         TEXT,
+    PRIMARY KEY (canonical_url, site)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_links_site_last ON links(site, last_seen);
+CREATE INDEX IF NOT EXISTS idx_links_last ON links(last_seen);
+CREATE INDEX IF NOT EXISTS idx_links_first_job ON links(first_job);
+
+CREATE TABLE IF NOT EXISTS sightings (
+    canonical_url TEXT NOT NULL,
+    site          TEXT NOT NULL,
+    job_id        TEXT NOT NULL,
+    url           TEXT NOT NULL,
+    seen_at       TEXT NOT NULL,
+    PRIMARY KEY (job_id, site, canonical_url)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sightings_url ON sightings(canonical_url);
+"""
+
+UPSERT_LINK = """
+INSERT INTO links (canonical_url, site, url, first_seen, last_seen, first_job, last_job, hits)
+VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+ON CONFLICT(canonical_url, site) DO UPDATE SET
+    url = excluded.url,
+    last_seen = excluded.last_seen,
+    last_job = excluded.last_job,
+    hits = links.hits + 1
+"""
+
+INSERT_SIGHTING = """
+INSERT OR IGNORE INTO sightings (canonical_url, site, job_id, url, seen_at) VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def canonical_url(url: str) -> str:
+    p = urlparse(url)
+    return f"{p.scheme}://{p.netloc}{p.path}".lower()
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class ResultStore:
+    def __init__(self, path: str, batch_size: int = 500, flush_interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="result-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # -- writes (any thread, non-blocking) ----------------------------------
+    def add(self, site: str, url: str, job_id: Optional[str] = None):
+        self._queue.put(("add", site, url, job_id or "", _now()))
+
+    def add_cached(self, site: str, url: str, job_id: Optional[str] = None):
+        """A job answered `site` with a cached url: recorded in its sightings, links.hits / last_seen untouched."""
+        if job_id:
+            self._queue.put(("cached", site, url, job_id, _now()))
+
+    def set_labels(self, site: str, labels: Dict[str, str]):
+        """Validation labels of urls found on `site` (the same stream on other sites keeps its own)."""
+        for url, label in labels.items():
+            self._queue.put(("label", site, url, label))
+
+    def flush(self):
+        """Block until everything queued so far is committed."""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait()
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            stop = False
+            while not stop:
+                item = self._queue.get()
+                batch = [item]
+                # gather whatever else is queued, up to batch_size
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get(timeout=self.flush_interval if len(batch) == 1 else 0))
+                    except queue.Empty:
+                        break
+                links, sightings, labels, waiters = [], [], [], []
+                for it in batch:
+                    if it is None:
+                        stop = True
+                    elif it[0] == "add":
+                        _, site, url, job_id, ts = it
+                        cu = canonical_url(url)
+                        links.append((cu, site, url, ts, ts, job_id, job_id))
+                        if job_id:
+                            sightings.append((cu, site, job_id, url, ts))
+                    elif it[0] == "cached":
+                        _, site, url, job_id, ts = it
+                        sightings.append((canonical_url(url), site, job_id, url, ts))
+                    elif it[0] == "label":
+                        _, site, url, label = it
+                        labels.append((label, canonical_url(url), site))
+                    elif it[0] == "flush":
+                        waiters.append(it[1])
+                try:
+                    with conn:
+                        if links:
+                            conn.executemany(UPSERT_LINK, links)
+                        if sightings:
+                            conn.executemany(INSERT_SIGHTING, sightings)
+                        if labels:
+                            conn.executemany("UPDATE links SET label = ? WHERE canonical_url = ? AND site = ?", labels)
+                except Exception as e:
+                    # a locked / full db loses this batch, not the writer (flush / close must not hang)
+                    print(f"[WARN] result store: dropped a batch of {len(links)} links, {len(labels)} labels: {e}")
+                finally:
+                    for w in waiters:
+                        w.set()
+        finally:
+            conn.close()
+
+    # -- queries ---------------------------------------------------------------
+    def _query(self, sql: str, args=()) -> List[sqlite3.Row]:
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            return conn.execute(sql, args).fetchall()
+        finally:
+            conn.close()
+
+    def seen_before(self, url: str) -> Optional[Dict]:
+        """Earliest sighting of this stream on any site, or None."""
+        rows = self._query(
+            "SELECT * FROM links WHERE canonical_url = ? ORDER BY first_seen LIMIT 1", (canonical_url(url),))
+        return dict(rows[0]) if rows else None
+
+    def site_links(self, site: str, since: Optional[str] = None) -> List[Dict]:
+        """Links of a site seen at/after `since` (ISO timestamp), newest first."""
+        rows = self._query(
+            "SELECT * FROM links WHERE site = ? AND last_seen >= ? ORDER BY last_seen DESC", (site, since or ""))
+        return [dict(r) for r in rows]
+
+    def job_results(self, job_id: str) -> Dict[str, Set[str]]:
+        """{site: {url, ...}} found by one job (shape of results_map)."""
+        out: Dict[str, Set[str]] = {}
+        for r in self._query("SELECT site, url FROM sightings WHERE job_id = ?", (job_id,)):
+            out.setdefault(r["site"], set()).add(r["url"])
+        return out
+
+    def new_in_job(self, job_id: str) -> List[Dict]:
+        """Links whose first ever sighting was in this job."""
+        return [dict(r) for r in self._query("SELECT * FROM links WHERE first_job = ?", (job_id,))]
+
+
+if __name__ == "__main__":
+    # python result_store.py <db> seen <url> | site <site> [since] | job <job_id>
+    if len(sys.argv) < 4:
+        print("Usage: python result_store.py <db> seen <url> | site <site> [since] | job <job_id>")
+        sys.exit(1)
+    store = ResultStore(sys.argv[1])
+    cmd, arg = sys.argv[2], sys.argv[3]
+    if cmd == "seen":
+        out = store.seen_before(arg)
+    elif cmd == "site":
+        out = store.site_links(arg, sys.argv[4] if len(sys.argv) > 4 else None)
+    else:
+        out = {k: sorted(v) for k, v in store.job_results(arg).items()}
+    print(json.dumps(out, ensure_ascii=False, indent=2))
+    store.close()
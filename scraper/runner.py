@@ -1,11 +1,18 @@
+import startup_profile  # first: its import time marks the end of interpreter startup
 import json
 import os
 import sys
 import shutil
+import time
 import traceback
 from datetime import datetime
 from bypass_parallel import main
 
+startup_profile.mark("imports")
+
+# dispatch -> job start, one JSON line per job (subprocess vs daemon comparison)
+LATENCY_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "start_latency.jsonl")
+
 def load_config(path):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
@@ -22,7 +29,7 @@ def finalize_job(job_path, status):
     shutil.move(job_path, target_path)
 
 
-def setup_logging(job_path):
+def job_log_path(job_path):
     # หา root directory ของโปรเจค (ขึ้นไป 3 ระดับจาก jobs/running/job.json)
     # หรือใช้ตำแหน่งของ runner.py เป็นฐาน
     runner_dir = os.path.dirname(os.path.abspath(__file__))
@@ -33,13 +40,68 @@ def setup_logging(job_path):
     job_name = os.path.splitext(os.path.basename(job_path))[0]
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    log_path = os.path.join(logs_dir, f"{job_name}_{timestamp}.log")
+    return os.path.join(logs_dir, f"{job_name}_{timestamp}.log")
+
+
+def setup_logging(job_path):
+    log_path = job_log_path(job_path)
 
     sys.stdout = open(log_path, "w", encoding="utf-8")
     sys.stderr = sys.stdout
 
     print(f"[LOG] Logging to {log_path}")
 
+def record_start_latency(job_path, mode, dispatched_at):
+    """dispatched_at = time.time() when the scheduler handed the job over."""
+    latency = time.time() - dispatched_at
+    print(f"[RUNNER] start latency {latency:.3f}s ({mode})")
+    try:
+        os.makedirs(os.path.dirname(LATENCY_LOG), exist_ok=True)
+        with open(LATENCY_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"job": os.path.basename(job_path), "mode": mode,
+                                "latency": round(latency, 4), "ts": datetime.now().isoformat(timespec="seconds")}) + "\n")
+    except OSError as e:
+        print(f"[WARN] could not record start latency: {e}")
+
+
+def run_job_file(job_path, max_workers=None, pool=None):
+    """Runs one job file and moves it to done/ or failed/. Re-raises on failure."""
+    try:
+        print(f"[RUNNER] Job started: {job_path}")
+
+        cfg = load_config(job_path)
+        if max_workers is not None:
+            # scheduler may start the job with fewer workers (host browser budget)
+            print(f"[RUNNER] max_workers {cfg['max_workers']} -> {max_workers} (browser budget)")
+            cfg["max_workers"] = int(max_workers)
+
+        main(
+            sites=cfg["sites"],
+            visits_per_site=int(cfg["visits_per_site"]),
+            max_workers=int(cfg["max_workers"]),
+            use_pool=bool(cfg.get("use_pool", True)),
+            capture_backend=cfg.get("capture_backend", "wire"),
+            shards=int(cfg.get("shards", 0)),
+            job_id=cfg.get("job_id") or os.path.splitext(os.path.basename(job_path))[0],
+            validate=bool(cfg.get("validate", True)),
+            pool=pool,
+            blocking=bool(cfg.get("blocking", True)),
+            tabs_per_browser=int(cfg.get("tabs_per_browser", 1)),
+            http_fast_path=bool(cfg.get("fast_path", True)),
+            cache=bool(cfg.get("cache", True)),
+            cache_ttl=cfg.get("cache_ttl"),
+            force_refresh=bool(cfg.get("force_refresh", False))
+        )
+
+        finalize_job(job_path, "done")
+        print("[RUNNER] Job finished → done")
+
+    except Exception:
+        print("[RUNNER] Job failed")
+        traceback.print_exc()
+        finalize_job(job_path, "failed")
+        raise
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         # If no argument provided, try to find a pending job for testing
@@ -64,23 +126,7 @@ if __name__ == "__main__":
 
     setup_logging(job_path)
 
-    try:
-        print(f"[RUNNER] Job started: {job_path}")
-
-        cfg = load_config(job_path)
-
-        main(
-            sites=cfg["sites"],
-            visits_per_site=int(cfg["visits_per_site"]),
-            max_workers=int(cfg["max_workers"])
-        )
-
-        finalize_job(job_path, "done")
-        print("[RUNNER] Job finished → done")
-
-    except Exception:
-        print("[RUNNER] Job failed")
-        traceback.print_exc()
-        finalize_job(job_path, "failed")
-        raise
+    if os.environ.get("LIVESEEKER_DISPATCHED_AT"):
+        record_start_latency(job_path, "subprocess", float(os.environ["LIVESEEKER_DISPATCHED_AT"]))
 
+    run_job_file(job_path, int(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,226 @@
+"""
+Long-lived runner: takes jobs from the scheduler over a local socket instead of
+one Python process per job.
+
+- selenium / seleniumwire / openpyxl are imported once, chromedriver resolved once
+- a warm BrowserPool is shared by all jobs (browsers survive between jobs,
+  max_uses / max_age still retire them, idle ones included); each job leases at
+  most the workers the scheduler admitted, fan-out lanes included; a job that
+  runs its own browsers (shards, tab mode, other capture backend) reserves as
+  many warm slots meanwhile, idle warm browsers over that are quit
+- every job runs in its own thread; its prints go to its own logs/jobs/*.log
+- done / failed semantics are the ones of runner.run_job_file (finalize_job)
+
+Protocol (multiprocessing.connection, authkey):
+    scheduler -> {"job_path": ..., "max_workers": int | None, "dispatched_at": time.time()}
+    daemon    -> {"accepted": True}
+    daemon    -> {"status": "done" | "failed"}        <- when the job ends
+
+Usage:
+    python runner_daemon.py                 # serve
+    python runner_daemon.py --latency       # start latency per mode from logs/start_latency.jsonl
+"""
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from multiprocessing.connection import Listener
+
+import bypass_parallel as bp
+from runner import LATENCY_LOG, job_log_path, load_config, record_start_latency, run_job_file
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = int(os.environ.get("LIVESEEKER_RUNNER_PORT", "6150"))
+DAEMON_AUTHKEY = os.environ.get("LIVESEEKER_RUNNER_KEY", "liveseeker-runner").encode()
+
+WARM_BROWSERS = 12       # pool size, keep in line with the scheduler's HOST_BROWSER_BUDGET
+PREWARM = 2              # browsers launched at startup, before the first job arrives
+
+_job_log = contextvars.ContextVar("job_log", default=None)
+
+
+class JobLogRouter:
+    """sys.stdout / sys.stderr replacement: writes go to the current job's log file."""
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+
+    def write(self, data):
+        f = _job_log.get()
+        if f is None or f.closed:
+            return self.fallback.write(data)
+        return f.write(data)
+
+    def flush(self):
+        f = _job_log.get()
+        if f is not None and not f.closed:
+            f.flush()
+        self.fallback.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.fallback, name)
+
+
+class JobLease:
+    """
+    One job's view of the shared pool: at most `limit` drivers leased at once.
+    The scheduler admits a job for `limit` browsers; without the cap a fan-out
+    (acquire(block=False)) would take idle warm browsers beyond that budget.
+    """
+
+    def __init__(self, pool, limit):
+        self.pool = pool
+        self.limit = max(int(limit), 1)
+        self._cond = threading.Condition()
+        self._leased = 0
+
+    def acquire(self, block=True):
+        with self._cond:
+            while self._leased >= self.limit:
+                if not block:
+                    return None
+                self._cond.wait()
+            self._leased += 1
+        try:
+            driver = self.pool.acquire(block)
+        except Exception:
+            self._give_back()
+            raise
+        if driver is None:
+            self._give_back()
+        return driver
+
+    def release(self, driver):
+        try:
+            self.pool.release(driver)
+        finally:
+            if driver is not None:
+                self._give_back()
+
+    def close(self):
+        pass  # the shared pool outlives the job
+
+    def _give_back(self):
+        with self._cond:
+            self._leased -= 1
+            self._cond.notify()
+
+    def __getattr__(self, name):
+        return getattr(self.pool, name)  # size / backend / launched / retired
+
+
+def admitted_workers(job_path, max_workers):
+    """Workers the scheduler admitted: its override, else the job's own max_workers."""
+    if max_workers is not None:
+        return int(max_workers)
+    try:
+        return int(load_config(job_path).get("max_workers", 1))
+    except Exception:
+        return 1  # unreadable job: run_job_file fails it anyway
+
+
+def prewarm(pool, n):
+    drivers = []
+    try:
+        for _ in range(min(n, pool.size)):
+            drivers.append(pool.acquire())
+    except Exception as e:
+        print(f"[DAEMON] prewarm failed: {e}")
+    for d in drivers:
+        pool.release(d)
+
+
+def handle(conn, pool):
+    try:
+        msg = conn.recv()
+    except (EOFError, OSError):
+        conn.close()
+        return
+    job_path = msg["job_path"]
+    conn.send({"accepted": True})
+
+    log_f = open(job_log_path(job_path), "w", encoding="utf-8", buffering=1)
+    _job_log.set(log_f)
+    status = "done"
+    try:
+        print(f"[LOG] Logging to {log_f.name}")
+        if msg.get("dispatched_at"):
+            record_start_latency(job_path, "daemon", float(msg["dispatched_at"]))
+        lease = JobLease(pool, admitted_workers(job_path, msg.get("max_workers")))
+        run_job_file(job_path, msg.get("max_workers"), pool=lease)
+    except Exception:
+        status = "failed"  # already logged + moved to failed/ by run_job_file
+    finally:
+        _job_log.set(None)
+        log_f.close()
+
+    print(f"[DAEMON] {os.path.basename(job_path)} -> {status}")
+    try:
+        conn.send({"status": status})
+    except (EOFError, OSError):
+        pass  # scheduler went away; the job file is already in done/ or failed/
+    conn.close()
+
+
+def serve():
+    sys.stdout = JobLogRouter(sys.stdout)
+    sys.stderr = JobLogRouter(sys.stderr)
+
+    t0 = time.monotonic()
+    # modules bypass_parallel imports lazily (cold-start path) are loaded up front here
+    import openpyxl  # noqa: F401
+    import seleniumwire.webdriver  # noqa: F401
+    bp.ensure_chromedriver()
+    pool = bp.BrowserPool(size=WARM_BROWSERS, backend=bp.CAPTURE_BACKEND)
+    prewarm(pool, PREWARM)
+    print(f"[DAEMON] ready in {time.monotonic() - t0:.1f}s, listening on {DAEMON_HOST}:{DAEMON_PORT} "
+          f"(pool size {pool.size}, {pool.launched} warm)")
+
+    listener = Listener((DAEMON_HOST, DAEMON_PORT), authkey=DAEMON_AUTHKEY)
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:  # bad authkey / half-open connection
+                print(f"[DAEMON] accept failed: {e}")
+                continue
+            # fresh context per job thread (log routing must not leak between jobs)
+            threading.Thread(target=contextvars.Context().run, args=(handle, conn, pool), daemon=True).start()
+    except KeyboardInterrupt:
+        print("[DAEMON] stopping")
+    finally:
+        listener.close()
+        pool.close()
+
+
+def print_latency(path=LATENCY_LOG):
+    by_mode = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                by_mode.setdefault(rec["mode"], []).append(rec["latency"])
+    if not by_mode:
+        print(f"no start latency records in {path}")
+        return
+    print(f"{'mode':<12} {'n':>5} {'p50 s':>8} {'p90 s':>8} {'max s':>8}")
+    for mode, values in sorted(by_mode.items()):
+        v = sorted(values)
+        print(f"{mode:<12} {len(v):>5} {v[len(v) // 2]:>8.3f} {v[int(len(v) * 0.9)]:>8.3f} {v[-1]:>8.3f}")
+
+
+if __name__ == "__main__":
+    if "--latency" in sys.argv[1:]:
+        print_latency()
+    else:
+        try:
+            serve()
+        except Exception:
+            traceback.print_exc()
+            sys.exit(1)
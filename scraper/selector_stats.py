@@ -0,0 +1,223 @@
+"""
+Per-hostname selector / strategy hit statistics.
+
+- every visit records which selectors.json rules and play strategies were tried
+  and which actually succeeded, per hostname
+- order() puts historically winning rules first and can drop rules that never
+  matched after N attempts
+- persisted to a small JSON file; `python selector_stats.py [host|-] [path]` prints it
+- save() merges this process's changes into the file under a lock file, so
+  concurrent job processes add up their counts instead of overwriting each other
+- the visit (host + tried / hit rules) lives in a ContextVar: helper threads started
+  with contextvars.copy_context() (fan-out lanes) record into the same visit
+"""
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+LOCK_TIMEOUT = 10.0  # seconds save() waits for another process's lock
+LOCK_STALE = 60.0    # a lock file older than this was left by a crashed process
+
+
+def rule_key(sel: dict) -> str:
+    return f"{sel.get('type')}:{sel.get('value')}"
+
+
+def _add(target: Dict, host: str, group: str, key: str, tries: int, hits: int, last_hit: Optional[float] = None):
+    entry = target.setdefault(host, {}).setdefault(group, {}).setdefault(key, {"tries": 0, "hits": 0})
+    entry["tries"] += tries
+    entry["hits"] += hits
+    if last_hit is not None:
+        entry["last_hit"] = max(entry.get("last_hit", 0), last_hit)
+
+
+def _merge_into(target: Dict, delta: Dict):
+    for host, groups in delta.items():
+        for group, keys in groups.items():
+            for key, d in keys.items():
+                _add(target, host, group, key, d.get("tries", 0), d.get("hits", 0), d.get("last_hit"))
+
+
+@contextlib.contextmanager
+def _file_lock(path: str, timeout: float = LOCK_TIMEOUT, stale: float = LOCK_STALE):
+    """Exclusive <path>.lock (O_EXCL create, works on Windows too); raises TimeoutError."""
+    lock = path + ".lock"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) > stale:
+                    os.remove(lock)
+                    continue
+            except OSError:
+                continue  # released meanwhile
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"{lock} is held by another process")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        try:
+            os.remove(lock)
+        except OSError:
+            pass
+
+
+class SelectorStats:
+    def __init__(self, path: str, skip_after: int = 0):
+        self.path = path
+        self.skip_after = skip_after  # 0 = never skip
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Dict[str, Dict[str, Dict[str, float]]]]] = None
+        self._visit = contextvars.ContextVar(f"selector_stats_visit_{id(self)}", default=None)
+        # changes since start_delta() / take_delta(); None = not collected (only shard processes send deltas)
+        self._delta: Optional[Dict[str, Dict[str, Dict[str, Dict[str, float]]]]] = None
+        self._unsaved: Dict[str, Dict[str, Dict[str, Dict[str, float]]]] = {}  # changes since save()
+
+    # -- persistence ------------------------------------------------------
+    def _load(self):
+        if self._data is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except Exception:
+                self._data = {}
+        return self._data
+
+    def save(self):
+        """Adds this process's changes to the file as it is now (other jobs may have saved since our load)."""
+        with self._lock:
+            self._load()
+            unsaved, self._unsaved = self._unsaved, {}
+        try:
+            with _file_lock(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    data = {}
+                _merge_into(data, unsaved)
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+                os.replace(tmp, self.path)
+        except Exception:
+            with self._lock:
+                _merge_into(self._unsaved, unsaved)  # kept for the next save
+            raise
+        with self._lock:
+            # file view (other processes' counts) + what this process recorded while saving
+            _merge_into(data, self._unsaved)
+            self._data = data
+
+    # -- per-visit accounting (visit runs in its own context) ------------
+    def begin_visit(self, host: str):
+        self._visit.set({"host": host, "tried": set(), "hits": set()})
+
+    def attempt(self, group: str, key: str):
+        visit = self._visit.get()
+        if visit is not None:
+            visit["tried"].add((group, key))
+
+    def hit(self, group: str, key: str):
+        visit = self._visit.get()
+        if visit is not None:
+            visit["hits"].add((group, key))
+            visit["tried"].add((group, key))
+
+    def end_visit(self):
+        visit = self._visit.get()
+        if visit is None:
+            return
+        self._visit.set(None)
+        host, tried, hits = visit["host"], set(visit["tried"]), set(visit["hits"])
+        now = time.time()
+        with self._lock:
+            for target in (self._load(), self._delta, self._unsaved):
+                if target is None:
+                    continue
+                for group, key in tried:
+                    hit = (group, key) in hits
+                    _add(target, host, group, key, 1, int(hit), now if hit else None)
+
+    # -- cross-process merge (shard processes send their deltas to the parent) --
+    def start_delta(self):
+        """Collect changes from now on (a forked shard must not send back the parent's visits)."""
+        with self._lock:
+            self._delta = {}
+
+    def take_delta(self) -> Dict:
+        with self._lock:
+            delta, self._delta = self._delta or {}, {}
+            return delta
+
+    def merge(self, delta: Dict):
+        with self._lock:
+            _merge_into(self._load(), delta)
+            _merge_into(self._unsaved, delta)
+
+    # -- ordering -----------------------------------------------------------
+    def order(self, group: str, items: List[T], key_fn: Callable[[T], str]) -> List[T]:
+        """Winning rules first (by hits, then hit rate); file order is kept for ties."""
+        visit = self._visit.get()
+        host = visit["host"] if visit else None
+        if not host:
+            return items
+        with self._lock:
+            stats = self._load().get(host, {}).get(group, {})
+        if not stats:
+            return items
+
+        def score(indexed):
+            idx, item = indexed
+            s = stats.get(key_fn(item), {})
+            tries, hits = s.get("tries", 0), s.get("hits", 0)
+            return (-hits, -(hits / tries if tries else 0), idx)
+
+        ordered = [item for _, item in sorted(enumerate(items), key=score)]
+        if self.skip_after:
+            kept = [
+                item for item in ordered
+                if stats.get(key_fn(item), {}).get("hits", 0) > 0
+                or stats.get(key_fn(item), {}).get("tries", 0) < self.skip_after
+            ]
+            # never skip everything
+            if kept:
+                ordered = kept
+        return ordered
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return json.loads(json.dumps(self._load()))
+
+
+def print_stats(path: str, host: Optional[str] = None):
+    data = SelectorStats(path).snapshot()
+    for h in sorted(data):
+        if host and h != host:
+            continue
+        print(f"\n{h}")
+        for group in sorted(data[h]):
+            print(f"  [{group}]")
+            rows = sorted(data[h][group].items(), key=lambda kv: (-kv[1]["hits"], -kv[1]["tries"]))
+            for key, s in rows:
+                flag = "  <- never matched" if s["hits"] == 0 else ""
+                print(f"    {s['hits']:>5}/{s['tries']:<5} {key}{flag}")
+
+
+if __name__ == "__main__":
+    print_stats(
+        sys.argv[2] if len(sys.argv) > 2 else "./selector_stats.json",
+        host=sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != "-" else None
+    )
@@ -0,0 +1,132 @@
+"""
+Per-site scan strategies (site_strategies.json, next to selectors.json).
+
+A strategy says which scan_visit phases run for a site, with which timeouts,
+selectors and visit count, so a bare player page can skip the phases a full
+portal page needs (iframe centering, activate_player, recursive skip-ads ...).
+
+site_strategies.json:
+    {
+      "default": {...},                               # over the built-in defaults
+      "sites": {                                      # matched against the site url
+        "dooball": {"rounds": 1, "skip_ads": "dooball", "phases": [...], ...},
+        "stream.doopenteam.site/player": {"phases": ["play_click", "wait_m3u8", "final_capture"]}
+      }
+    }
+
+A site key matches when it is a substring of the url (case-insensitive), or,
+prefixed with "re:", when the regex is found in it. Every matching entry is
+applied in file order (later entries win); "wait" and "refresh" are merged key
+by key, "selectors" group by group, everything else is replaced.
+
+Keys:
+    phases            subset of PHASES, run in PHASES order
+    fast_path         try the browserless HTTP extraction first (fast_path.py)
+    visits            visits per job for the site (null = see visit_count)
+    rounds            visits per worker instead of the job's visits_per_site
+    skip_ads          "watcher" | "inline" | "dooball" | "none"
+    skip_watcher      install the in-page skip watcher before driver.get
+                      (default: true when skip_ads is "watcher")
+    play_strategies   names from PLAY_STRATEGIES, tried in this order (empty = all)
+    initial_pause     [min, max] seconds after driver.get
+    ad_phase_timeout  max seconds the watcher ad phase may take
+    wait              adaptive m3u8 wait policy (quiet_window, first_timeout, max_wait)
+    refresh           channel loop: mode ("fanout" | "sequential"), rounds, delay, lanes,
+                      visits (visits per job while the loop fans out, default 1)
+    selectors         selectors.json groups that replace the job's groups for this site
+"""
+import copy
+import json
+import re
+from typing import Dict, List, Optional
+
+PHASES = ("center_iframe", "activate_player", "play_click", "skip_ads", "wait_m3u8", "refresh_channels",
+          "final_capture")
+MERGED_KEYS = ("wait", "refresh", "selectors")
+
+
+def load_strategies(path: str) -> Dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _matches(pattern: str, site: str) -> bool:
+    if pattern.startswith("re:"):
+        return re.search(pattern[3:], site, re.IGNORECASE) is not None
+    return pattern.lower() in site.lower()
+
+
+class SiteStrategy:
+    def __init__(self, name: str, settings: Dict):
+        self.name = name
+        self.settings = settings
+        unknown = set(settings.get("phases", [])) - set(PHASES)
+        if unknown:
+            print(f"[WARN] strategy {name}: unknown phases {sorted(unknown)} ignored")
+        self.phases = [p for p in PHASES if p in settings.get("phases", PHASES)]
+        self.visits: Optional[int] = settings.get("visits")
+        self.rounds: Optional[int] = settings.get("rounds")
+        self.fast_path: bool = bool(settings.get("fast_path", False))
+        self.skip_ads: str = settings.get("skip_ads", "watcher")
+        self.skip_watcher: bool = bool(settings.get("skip_watcher", self.skip_ads == "watcher"))
+        self.play_strategies: List[str] = list(settings.get("play_strategies") or [])
+        self.initial_pause = tuple(settings.get("initial_pause", (1.0, 2.2)))
+        self.ad_phase_timeout: float = settings.get("ad_phase_timeout", 20)
+        self.wait: Dict[str, float] = dict(settings.get("wait", {}))
+        self.refresh: Dict = dict(settings.get("refresh", {}))
+        self.selectors: Dict[str, List[dict]] = dict(settings.get("selectors", {}))
+        self.fallback_visits = 0  # set by build_tasks: visits to add when a fan-out finds no idle browser
+        self.fallback_ids: List[int] = []  # their visit ids (after the planned ones, same on every run of a job)
+
+    @classmethod
+    def for_site(cls, config: Dict, site: str, base: Optional[Dict] = None) -> "SiteStrategy":
+        """Strategy for one site: base (code defaults) <- config["default"] <- matching site entries."""
+        merged = copy.deepcopy(base or {})
+        names = []
+        layers = [config.get("default", {})]
+        for pattern, override in config.get("sites", {}).items():
+            if _matches(pattern, site):
+                layers.append(override)
+                names.append(pattern)
+        for layer in layers:
+            for key, value in layer.items():
+                if key in MERGED_KEYS and isinstance(value, dict):
+                    merged.setdefault(key, {}).update(value)
+                else:
+                    merged[key] = copy.deepcopy(value)
+        return cls("+".join(names) or "default", merged)
+
+    def has(self, phase: str) -> bool:
+        return phase in self.phases
+
+    def fans_out(self) -> bool:
+        return self.has("refresh_channels") and self.refresh.get("mode") == "fanout"
+
+    def visit_count(self, visits_per_site: int, max_workers: int) -> int:
+        """
+        Explicit "visits", else refresh.visits (1) for a channel loop that fans out
+        over the pool's browsers, else visits_per_site (or rounds) x max_workers
+        (the old lockstep rounds, also for the sequential channel loop).
+        """
+        if self.visits is not None:
+            return max(int(self.visits), 0)
+        if self.fans_out():
+            return max(int(self.refresh.get("visits", 1)), 0)
+        return self.sequential_visits(visits_per_site, max_workers)
+
+    def sequential_visits(self, visits_per_site: int, max_workers: int) -> int:
+        return (self.rounds or visits_per_site) * max_workers
+
+    def apply_selectors(self, selectors: Dict) -> Dict:
+        """The job's selectors with this strategy's groups swapped in."""
+        if not self.selectors:
+            return selectors
+        out = dict(selectors)
+        out.update(self.selectors)
+        return out
+
+    def __repr__(self):
+        return f"SiteStrategy({self.name!r}, phases={self.phases})"
@@ -0,0 +1,79 @@
+"""
+Cold-start timeline of a runner process: launch -> imports -> chromedriver ->
+first browser -> first driver.get.
+
+mark(phase) records the time since the previous mark; the first driver.get
+prints the whole table once ([STARTUP] lines in the job log). t0 is the
+scheduler's dispatch time (LIVESEEKER_DISPATCHED_AT) when set, otherwise the
+moment this module was imported.
+
+Import profile (which modules dominate "imports"):
+    python startup_profile.py [module] [top]
+"""
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+_T0 = float(os.environ.get("LIVESEEKER_DISPATCHED_AT") or time.time())
+_lock = threading.Lock()
+_marks = [("launch -> profiler import", time.time())]
+_reported = False
+
+
+def mark(phase: str, once: bool = False):
+    with _lock:
+        if once and any(p == phase for p, _ in _marks):
+            return
+        _marks.append((phase, time.time()))
+
+
+def report(final_phase: str = None):
+    """Prints the timeline once per process (first driver.get)."""
+    global _reported
+    if final_phase:
+        mark(final_phase, once=True)
+    with _lock:
+        if _reported:
+            return
+        _reported = True
+        marks = list(_marks)
+    prev = _T0
+    for phase, ts in marks:
+        print(f"[STARTUP] {phase:<28} +{ts - prev:7.3f}s  @{ts - _T0:7.3f}s")
+        prev = ts
+
+
+def import_profile(module: str = "bypass_parallel", top: int = 15):
+    """Runs `python -X importtime -c "import <module>"` and prints its slowest direct imports."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=here, capture_output=True, text=True)
+    # "import time: self [us] | cumulative | imported package", children listed before their parent,
+    # nesting shown by indentation -> keep the direct imports of <module>
+    children, direct, total = [], [], 0
+    for line in proc.stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( +)(\S+)", line)
+        if not m:
+            continue
+        depth = (len(m.group(3)) - 1) // 2
+        if depth == 1:
+            children.append((m.group(4), int(m.group(2))))
+        elif depth == 0:
+            if m.group(4) == module:
+                direct, total = children, int(m.group(2))
+            children = []
+    if proc.returncode != 0:
+        print(proc.stderr.strip().splitlines()[-1])
+    print(f"import {module}: {total / 1e6:.3f}s")
+    for name, us in sorted(direct, key=lambda kv: -kv[1])[:top]:
+        print(f"  {name:<28} {us / 1e6:7.3f}s")
+
+
+if __name__ == "__main__":
+    import_profile(
+        sys.argv[1] if len(sys.argv) > 1 else "bypass_parallel",
+        int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    )
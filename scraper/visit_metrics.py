@@ -0,0 +1,182 @@
+"""
+Per-phase timing spans for scan_visit, aggregated per job.
+
+    with span("driver_get", site):
+        driver.get(site)
+
+Every span records (phase, site, worker, seconds, ok); observe() records other
+per-visit values the same way (e.g. transfer_bytes). Spans go to the job's
+VisitMetrics (set by begin_job() in main's context, which run_threaded copies
+into each visit) or, in threads without that context (shard processes), to a
+process-wide default that the shard drains with take() and ships to the parent.
+
+Export per job:
+- <job>_phases.json  percentiles per phase and per (site, phase), plus values
+- <job>_phases.prom  Prometheus text format (node_exporter textfile collector)
+"""
+import contextvars
+import json
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+Span = Tuple[str, str, str, float, bool]  # phase, site, worker, seconds, ok
+Value = Tuple[str, str, float]            # name, site, value
+
+
+def _worker_name() -> str:
+    proc = multiprocessing.current_process().name
+    thread = threading.current_thread().name
+    return thread if proc == "MainProcess" else f"{proc}/{thread}"
+
+
+def _quantile(ordered: List[float], q: float) -> float:
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class VisitMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans: List[Span] = []
+        self._values: List[Value] = []
+
+    def record(self, phase: str, site: str, seconds: float, ok: bool = True, worker: Optional[str] = None):
+        with self._lock:
+            self._spans.append((phase, site, worker or _worker_name(), seconds, ok))
+
+    def observe(self, name: str, site: str, value: float):
+        with self._lock:
+            self._values.append((name, site, value))
+
+    def take(self) -> Tuple[List[Span], List[Value]]:
+        """Returns and clears what was recorded so far (shards ship this to the parent)."""
+        with self._lock:
+            taken = (self._spans, self._values)
+            self._spans, self._values = [], []
+        return taken
+
+    def extend(self, taken: Tuple[List[Span], List[Value]]):
+        spans, values = taken
+        with self._lock:
+            self._spans.extend(tuple(s) for s in spans)
+            self._values.extend(tuple(v) for v in values)
+
+    @staticmethod
+    def _stats(values: List[float], errors: Optional[int] = None, unit: str = "_s") -> Dict:
+        ordered = sorted(values)
+        out = {"count": len(ordered), f"sum{unit}": round(sum(ordered), 3), f"max{unit}": round(ordered[-1], 3)}
+        if errors is not None:
+            out["errors"] = errors
+        for q in QUANTILES:
+            out[f"p{int(q * 100)}{unit}"] = round(_quantile(ordered, q), 3)
+        return out
+
+    def summary(self) -> Dict:
+        with self._lock:
+            spans = list(self._spans)
+            values = list(self._values)
+        by_value: Dict[str, Dict[str, List[float]]] = {}
+        for name, site, value in values:
+            by_value.setdefault(name, {}).setdefault(site, []).append(value)
+        by_phase: Dict[str, List[float]] = {}
+        by_site: Dict[Tuple[str, str], List[float]] = {}
+        errors: Dict[Tuple[str, str], int] = {}
+        workers = set()
+        for phase, site, worker, seconds, ok in spans:
+            by_phase.setdefault(phase, []).append(seconds)
+            by_site.setdefault((site, phase), []).append(seconds)
+            workers.add(worker)
+            if not ok:
+                errors[(site, phase)] = errors.get((site, phase), 0) + 1
+        phase_errors: Dict[str, int] = {}
+        for (_, phase), n in errors.items():
+            phase_errors[phase] = phase_errors.get(phase, 0) + n
+        return {
+            "spans": len(spans),
+            "workers": len(workers),
+            "phases": {p: self._stats(v, phase_errors.get(p, 0))
+                       for p, v in sorted(by_phase.items(), key=lambda kv: -sum(kv[1]))},
+            "sites": {site: {p: self._stats(v, errors.get((site, p), 0))
+                             for (s, p), v in sorted(by_site.items()) if s == site}
+                      for site in sorted({s for s, _ in by_site})},
+            "values": {name: {"all": self._stats([v for vs in per_site.values() for v in vs], unit=""),
+                              "sites": {site: self._stats(vs, unit="") for site, vs in sorted(per_site.items())}}
+                       for name, per_site in sorted(by_value.items())},
+        }
+
+    def write_json(self, path: str, job_id: Optional[str] = None, meta: Optional[Dict] = None) -> Dict:
+        summary = self.summary()
+        summary["job_id"] = job_id
+        summary.update(meta or {})
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=1)
+        return summary
+
+    def write_prometheus(self, path: str, job_id: Optional[str] = None):
+        def esc(v: str) -> str:
+            return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        summary = self.summary()
+        job = esc(job_id or "")
+        lines = [
+            "# HELP liveseeker_visit_phase_seconds Time spent in each scan_visit phase.",
+            "# TYPE liveseeker_visit_phase_seconds summary",
+        ]
+        errors = [
+            "# HELP liveseeker_visit_phase_errors_total Phases that ended with an exception.",
+            "# TYPE liveseeker_visit_phase_errors_total counter",
+        ]
+        for site, phases in summary["sites"].items():
+            for phase, st in phases.items():
+                labels = f'job="{job}",site="{esc(site)}",phase="{esc(phase)}"'
+                for q in QUANTILES:
+                    lines.append(f'liveseeker_visit_phase_seconds{{{labels},quantile="{q}"}} {st[f"p{int(q * 100)}_s"]}')
+                lines.append(f"liveseeker_visit_phase_seconds_sum{{{labels}}} {st['sum_s']}")
+                lines.append(f"liveseeker_visit_phase_seconds_count{{{labels}}} {st['count']}")
+                errors.append(f"liveseeker_visit_phase_errors_total{{{labels}}} {st['errors']}")
+        for name, per in summary["values"].items():
+            metric = f"liveseeker_visit_{name}"
+            lines += [f"# HELP {metric} Per-visit {name}.", f"# TYPE {metric} summary"]
+            for site, st in per["sites"].items():
+                labels = f'job="{job}",site="{esc(site)}"'
+                for q in QUANTILES:
+                    lines.append(f'{metric}{{{labels},quantile="{q}"}} {st[f"p{int(q * 100)}"]}')
+                lines.append(f"{metric}_sum{{{labels}}} {st['sum']}")
+                lines.append(f"{metric}_count{{{labels}}} {st['count']}")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines + errors) + "\n")
+        os.replace(tmp, path)  # textfile collectors must never see a half-written file
+
+
+_default = VisitMetrics()
+_current: "contextvars.ContextVar[Optional[VisitMetrics]]" = contextvars.ContextVar("visit_metrics", default=None)
+
+
+def begin_job() -> VisitMetrics:
+    """Fresh metrics for the job running in the current context."""
+    metrics = VisitMetrics()
+    _current.set(metrics)
+    return metrics
+
+
+def current() -> VisitMetrics:
+    return _current.get() or _default
+
+
+@contextmanager
+def span(phase: str, site: str):
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        current().record(phase, site, time.perf_counter() - t0, ok)